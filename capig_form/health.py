@@ -1,4 +1,4 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 
@@ -11,3 +11,44 @@ def health_check(request):
     Retorna 200 OK si la aplicación está funcionando correctamente.
     """
     return JsonResponse({"status": "healthy"}, status=200)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "HEAD"])
+def readiness_check(request):
+    """
+    Readiness: 503 mientras el warm-up de caches de Sheets esta pendiente o
+    en curso, 200 cuando termino (aunque algun paso haya fallado).
+    """
+    from capig_form.warmup import warmup_status
+
+    state = warmup_status()
+    return JsonResponse(state, status=200 if state["ready"] else 503)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "HEAD"])
+def outbox_health(request):
+    """
+    Estado del outbox de escrituras hacia Google Sheets: cuantas entradas
+    siguen pendientes y hace cuanto espera la mas antigua.
+    """
+    from forms.outbox import outbox_stats
+
+    try:
+        stats = outbox_stats()
+    except Exception as exc:
+        return JsonResponse({"status": "error", "detail": str(exc)}, status=503)
+    return JsonResponse({"status": "ok", **stats}, status=200)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """
+    Metricas en formato de texto de Prometheus: llamadas y latencia de la API
+    de Sheets por operacion y hoja, y llamadas a Sheets por request y vista.
+    """
+    from capig_form.services.metrics import render
+
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Logging estructurado sin bloquear los hilos de request.
+
+QueuedStreamHandler deja cada registro en una cola y un hilo aparte lo
+formatea y escribe en stdout, asi un stdout lento (o un pipe lleno) no frena
+las vistas. La escritura conserva la proteccion que daba _print_utf8: se
+escribe UTF-8 al buffer binario (consolas Windows en CP1252) y se ignora el
+OSError errno 22 que a veces lanza esa consola.
+
+Filtros:
+- RedactFilter reemplaza los datos de filas (extra row/rows/payload/data) por
+  un resumen, salvo que LOG_REDACT_ROWS sea False.
+- SampleFilter deja pasar solo una fraccion de los diagnosticos verbosos
+  (los registrados con `diagnostic()`).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+REDACTED_FIELDS = ("row", "rows", "payload", "data")
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _setting(name, default):
+    try:
+        from django.conf import settings
+
+        return getattr(settings, name, default)
+    except Exception:  # pragma: no cover - settings no configurados
+        return default
+
+
+def diagnostic(logger, message, *args, **fields):
+    """Diagnostico verboso (nivel DEBUG) sujeto a muestreo por SampleFilter."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(message, *args, extra=dict(fields, sampled=True))
+
+
+def _extras(record):
+    return {
+        key: value for key, value in record.__dict__.items()
+        if key not in _STANDARD_ATTRS and not key.startswith("_")
+    }
+
+
+# ========================
+# FILTROS
+# ========================
+class RedactFilter(logging.Filter):
+    def filter(self, record):
+        if not _setting("LOG_REDACT_ROWS", True):
+            return True
+        for field in REDACTED_FIELDS:
+            value = record.__dict__.get(field)
+            if value is None:
+                continue
+            size = len(value) if hasattr(value, "__len__") else 1
+            record.__dict__[field] = f"<redactado: {type(value).__name__}, {size} valores>"
+        return True
+
+
+class SampleFilter(logging.Filter):
+    def filter(self, record):
+        if not getattr(record, "sampled", False):
+            return True
+        rate = _setting("LOG_DIAGNOSTIC_SAMPLE_RATE", 0.1)
+        return rate >= 1 or random.random() < rate
+
+
+# ========================
+# FORMATOS
+# ========================
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_extras(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        text = super().format(record)
+        extras = _extras(record)
+        if extras:
+            first, _, rest = text.partition("\n")
+            pairs = " ".join(f"{key}={value!r}" for key, value in extras.items())
+            text = f"{first} {pairs}" + (f"\n{rest}" if rest else "")
+        return text
+
+
+# ========================
+# HANDLERS
+# ========================
+class SafeStreamHandler(logging.StreamHandler):
+    """StreamHandler que escribe UTF-8 sin romperse en consolas de Windows."""
+
+    def emit(self, record):
+        try:
+            text = self.format(record) + self.terminator
+            buffer = getattr(self.stream, "buffer", None)
+            if buffer is not None:
+                buffer.write(text.encode("utf-8", errors="replace"))
+            else:
+                self.stream.write(text)
+            self.flush()
+        except OSError as exc:  # pragma: no cover - defensivo
+            if getattr(exc, "errno", None) != 22:
+                self.handleError(record)
+        except Exception:
+            self.handleError(record)
+
+
+class QueuedStreamHandler(logging.handlers.QueueHandler):
+    """
+    Encola los registros y los escribe desde un hilo propio. Tras un fork
+    (gunicorn con preload) el hijo arranca su propio hilo escritor.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        self._maxsize = maxsize
+        self.target = SafeStreamHandler(stream or sys.stdout)
+        self.listener = None
+        super().__init__(queue.Queue(maxsize))
+        self._start()
+        atexit.register(self._stop)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def _start(self):
+        self.listener = logging.handlers.QueueListener(
+            self.queue, self.target, respect_handler_level=False)
+        self.listener.start()
+
+    def _stop(self):
+        if self.listener is not None:
+            try:
+                self.listener.stop()
+            except Exception:  # pragma: no cover - defensivo
+                pass
+            self.listener = None
+
+    def _after_fork(self):
+        # El hilo del padre no existe en el hijo; la cola puede tener un lock tomado.
+        self.queue = queue.Queue(self._maxsize)
+        self._start()
+
+    def prepare(self, record):
+        # Se resuelve el mensaje y la traza aca (los args pueden cambiar despues),
+        # pero se conservan los extras para el formato estructurado.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Nunca bloquear el request: si la cola se lleno, se descarta.
+            pass
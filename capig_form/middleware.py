@@ -0,0 +1,71 @@
+import time
+
+from capig_form.services import metrics, request_cache, tracing
+
+
+class MetricsMiddleware:
+    """
+    Mide cada request y cuantas llamadas a Google Sheets hizo, agrupando por
+    vista (nombre de la URL resuelta) para /metrics/.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = metrics.begin_request()
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            match = getattr(request, "resolver_match", None)
+            view = (match.view_name or match._func_path) if match else "unresolved"
+            metrics.end_request(token, view, request.method, status, time.perf_counter() - start)
+
+
+class TracingMiddleware:
+    """
+    Abre una traza por request, agrega el header Server-Timing y manda al
+    log de requests lentos los que superan SLOW_REQUEST_THRESHOLD_MS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = tracing.start_trace()
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            trace = tracing.finish_trace(token)
+            if response is not None:
+                response["Server-Timing"] = trace.server_timing()
+            match = getattr(request, "resolver_match", None)
+            tracing.write_slow_log(trace, {
+                "method": request.method,
+                "path": request.path,
+                "view": match.view_name if match else None,
+                "status": response.status_code if response is not None else 500,
+            })
+
+
+class RequestReadCacheMiddleware:
+    """
+    Memoriza las lecturas de Sheets durante el request (ver request_cache):
+    cada hoja se lee a lo sumo una vez y la vista ve datos consistentes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request_cache.begin_request()
+        try:
+            return self.get_response(request)
+        finally:
+            request_cache.end_request(token)
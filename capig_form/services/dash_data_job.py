@@ -1,18 +1,13 @@
-import os
+import hashlib
+import json
+import logging
 import re
-from collections import defaultdict
+from itertools import zip_longest
 from typing import Dict, List, Tuple
 
-import pandas as pd
+from capig_form.services.job_runner import JobOutput, Requirement, run_jobs
 
-
-def _ensure_django():
-    import django
-    from django.conf import settings
-
-    if not settings.configured:
-        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "capig_form.settings")
-        django.setup()
+logger = logging.getLogger(__name__)
 
 
 def _normalize(text: str) -> str:
@@ -41,19 +36,6 @@ def _clean_ruc(raw) -> str:
     return re.sub(r"\D", "", str(raw or ""))
 
 
-def _open_first_existing_worksheet(ss, names: List[str]):
-    last_error = None
-    for name in names:
-        try:
-            return ss.worksheet(name)
-        except Exception as exc:
-            last_error = exc
-            continue
-    if last_error:
-        raise last_error
-    raise RuntimeError("No se encontro ninguna hoja candidata.")
-
-
 def _to_float(val) -> float:
     if val is None:
         return 0.0
@@ -74,25 +56,104 @@ def _to_float(val) -> float:
             return 0.0
 
 
-def _sum_year_columns(headers: List[str], row: List) -> float:
-    total = 0.0
-    for idx, h in enumerate(headers):
-        norm = _normalize(h)
-        # Solo años puros de 4 dígitos (2019, 2020, 2021, 2022, 2023...), ignora columnas con prefijo T
-        if re.fullmatch(r"\d{4}", norm):
-            if idx < len(row):
-                total += _to_float(row[idx])
+# ========================
+# PIPELINE COLUMNAR
+# ========================
+# Las hojas se transponen una sola vez a columnas (zip_longest) y cada paso
+# trabaja sobre columnas completas: los encabezados se resuelven una vez por
+# bloque y los montos se convierten y suman como arreglos. Las sumas se hacen
+# en el mismo orden que el recorrido fila a fila (columna por columna y luego
+# fila por fila con np.add.at), asi que los totales salen identicos bit a bit.
+
+def _columns(rows: List[List]) -> List[tuple]:
+    """Transpone las filas; las celdas que faltan en filas cortas quedan en None."""
+    return list(zip_longest(*rows, fillvalue=None)) if rows else []
+
+
+def _text_column(columns: List[tuple], idx: int, size: int, as_str: bool = True):
+    import pandas as pd
+
+    if idx < 0 or idx >= len(columns):
+        return pd.Series([""] * size, dtype=object)
+    col = pd.Series(columns[idx], dtype=object).fillna("")
+    return col.astype(str) if as_str else col
+
+
+def _clean_ruc_column(col):
+    return col.astype(str).str.replace(r"\D", "", regex=True)
+
+
+def _fast_float(val) -> float:
+    # float() directo acepta los montos limpios ("1234.5"); si funciona el
+    # resultado es el mismo que daria _to_float, y si no se usa _to_float.
+    if isinstance(val, str) and val:
+        try:
+            return float(val)
+        except ValueError:
+            pass
+    return _to_float(val)
+
+
+def _to_float_array(values):
+    """Equivale a aplicar _to_float a cada valor; convierte cada monto distinto una sola vez."""
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), sort=False)
+    if not len(uniques):
+        return np.zeros(len(codes), dtype=np.float64)
+    converted = np.fromiter((_fast_float(v) for v in uniques), dtype=np.float64, count=len(uniques))
+    # Las celdas ausentes (None) quedan con codigo -1 y valen 0.0.
+    return np.where(codes >= 0, converted[codes], 0.0)
+
+
+def _year_columns(headers: List[str]) -> List[int]:
+    # Solo años puros de 4 dígitos (2019, 2020, 2021, 2022, 2023...), ignora columnas con prefijo T
+    return [idx for idx, h in enumerate(headers) if re.fullmatch(r"\d{4}", _normalize(h))]
+
+
+def _sum_year_columns(headers: List[str], columns: List[tuple], size: int):
+    import numpy as np
+
+    total = np.zeros(size, dtype=np.float64)
+    for idx in _year_columns(headers):
+        if idx < len(columns):
+            total += _to_float_array(columns[idx])
     return total
 
 
-def _collect_sector_map(ss) -> Dict[str, str]:
-    sector_map: Dict[str, str] = {}
-    try:
-        sh = ss.worksheet("SECTOR")
-    except Exception:
-        return sector_map
+def _is_header_row(row: List) -> bool:
+    # Una sola normalizacion por fila: el separador \x00 impide que una
+    # coincidencia cruce de una celda a otra.
+    joined = _normalize("\x00".join(str(c) for c in row))
+    return "RUC" in joined and "TAMANO" in joined
+
+
+def _header_rows(data_bd: List[List]):
+    """(h1, h2) como antes, pero solo recorre la hoja si 1 o 313 no son encabezados."""
+    def is_header(i):
+        return i < len(data_bd) and bool(data_bd[i]) and _is_header_row(data_bd[i])
+
+    found = []
+
+    def nth_header(n):
+        start = found[-1] + 1 if found else 0
+        for i in range(start, len(data_bd)):
+            if len(found) > n:
+                break
+            if is_header(i):
+                found.append(i)
+        return found[n] if len(found) > n else None
 
-    values = sh.get_all_values()
+    h1 = 1 if is_header(1) else nth_header(0)
+    if h1 is None:
+        h1 = 1
+    h2 = 313 if is_header(313) else nth_header(1)
+    return h1, h2
+
+
+def _collect_sector_map(values: List[List]) -> Dict[str, str]:
+    sector_map: Dict[str, str] = {}
     if not values:
         return sector_map
     headers = values[0]
@@ -110,147 +171,491 @@ def _collect_sector_map(ss) -> Dict[str, str]:
     return sector_map
 
 
-def _collect_base_data(data_bd: List[List], sector_map: Dict[str, str]) -> Dict[str, Dict]:
-    result: Dict[str, Dict] = {}
-
-    def process_block(header_row: List[str], rows: List[List[str]]):
-        col_ruc = _find_col(header_row, "RUC")
-        col_emp = _find_col(header_row, "RAZON_SOCIAL") if _find_col(header_row, "RAZON_SOCIAL") >= 0 else _find_col(header_row, "RAZON SOCIAL")
-        col_tam = _find_col(header_row, "TAMANO")
-        col_estado = _find_col(header_row, "ESTADO")
-        col_colab = _find_col(header_row, "COLABORADORES") if _find_col(header_row, "COLABORADORES") >= 0 else _find_col(header_row, "NO_COLABORADORES")
-        col_semaforo = _find_col(header_row, "SEMAFORO")
-        col_sector = _find_col(header_row, "SECTOR")
-
-        for row in rows:
-            if not row or all(not c for c in row):
-                continue
-            ruc = _clean_ruc(row[col_ruc] if col_ruc >= 0 and col_ruc < len(row) else "")
-            if not ruc:
-                continue
-            empresa = str(row[col_emp]) if col_emp >= 0 and col_emp < len(row) else ""
-            tamano = str(row[col_tam]) if col_tam >= 0 and col_tam < len(row) else ""
-            estado = str(row[col_estado]) if col_estado >= 0 and col_estado < len(row) else ""
-            colab = row[col_colab] if col_colab >= 0 and col_colab < len(row) else ""
-            semaforo = str(row[col_semaforo]) if col_semaforo >= 0 and col_semaforo < len(row) else ""
-            sector_cell = str(row[col_sector]) if col_sector >= 0 and col_sector < len(row) else ""
-            ventas_hist = _sum_year_columns(header_row, row)
-
-            sec = sector_map.get(ruc, sector_cell)
-
-            current = result.get(ruc, {})
-            # Prefer non-empty values
-            def pick(new, old):
-                return new if str(new).strip() else old
-
-            result[ruc] = {
-                "empresa": pick(empresa, current.get("empresa", "")),
-                "tamano": pick(tamano, current.get("tamano", "")),
-                "estado": pick(estado, current.get("estado", "")),
-                "colab": pick(colab, current.get("colab", "")),
-                "semaforo": pick(semaforo, current.get("semaforo", "")),
-                "sector": pick(sec, current.get("sector", "")),
-                "ventas_hist": current.get("ventas_hist", 0.0) + ventas_hist,
-            }
+BASE_FIELDS = ("empresa", "tamano", "estado", "colab", "semaforo", "sector")
 
+
+def _base_blocks(data_bd: List[List]) -> List[Tuple[List[str], List[List]]]:
+    """Bloques (encabezado, filas) de SOCIOS."""
     # Header rows: row 2 (idx1) and row 314 (idx313) per spec, but detect flex
-    header_idxs = []
-    for i, row in enumerate(data_bd):
-        if not row:
-            continue
-        if _find_col(row, "RUC") >= 0 and _find_col(row, "TAMANO") >= 0:
-            header_idxs.append(i)
-    h1 = 1 if 1 in header_idxs else (header_idxs[0] if header_idxs else 1)
-    h2 = 313 if 313 in header_idxs else (header_idxs[1] if len(header_idxs) > 1 else None)
+    h1, h2 = _header_rows(data_bd)
 
+    blocks = []
     if h1 is not None and h1 < len(data_bd):
-        process_block(data_bd[h1], data_bd[h1 + 1 : 312])
+        blocks.append((data_bd[h1], data_bd[h1 + 1 : 312]))
     if h2 is not None and h2 < len(data_bd):
-        process_block(data_bd[h2], data_bd[h2 + 1 :])
-
+        blocks.append((data_bd[h2], data_bd[h2 + 1 :]))
+    return blocks
+
+
+def _block_layout(header_row: List[str]) -> Dict[str, int]:
+    col_emp = _find_col(header_row, "RAZON_SOCIAL")
+    if col_emp < 0:
+        col_emp = _find_col(header_row, "RAZON SOCIAL")
+    col_colab = _find_col(header_row, "COLABORADORES")
+    if col_colab < 0:
+        col_colab = _find_col(header_row, "NO_COLABORADORES")
+    return {
+        "ruc": _find_col(header_row, "RUC"),
+        "empresa": col_emp,
+        "tamano": _find_col(header_row, "TAMANO"),
+        "estado": _find_col(header_row, "ESTADO"),
+        "colab": col_colab,
+        "semaforo": _find_col(header_row, "SEMAFORO"),
+        "sector": _find_col(header_row, "SECTOR"),
+    }
+
+
+def _only_rows(rows: List[List], col_ruc: int, only) -> List[List]:
+    """Filas cuyo RUC esta en `only` (modo incremental)."""
+    import numpy as np
+
+    ruc = _clean_ruc_column(_text_column(_columns(rows), col_ruc, len(rows)))
+    return [rows[i] for i in np.flatnonzero(ruc.isin(only).to_numpy())]
+
+
+def _base_block_frame(header_row: List[str], rows: List[List], sector_map: Dict[str, str], only=None):
+    """Columnas normalizadas de un bloque de SOCIOS (una fila por fila de la hoja)."""
+    import pandas as pd
+
+    layout = _block_layout(header_row)
+    if only is not None:
+        rows = _only_rows(rows, layout["ruc"], only)
+
+    size = len(rows)
+    columns = _columns(rows)
+    ruc = _clean_ruc_column(_text_column(columns, layout["ruc"], size))
+    sector_cell = _text_column(columns, layout["sector"], size)
+    sector = ruc.map(sector_map)
+    sector = sector.where(sector.notna(), sector_cell)
+
+    return pd.DataFrame({
+        "ruc": ruc,
+        "empresa": _text_column(columns, layout["empresa"], size),
+        "tamano": _text_column(columns, layout["tamano"], size),
+        "estado": _text_column(columns, layout["estado"], size),
+        "colab": _text_column(columns, layout["colab"], size, as_str=False),
+        "semaforo": _text_column(columns, layout["semaforo"], size),
+        "sector": sector,
+        "ventas_hist": _sum_year_columns(header_row, columns, size),
+    })
+
+
+def _collect_base_data(data_bd: List[List], sector_map: Dict[str, str], only=None):
+    """
+    Agrupa SOCIOS por RUC. Devuelve un DataFrame con una fila por RUC en orden
+    de primera aparicion; de cada campo queda el ultimo valor no vacio y las
+    ventas historicas se suman. Con `only` solo se procesan esos RUC.
+    """
+    import numpy as np
+    import pandas as pd
+
+    blocks = [
+        _base_block_frame(header_row, rows, sector_map, only)
+        for header_row, rows in _base_blocks(data_bd)
+    ]
+
+    columns = ["ruc", *BASE_FIELDS, "ventas_hist"]
+    if not blocks:
+        return pd.DataFrame(columns=columns)
+    frame = pd.concat(blocks, ignore_index=True)
+    frame = frame[frame["ruc"] != ""]
+    if frame.empty:
+        return pd.DataFrame(columns=columns)
+
+    codes, rucs = pd.factorize(frame["ruc"], sort=False)
+    ventas = np.zeros(len(rucs), dtype=np.float64)
+    np.add.at(ventas, codes, frame["ventas_hist"].to_numpy(dtype=np.float64))
+
+    fields = frame[list(BASE_FIELDS)]
+    # Prefer non-empty values: los vacios pasan a NaN y last() los salta.
+    filled = fields.where(fields.astype(str).apply(lambda col: col.str.strip() != ""))
+    picked = filled.groupby(codes).last().reindex(range(len(rucs)))
+    picked = picked.astype(object).where(picked.notna(), "")
+
+    result = picked.reset_index(drop=True)
+    result.insert(0, "ruc", rucs.tolist())
+    result["ventas_hist"] = ventas
     return result
 
 
-def _collect_ventas_nuevas(data_ventas: List[List]) -> Dict[str, float]:
-    if not data_ventas:
-        return {}
+def _ventas_layout(data_ventas: List[List]) -> Tuple[int, int]:
     headers = data_ventas[0]
     col_ruc = _find_col(headers, "RUC")
     col_monto = _find_col(headers, "MONTO_ESTIMADO")
     if col_monto < 0:
         col_monto = _find_col(headers, "MONTO")
+    return col_ruc, col_monto
+
+
+def _ventas_columns(data_ventas: List[List]):
+    """(ruc limpio, monto crudo) de las filas de VENTAS que llegan a ambas columnas."""
+    import pandas as pd
+
+    if not data_ventas:
+        return None
+    col_ruc, col_monto = _ventas_layout(data_ventas)
     if min(col_ruc, col_monto) < 0:
+        return None
+    columns = _columns(data_ventas[1:])
+    if max(col_ruc, col_monto) >= len(columns):
+        return None
+    # Las filas cortas que no llegan a RUC o MONTO se ignoran.
+    ruc_raw = pd.Series(columns[col_ruc], dtype=object)
+    monto_raw = pd.Series(columns[col_monto], dtype=object)
+    present = (ruc_raw.notna() & monto_raw.notna()).to_numpy()
+    ruc = _clean_ruc_column(ruc_raw[present]).reset_index(drop=True)
+    monto = monto_raw[present].reset_index(drop=True)
+    keep = (ruc != "").to_numpy()
+    return ruc[keep], monto[keep]
+
+
+def _collect_ventas_nuevas(data_ventas: List[List], only=None) -> Dict[str, float]:
+    import numpy as np
+    import pandas as pd
+
+    ventas = _ventas_columns(data_ventas)
+    if ventas is None:
         return {}
-    agg: Dict[str, float] = defaultdict(float)
-    for row in data_ventas[1:]:
-        if col_ruc >= len(row) or col_monto >= len(row):
-            continue
-        ruc = _clean_ruc(row[col_ruc])
-        if not ruc:
+    ruc, monto = ventas
+    if only is not None:
+        keep = ruc.isin(only).to_numpy()
+        ruc, monto = ruc[keep], monto[keep]
+    if ruc.empty:
+        return {}
+    montos = _to_float_array(monto.tolist())
+    codes, rucs = pd.factorize(ruc, sort=False)
+    agg = np.zeros(len(rucs), dtype=np.float64)
+    np.add.at(agg, codes, montos)
+    return dict(zip(rucs.tolist(), agg.tolist()))
+
+
+DASH_HEADER = ["RUC", "Empresa", "Tamano", "Estado", "Sector", "Colaboradores", "Semaforo", "Ventas Totales"]
+
+
+def _dash_rows(data_bd: List[List], data_ventas: List[List], sector_map: Dict[str, str], only=None) -> List[List]:
+    base_data = _collect_base_data(data_bd, sector_map, only)
+    ventas_nuevas = _collect_ventas_nuevas(data_ventas, only)
+
+    rows = []
+    fields = ("ruc", "empresa", "tamano", "estado", "colab", "semaforo", "sector", "ventas_hist")
+    for ruc, empresa, tamano, estado, colab, semaforo, sector, ventas_hist in zip(
+        *(base_data[field].tolist() for field in fields)
+    ):
+        ventas_total = ventas_hist + ventas_nuevas.get(ruc, 0.0)
+        rows.append([ruc, empresa, tamano, estado, sector, colab, semaforo, ventas_total])
+    return rows
+
+
+def build_dash_rows(data_bd: List[List], data_ventas: List[List], sector_map: Dict[str, str]) -> List[List]:
+    """Filas de DASH_DATA (con encabezado) a partir de las hojas ya leidas."""
+    return [list(DASH_HEADER)] + _dash_rows(data_bd, data_ventas, sector_map)
+
+
+# ========================
+# MODO INCREMENTAL
+# ========================
+# Cada RUC de DASH_DATA guarda (modelo DashDataRow) su fila y un hash de las
+# celdas de origen que lo determinan: sus filas de SOCIOS (columnas usadas, en
+# orden), sus montos de VENTAS y su sector. En cada corrida se leen las hojas
+# completas, se recalculan solo los RUC cuyo hash cambio y se escriben solo
+# esas filas. Si cambia algun encabezado o DASH_DATA no coincide con lo
+# guardado, se hace una reconstruccion completa.
+#
+# Las filas borradas no se eliminan de la grilla: los huecos se llenan con
+# RUC nuevos o con las ultimas filas, y la cola sobrante se limpia. Asi todo
+# va en un values.batchClear y un values.batchUpdate; el orden de las filas
+# puede diferir del de una reconstruccion completa.
+DASH_STATE_KEY = "DASH_DATA"
+# Subir si cambia el calculo: invalida los hashes y fuerza una reconstruccion.
+PIPELINE_VERSION = 1
+_SOURCE_SOCIOS, _SOURCE_VENTAS, _SOURCE_SECTOR = 0, 1, 2
+
+
+def _fingerprint(*parts) -> str:
+    payload = json.dumps(parts, ensure_ascii=False, default=str, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _hash_frame(frame):
+    import pandas as pd
+
+    return pd.util.hash_pandas_object(frame.astype(str), index=False).to_numpy()
+
+
+def _source_fingerprint(data_bd: List[List], data_ventas: List[List]) -> str:
+    blocks = [(list(header), _block_layout(header)) for header, _ in _base_blocks(data_bd)]
+    ventas_header = list(data_ventas[0]) if data_ventas else []
+    return _fingerprint(PIPELINE_VERSION, DASH_HEADER, blocks, ventas_header)
+
+
+def source_hashes(data_bd: List[List], data_ventas: List[List], sector_map: Dict[str, str]) -> Dict[str, str]:
+    """Hash por RUC (solo los RUC de SOCIOS) de las celdas de origen que lo determinan."""
+    import numpy as np
+    import pandas as pd
+
+    parts = []
+    for header_row, rows in _base_blocks(data_bd):
+        layout = _block_layout(header_row)
+        size = len(rows)
+        columns = _columns(rows)
+        wanted = [idx for idx in layout.values()] + _year_columns(header_row)
+        frame = pd.DataFrame({
+            str(pos): _text_column(columns, idx, size, as_str=False) for pos, idx in enumerate(wanted)
+        })
+        ruc = _clean_ruc_column(_text_column(columns, layout["ruc"], size))
+        keep = (ruc != "").to_numpy()
+        parts.append((ruc[keep], _SOURCE_SOCIOS, _hash_frame(frame[keep])))
+
+    if not parts:
+        return {}
+    base_rucs = pd.concat([ruc for ruc, _, _ in parts], ignore_index=True)
+
+    ventas = _ventas_columns(data_ventas)
+    if ventas is not None:
+        ruc, monto = ventas
+        keep = ruc.isin(base_rucs).to_numpy()
+        frame = pd.DataFrame({"monto": monto[keep]})
+        parts.append((ruc[keep], _SOURCE_VENTAS, _hash_frame(frame)))
+
+    unique_rucs = pd.Series(pd.unique(base_rucs), dtype=object)
+    # El sector se hashea con su presencia: un RUC sin entrada usa la celda de SOCIOS.
+    sector = unique_rucs.map(lambda r: sector_map.get(r, "\x00"))
+    parts.append((unique_rucs, _SOURCE_SECTOR, _hash_frame(pd.DataFrame({"sector": sector}))))
+
+    rucs = pd.concat([ruc for ruc, _, _ in parts], ignore_index=True)
+    sources = np.concatenate([np.full(len(ruc), source, dtype=np.uint64) for ruc, source, _ in parts])
+    hashes = np.concatenate([h for _, _, h in parts]).astype(np.uint64)
+    codes, uniques = pd.factorize(rucs, sort=False)
+    # Orden estable: dentro de cada RUC se conserva el orden de las filas.
+    order = np.argsort(codes, kind="stable")
+    pairs = np.stack([sources[order], hashes[order]], axis=1)
+    bounds = np.flatnonzero(np.diff(codes[order])) + 1
+
+    result = {}
+    for ruc, chunk in zip(uniques.tolist(), np.split(pairs, bounds)):
+        result[ruc] = hashlib.blake2b(chunk.tobytes(), digest_size=20).hexdigest()
+    return result
+
+
+def _plan_incremental(stored: Dict[str, Tuple[int, str]], hashes: Dict[str, str]):
+    """
+    Decide que filas escribir. `stored` es {ruc: (fila, hash)}; `hashes` el
+    hash actual de cada RUC, en orden de primera aparicion. Devuelve
+    (posiciones {ruc: fila} de todos los RUC, RUC a escribir, ultima fila
+    escrita antes, ultima fila despues).
+    """
+    old_end = max((row for row, _ in stored.values()), default=1)
+    positions = {ruc: row for ruc, (row, _) in stored.items() if ruc in hashes}
+    holes = sorted(row for ruc, (row, _) in stored.items() if ruc not in hashes)
+    to_write = {ruc for ruc in positions if stored[ruc][1] != hashes[ruc]}
+
+    end = old_end
+    for ruc in hashes:
+        if ruc in positions:
             continue
-        monto = _to_float(row[col_monto])
-        agg[ruc] += monto
-    return agg
+        if holes:
+            positions[ruc] = holes.pop(0)
+        else:
+            end += 1
+            positions[ruc] = end
+        to_write.add(ruc)
+
+    # Huecos que quedan: se llenan con las ultimas filas y la cola se limpia.
+    by_row = {row: ruc for ruc, row in positions.items()}
+    end = max(by_row, default=1)
+    for hole in holes:
+        while end > 1 and end not in by_row:
+            end -= 1
+        if hole >= end:
+            break
+        ruc = by_row.pop(end)
+        by_row[hole] = ruc
+        positions[ruc] = hole
+        to_write.add(ruc)
+        end -= 1
+    new_end = max(by_row, default=1)
+    return positions, to_write, old_end, new_end
+
+
+def _contiguous_runs(row_numbers: List[int]):
+    run = []
+    for row in sorted(row_numbers):
+        if run and row != run[-1] + 1:
+            yield run
+            run = []
+        run.append(row)
+    if run:
+        yield run
+
+
+def _load_state():
+    """
+    Estado guardado de la ultima publicacion. Si la base no esta migrada (o
+    no responde) devuelve (None, {}) y el job hace una reconstruccion completa.
+    """
+    from django.db import DatabaseError
+    from forms.models import DashDataRow, MirrorSyncState
+
+    try:
+        state = MirrorSyncState.objects.filter(worksheet=DASH_STATE_KEY).first()
+        stored = {
+            ruc: (row_number, source_hash)
+            for ruc, row_number, source_hash in DashDataRow.objects.values_list("ruc", "row_number", "source_hash")
+        }
+    except DatabaseError:
+        logger.exception("DASH_DATA: no se pudo leer el estado local; se reconstruye completa.")
+        return None, {}
+    return state, stored
 
 
-def _ensure_worksheet(ss, name: str):
-    from gspread.exceptions import WorksheetNotFound
+def _save_state(fingerprint: str, positions: Dict[str, int], hashes: Dict[str, str], full: bool):
+    from django.db import DatabaseError
 
     try:
-        return ss.worksheet(name)
-    except WorksheetNotFound:
-        return ss.add_worksheet(title=name, rows=2000, cols=20)
+        _write_state(fingerprint, positions, hashes, full)
+    except DatabaseError:
+        # La hoja ya se publico; sin estado la proxima corrida sera completa.
+        logger.exception("DASH_DATA: no se pudo guardar el estado local.")
+
+
+def _write_state(fingerprint: str, positions: Dict[str, int], hashes: Dict[str, str], full: bool):
+    from django.db import transaction
+    from django.utils import timezone
+    from forms.models import DashDataRow, MirrorSyncState
+
+    with transaction.atomic():
+        existing = {row.ruc: row for row in DashDataRow.objects.all()} if not full else {}
+        if full:
+            DashDataRow.objects.all().delete()
+        else:
+            DashDataRow.objects.exclude(ruc__in=list(positions)).delete()
+        changed, created = [], []
+        for ruc, row_number in positions.items():
+            row = existing.get(ruc)
+            if row is None:
+                created.append(DashDataRow(ruc=ruc, row_number=row_number, source_hash=hashes[ruc]))
+            elif row.row_number != row_number or row.source_hash != hashes[ruc]:
+                row.row_number = row_number
+                row.source_hash = hashes[ruc]
+                changed.append(row)
+        DashDataRow.objects.bulk_create(created, batch_size=500)
+        DashDataRow.objects.bulk_update(changed, ["row_number", "source_hash"], batch_size=500)
+        MirrorSyncState.objects.update_or_create(
+            worksheet=DASH_STATE_KEY,
+            defaults={
+                "head": 1,
+                "header": list(DASH_HEADER),
+                "row_count": len(positions),
+                "content_hash": fingerprint,
+                "last_synced_at": timezone.now(),
+                "last_error": "",
+            },
+        )
+
+
+def _sheet_matches_state(column_a: List[List], stored: Dict[str, Tuple[int, str]]) -> bool:
+    """Compara la columna A de DASH_DATA (leida en el snapshot) con las filas guardadas."""
+    col = [row[0] if row else "" for row in column_a]
+    if not col or col[0] != DASH_HEADER[0]:
+        return False
+    if len(col) != max((row for row, _ in stored.values()), default=1):
+        return False
+    return all(row <= len(col) and col[row - 1] == ruc for ruc, (row, _) in stored.items())
+
 
+def _ensure_row_capacity(ws, last_row: int):
+    if last_row > ws.row_count:
+        ws.add_rows(last_row - ws.row_count)
 
-def _write_sheet(ws, rows: List[List]):
-    ws.clear()
+
+def _queue_incremental(batch, ws, rows_by_ruc: Dict[str, List], positions: Dict[str, int], old_end: int, new_end: int):
+    from gspread.utils import rowcol_to_a1
+
+    if new_end < old_end:
+        batch.clear(ws, f"A{new_end + 1}:{rowcol_to_a1(old_end, len(DASH_HEADER))}")
+    by_row = {positions[ruc]: row for ruc, row in rows_by_ruc.items()}
+    for run in _contiguous_runs(list(by_row)):
+        batch.update_range(ws, f"A{run[0]}", [by_row[row] for row in run])
+    if by_row:
+        _ensure_row_capacity(ws, new_end)
+
+
+def _queue_full(batch, ws, rows: List[List]):
+    batch.clear(ws)
     if rows:
-        ws.update(rows)
-
-
-def run():
-    _ensure_django()
-    from django.conf import settings
-    from capig_form.services import google_sheets_service as gss
-
-    sheet_id = os.getenv("SHEET_PATH") or getattr(settings, "SHEET_PATH", "")
-    if not sheet_id:
-        raise RuntimeError("SHEET_PATH no esta configurado.")
-
-    client = gss._get_client()
-    ss = client.open_by_key(sheet_id)
-
-    hoja_bd = _open_first_existing_worksheet(ss, ["SOCIOS", "BASE DE DATOS"])
-    hoja_ventas = _open_first_existing_worksheet(ss, ["VENTAS_SOCIO", "VENTAS_AFILIADOS"])
-
-    data_bd = hoja_bd.get_all_values()
-    data_ventas = hoja_ventas.get_all_values()
-
-    sector_map = _collect_sector_map(ss)
-    base_data = _collect_base_data(data_bd, sector_map)
-    ventas_nuevas = _collect_ventas_nuevas(data_ventas)
-
-    rows = [["RUC", "Empresa", "Tamano", "Estado", "Sector", "Colaboradores", "Semaforo", "Ventas Totales"]]
-    for ruc, info in base_data.items():
-        ventas_hist = info.get("ventas_hist", 0.0)
-        ventas_new = ventas_nuevas.get(ruc, 0.0)
-        ventas_total = ventas_hist + ventas_new
-        rows.append(
-            [
-                ruc,
-                info.get("empresa", ""),
-                info.get("tamano", ""),
-                info.get("estado", ""),
-                info.get("sector", ""),
-                info.get("colab", ""),
-                info.get("semaforo", ""),
-                ventas_total,
-            ]
-        )
+        _ensure_row_capacity(ws, len(rows))
+        batch.update_range(ws, "A1", rows)
+
+
+# ========================
+# JOB
+# ========================
+SOCIOS_SHEETS = ("SOCIOS", "BASE DE DATOS")
+VENTAS_SHEETS = ("VENTAS_SOCIO", "VENTAS_AFILIADOS")
+
+
+REQUIRED_SHEETS = [
+    Requirement(SOCIOS_SHEETS),
+    Requirement(VENTAS_SHEETS),
+    Requirement(("SECTOR",), optional=True),
+    # Solo la columna A: alcanza para validar el estado incremental.
+    Requirement(("DASH_DATA",), cells="A:A", optional=True),
+]
+
+
+def compute(snapshot, full: bool = False):
+    """
+    Calcula DASH_DATA sobre el snapshot del libro. Por defecto es incremental
+    (solo los RUC cuyo origen cambio); con full=True se reconstruye completa.
+    """
+    data_bd = snapshot.values(SOCIOS_SHEETS)
+    data_ventas = snapshot.values(VENTAS_SHEETS)
+    sector_map = _collect_sector_map(snapshot.values(("SECTOR",)))
+    hashes = source_hashes(data_bd, data_ventas, sector_map)
+    fingerprint = _source_fingerprint(data_bd, data_ventas)
+
+    if not full:
+        state, stored = _load_state()
+        column_a = snapshot.values(("DASH_DATA",), cells="A:A")
+        if state is None or state.content_hash != fingerprint:
+            logger.info("DASH_DATA: sin estado previo o cambio un encabezado; reconstruccion completa.")
+        elif column_a is None or not _sheet_matches_state(column_a, stored):
+            logger.warning("DASH_DATA no coincide con el estado guardado; reconstruccion completa.")
+        else:
+            positions, to_write, old_end, new_end = _plan_incremental(stored, hashes)
+            rows = _dash_rows(data_bd, data_ventas, sector_map, only=to_write) if to_write else []
+            rows_by_ruc = {row[0]: row for row in rows}
+            return JobOutput(
+                "dash_data",
+                publish=lambda batch: _queue_incremental(
+                    batch, snapshot.ensure_worksheet("DASH_DATA"), rows_by_ruc, positions, old_end, new_end),
+                after_commit=lambda: _save_state(fingerprint, positions, hashes, full=False),
+                summary={
+                    "mode": "incremental",
+                    "rucs": len(positions),
+                    "written": len(rows),
+                    "deleted": len(set(stored) - set(positions)),
+                },
+            )
+
+    rows = build_dash_rows(data_bd, data_ventas, sector_map)
+    positions = {row[0]: row_number for row_number, row in enumerate(rows[1:], start=2)}
+    return JobOutput(
+        "dash_data",
+        publish=lambda batch: _queue_full(batch, snapshot.ensure_worksheet("DASH_DATA"), rows),
+        after_commit=lambda: _save_state(fingerprint, positions, hashes, full=True),
+        summary={"mode": "full", "rucs": len(positions), "written": len(positions)},
+    )
 
-    hoja_dash = _ensure_worksheet(ss, "DASH_DATA")
-    _write_sheet(hoja_dash, rows)
+
+def run(full: bool = False):
+    """Corre solo este job (ver job_runner para correrlo junto a los demas)."""
+    return run_jobs(["dash_data"], options={"dash_data": {"full": full}})["dash_data"]
 
 
 if __name__ == "__main__":
-    run()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Actualiza la hoja DASH_DATA.")
+    parser.add_argument("--full", action="store_true", help="Reconstruye DASH_DATA completa.")
+    run(full=parser.parse_args().full)
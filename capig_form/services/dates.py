@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Interpretacion de fechas de las hojas (FECHA_AFILIACION, fechas de registro).
+
+En Sheets una fecha llega como serial de Excel (lecturas UNFORMATTED_VALUE o
+celdas numericas), como "dd/mm/yyyy" (formato de la hoja) o como ISO
+"yyyy-mm-dd" (lo que escriben los formularios). `parse_date` reconoce los tres
+con expresiones simples y memoriza el resultado por valor; `parse_dates` y
+`parse_years` trabajan sobre una columna entera e interpretan cada valor
+distinto una sola vez, que es lo habitual en columnas de fechas (muchas
+filas comparten fecha).
+
+Solo se toman como serial los numeros de cinco cifras (1927-2173): "2019" es
+un año, no el serial de 1905.
+
+Con lenient=True, lo que no encaja en esos formatos (o encaja pero no es una
+fecha valida, como "12/31/2020" con el mes primero) se pasa a
+pandas.to_datetime(dayfirst=True) como hacian los jobs, solo para los valores
+distintos que quedan.
+"""
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+EXCEL_EPOCH = datetime(1899, 12, 30)
+CACHE_SIZE = 32768
+
+_SERIAL_RE = re.compile(r"-?\d+(\.\d+)?")
+# Seriales plausibles para una fecha de las hojas: 10000 (1927) a 99999 (2173).
+SERIAL_MIN = 10000
+SERIAL_MAX = 100000
+_DMY_RE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})")
+_ISO_RE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})(?:[T ][\d:.]+)?")
+
+
+def from_excel_serial(value):
+    """Serial de Excel (numero o texto numerico) -> date; None si no aplica o es 0."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if not _SERIAL_RE.fullmatch(value):
+            return None
+        value = float(value)
+    if not isinstance(value, (int, float)) or not value:
+        return None
+    try:
+        return (EXCEL_EPOCH + timedelta(days=float(value))).date()
+    except (OverflowError, ValueError):
+        return None
+
+
+def _from_parts(year, month, day):
+    try:
+        return date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def _lenient(text):
+    import warnings
+
+    import pandas as pd
+
+    with warnings.catch_warnings():
+        # pandas avisa cuando dayfirst no aplica (p. ej. "2019/05/04").
+        warnings.simplefilter("ignore", UserWarning)
+        ts = pd.to_datetime(text, errors="coerce", dayfirst=True)
+    if pd.isna(ts):
+        return None
+    return ts.date()
+
+
+def _plausible_serial(value):
+    try:
+        return SERIAL_MIN <= float(value) < SERIAL_MAX
+    except (TypeError, ValueError):
+        return False
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_cached(value, lenient):
+    if not isinstance(value, str):
+        if _plausible_serial(value):
+            return from_excel_serial(value)
+        value = str(value)
+    text = value.strip()
+    if not text:
+        return None
+    parsed = None
+    match = _DMY_RE.fullmatch(text)
+    if match:
+        parsed = _from_parts(match.group(3), match.group(2), match.group(1))
+    else:
+        match = _ISO_RE.fullmatch(text)
+        if match:
+            parsed = _from_parts(*match.groups())
+        elif _SERIAL_RE.fullmatch(text) and _plausible_serial(text):
+            parsed = from_excel_serial(text)
+    if parsed is None and lenient:
+        # Formatos que no reconocemos o fechas invalidas para ellos
+        # ("12/31/2020", "2019"): se interpretan como antes.
+        return _lenient(text)
+    return parsed
+
+
+def parse_date(value, lenient=False):
+    """date de un valor de celda, o None si esta vacio o no se reconoce."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.date() if isinstance(value, datetime) else value
+    if not isinstance(value, (str, int, float)):
+        value = str(value)
+    return _parse_cached(value, lenient)
+
+
+def parse_dates(values, lenient=False):
+    """parse_date sobre una columna: cada valor distinto se interpreta una vez."""
+    seen = {}
+    result = []
+    for value in values:
+        try:
+            parsed = seen[value]
+        except KeyError:
+            parsed = seen[value] = parse_date(value, lenient)
+        except TypeError:  # valor no hasheable
+            parsed = parse_date(value, lenient)
+        result.append(parsed)
+    return result
+
+
+def parse_years(values, lenient=True):
+    """Año de cada valor de la columna (None si no es una fecha)."""
+    return [parsed.year if parsed is not None else None for parsed in parse_dates(values, lenient)]
+
+
+def cache_info():
+    return _parse_cached.cache_info()
@@ -0,0 +1,544 @@
+# -*- coding: utf-8 -*-
+"""
+Backend falso de Google Sheets, en memoria (y opcionalmente respaldado en un
+archivo JSON), para correr vistas, jobs y benchmarks sin credenciales.
+
+Implementa el subconjunto de gspread que usa el proyecto: Spreadsheet
+(worksheet, worksheets, get_worksheet, add_worksheet, fetch_sheet_metadata),
+Worksheet (get_all_values, get_all_records, row_values, col_values, update,
+update_cell, append_rows, add_rows, clear, format) y las llamadas de lote del
+HTTPClient (values_batch_update, values_batch_clear, values_batch_get).
+
+Cada operacion cuenta como la llamada a la API que haria gspread, de modo que
+`stats()["calls"]` sirve para comparar el consumo de cuota de dos versiones
+del codigo. Se puede inyectar latencia y errores (429/5xx) por llamada; con
+quota=True cada llamada pasa ademas por rate_limit, igual que QuotaHTTPClient.
+
+    backend = FakeSheetsBackend(latency=0.05)
+    backend.create_spreadsheet("libro", {"SOCIOS": [["", ""], ["RUC", "RAZON_SOCIAL"]]})
+    set_backend(backend)   # google_sheets_service.set_backend
+"""
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import requests
+from gspread.exceptions import APIError, GSpreadException, SpreadsheetNotFound, WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range, numericise_all, rowcol_to_a1, to_records
+
+from capig_form.services import metrics, rate_limit
+from capig_form.services.sheets_client import SheetsBackend
+
+DEFAULT_ROWS = 1000
+DEFAULT_COLS = 26
+READ_OPERATIONS = {"spreadsheets.get", "values.get", "values.batchGet"}
+
+
+def _api_error(status, message):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(
+        {"error": {"code": status, "message": message, "status": "FAKE"}}).encode("utf-8")
+    return APIError(response)
+
+
+def _formatted(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _split_range(range_name):
+    """"'Hoja'!A1:B2" -> ("Hoja", "A1:B2"); sin "!" el titulo es None."""
+    if "!" not in range_name:
+        title = range_name if range_name.startswith("'") else None
+        cells = None if title else range_name
+    else:
+        title, cells = range_name.rsplit("!", 1)
+    if title and title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+    return title, cells or None
+
+
+class FakeSheetsBackend(SheetsBackend):
+    """
+    Libro(s) falsos compartidos por todos los hilos del proceso.
+
+    latency: segundos por llamada, o una tupla (min, max) para latencia variable.
+    error_rate: probabilidad de que una llamada falle con `error_status`.
+    path: archivo JSON desde el que se cargan los libros y donde se guardan
+    tras cada escritura (un solo proceso a la vez).
+    quota: consumir cuota y reintentar errores con rate_limit.call_with_quota.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=0.0, error_rate=0.0, error_status=503, path=None, seed=None,
+                 quota=False):
+        self.latency = latency
+        self.quota = quota
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.path = path
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._spreadsheets = {}
+        self._scheduled_errors = []
+        self.calls = Counter()
+        self.errors_injected = 0
+        self.client = FakeClient(self)
+        if path and os.path.exists(path):
+            self.load(path)
+
+    # ------------------------------------------------------------------
+    # SheetsBackend
+    # ------------------------------------------------------------------
+    def get_client(self):
+        return self.client
+
+    def open_spreadsheet(self, client, sheet_id):
+        # Como la API real: un solo spreadsheets.get trae documento y hojas.
+        spreadsheet = client.open_by_key(sheet_id)
+        return spreadsheet, spreadsheet._metadata()
+
+    def worksheet_from_properties(self, spreadsheet, properties):
+        return spreadsheet._worksheet_by_id(properties["sheetId"])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.name,
+                "calls": dict(self.calls),
+                "total_calls": sum(self.calls.values()),
+                "errors_injected": self.errors_injected,
+            }
+
+    def reset(self):
+        self.reset_stats()
+
+    # ------------------------------------------------------------------
+    # Datos
+    # ------------------------------------------------------------------
+    def create_spreadsheet(self, spreadsheet_id, sheets=None, title=None):
+        """Crea (o reemplaza) un libro; `sheets` es {titulo: filas}."""
+        with self._lock:
+            spreadsheet = FakeSpreadsheet(self, spreadsheet_id, title or spreadsheet_id)
+            for sheet_title, values in (sheets or {}).items():
+                spreadsheet._add(sheet_title, values=values)
+            self._spreadsheets[spreadsheet_id] = spreadsheet
+            self._persist()
+            return spreadsheet
+
+    def values(self, spreadsheet_id, title):
+        """Copia de los valores guardados en una hoja (sin contar llamadas)."""
+        with self._lock:
+            ws = self._spreadsheets[spreadsheet_id]._by_title(title)
+            return [list(row) for row in ws._values]
+
+    def load(self, path):
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        with self._lock:
+            self._spreadsheets = {}
+            for spreadsheet_id, doc in data.get("spreadsheets", {}).items():
+                spreadsheet = FakeSpreadsheet(self, spreadsheet_id, doc.get("title", spreadsheet_id))
+                for sheet in doc.get("sheets", []):
+                    spreadsheet._add(
+                        sheet["title"], values=sheet.get("values", []),
+                        rows=sheet.get("rows"), cols=sheet.get("cols"),
+                    )
+                self._spreadsheets[spreadsheet_id] = spreadsheet
+
+    def dump(self):
+        with self._lock:
+            return {
+                "spreadsheets": {
+                    spreadsheet_id: {
+                        "title": spreadsheet.title,
+                        "sheets": [
+                            {"title": ws.title, "rows": ws.row_count, "cols": ws.col_count,
+                             "values": ws._values}
+                            for ws in spreadsheet._worksheets
+                        ],
+                    }
+                    for spreadsheet_id, spreadsheet in self._spreadsheets.items()
+                }
+            }
+
+    def _persist(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(self.dump(), fh, ensure_ascii=False, default=str)
+        os.replace(tmp, self.path)
+
+    # ------------------------------------------------------------------
+    # Latencia, errores y conteo
+    # ------------------------------------------------------------------
+    def fail_next(self, times=1, status=503, operation=None):
+        """Hace fallar las proximas `times` llamadas (o solo las de `operation`)."""
+        with self._lock:
+            self._scheduled_errors.extend([(operation, status)] * times)
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls.clear()
+            self.errors_injected = 0
+
+    def _call(self, operation, worksheet=""):
+        """Registra una llamada a la API, aplica latencia y, si toca, falla."""
+        if self.quota:
+            kind = rate_limit.READ if operation in READ_OPERATIONS else rate_limit.WRITE
+            rate_limit.call_with_quota(
+                kind, self._tracked_request, operation, worksheet,
+                idempotent=operation in rate_limit.IDEMPOTENT_OPERATIONS)
+        else:
+            self._tracked_request(operation, worksheet)
+
+    def _tracked_request(self, operation, worksheet):
+        with metrics.track_sheets_call(operation, worksheet):
+            self._request(operation)
+
+    def _request(self, operation):
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            latency = self._random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+        with self._lock:
+            self.calls[operation] += 1
+            status = None
+            for idx, (target, scheduled) in enumerate(self._scheduled_errors):
+                if target in (None, operation):
+                    status = scheduled
+                    del self._scheduled_errors[idx]
+                    break
+            if status is None and self.error_rate and self._random.random() < self.error_rate:
+                status = self.error_status
+            if status is not None:
+                self.errors_injected += 1
+                raise _api_error(status, f"Error inyectado en {operation}")
+
+    def _spreadsheet(self, spreadsheet_id):
+        with self._lock:
+            spreadsheet = self._spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None:
+            raise SpreadsheetNotFound(spreadsheet_id)
+        return spreadsheet
+
+
+class FakeClient:
+    """Hace de gspread.Client y de su HTTPClient (values_batch_*)."""
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def open_by_key(self, key):
+        self._backend._call("spreadsheets.get")
+        return self._backend._spreadsheet(key)
+
+    def values_batch_update(self, id, body=None):
+        self._backend._call("values.batchUpdate")
+        spreadsheet = self._backend._spreadsheet(id)
+        with self._backend._lock:
+            for item in (body or {}).get("data", []):
+                ws, cells = spreadsheet._resolve(item["range"])
+                ws._write(cells or "A1", item.get("values", []))
+            self._backend._persist()
+        return {"spreadsheetId": id, "totalUpdatedCells": sum(
+            len(row) for item in (body or {}).get("data", []) for row in item.get("values", []))}
+
+    def values_batch_clear(self, id, params=None, body=None):
+        self._backend._call("values.batchClear")
+        spreadsheet = self._backend._spreadsheet(id)
+        with self._backend._lock:
+            for range_name in (body or {}).get("ranges", []):
+                ws, cells = spreadsheet._resolve(range_name)
+                ws._clear(cells)
+            self._backend._persist()
+        return {"spreadsheetId": id, "clearedRanges": (body or {}).get("ranges", [])}
+
+    def values_batch_get(self, id, ranges, params=None):
+        self._backend._call("values.batchGet")
+        spreadsheet = self._backend._spreadsheet(id)
+        value_ranges = []
+        for range_name in ranges:
+            ws, cells = spreadsheet._resolve(range_name)
+            render = (params or {}).get("valueRenderOption")
+            value_ranges.append({"range": range_name, "values": ws._read(cells, render)})
+        return {"spreadsheetId": id, "valueRanges": value_ranges}
+
+    def fetch_sheet_metadata(self, id, params=None):
+        self._backend._call("spreadsheets.get")
+        return self._backend._spreadsheet(id)._metadata()
+
+
+class FakeSpreadsheet:
+    def __init__(self, backend, spreadsheet_id, title):
+        self._backend = backend
+        self.id = spreadsheet_id
+        self.title = title
+        self.client = backend.client
+        self._worksheets = []
+        self._next_id = 0
+
+    def _add(self, title, values=None, rows=None, cols=None):
+        values = [list(row) for row in (values or [])]
+        ws = FakeWorksheet(
+            self, self._next_id, title, len(self._worksheets),
+            rows or max(DEFAULT_ROWS, len(values)),
+            cols or max([DEFAULT_COLS] + [len(row) for row in values]),
+            values,
+        )
+        self._next_id += 1
+        self._worksheets.append(ws)
+        return ws
+
+    def _by_title(self, title):
+        for ws in self._worksheets:
+            if ws.title == title:
+                return ws
+        raise WorksheetNotFound(title)
+
+    def _worksheet_by_id(self, sheet_id):
+        for ws in self._worksheets:
+            if ws.id == sheet_id:
+                return ws
+        raise WorksheetNotFound(sheet_id)
+
+    def _resolve(self, range_name):
+        title, cells = _split_range(range_name)
+        ws = self._by_title(title) if title else self._worksheets[0]
+        return ws, cells
+
+    def _metadata(self):
+        return {
+            "spreadsheetId": self.id,
+            "properties": {"title": self.title},
+            "sheets": [{"properties": ws._properties()} for ws in self._worksheets],
+        }
+
+    def fetch_sheet_metadata(self, params=None):
+        self._backend._call("spreadsheets.get")
+        return self._metadata()
+
+    def worksheet(self, title):
+        self._backend._call("spreadsheets.get")
+        return self._by_title(title)
+
+    def worksheets(self, exclude_hidden=False):
+        self._backend._call("spreadsheets.get")
+        return list(self._worksheets)
+
+    def get_worksheet(self, index):
+        self._backend._call("spreadsheets.get")
+        try:
+            return self._worksheets[index]
+        except IndexError:
+            return None
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        self._backend._call("spreadsheets.batchUpdate")
+        with self._backend._lock:
+            if any(ws.title == title for ws in self._worksheets):
+                raise _api_error(400, f"Ya existe una hoja con el nombre '{title}'.")
+            ws = self._add(title, rows=int(rows), cols=int(cols))
+            self._backend._persist()
+            return ws
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, sheet_id, title, index, rows, cols, values):
+        self.spreadsheet = spreadsheet
+        self.spreadsheet_id = spreadsheet.id
+        self.client = spreadsheet.client
+        self.id = sheet_id
+        self.title = title
+        self.index = index
+        self.row_count = rows
+        self.col_count = cols
+        self._backend = spreadsheet._backend
+        self._values = values
+        self.formats = []
+
+    def __repr__(self):
+        return f"<FakeWorksheet {self.title!r} id:{self.id}>"
+
+    def _properties(self):
+        return {
+            "sheetId": self.id,
+            "title": self.title,
+            "index": self.index,
+            "gridProperties": {"rowCount": self.row_count, "columnCount": self.col_count},
+        }
+
+    # ------------------------------------------------------------------
+    # Acceso a celdas (sin contar llamadas)
+    # ------------------------------------------------------------------
+    def _bounds(self, cells):
+        """Rango A1 -> (fila0, col0, fila_fin, col_fin) 0-based, fin exclusivo o None."""
+        if not cells:
+            return 0, 0, None, None
+        grid = a1_range_to_grid_range(cells)
+        return (
+            grid.get("startRowIndex", 0), grid.get("startColumnIndex", 0),
+            grid.get("endRowIndex"), grid.get("endColumnIndex"),
+        )
+
+    def _trimmed(self):
+        # Como la API: sin filas vacias al final ni celdas vacias a la derecha.
+        rows = []
+        for row in self._values:
+            row = list(row)
+            while row and row[-1] in ("", None):
+                row.pop()
+            rows.append(row)
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def _read(self, cells=None, value_render_option=None):
+        start_row, start_col, end_row, end_col = self._bounds(cells)
+        with self._backend._lock:
+            rows = self._trimmed()[start_row:end_row]
+        rows = [row[start_col:end_col] for row in rows]
+        while rows and not rows[-1]:
+            rows.pop()
+        if value_render_option not in ("UNFORMATTED_VALUE", "FORMULA"):
+            rows = [[_formatted(v) for v in row] for row in rows]
+        return rows
+
+    def _write(self, cells, values):
+        start_row, start_col, _, _ = self._bounds(cells)
+        for r, row in enumerate(values):
+            target = start_row + r
+            while len(self._values) <= target:
+                self._values.append([])
+            current = self._values[target]
+            for c, value in enumerate(row):
+                col = start_col + c
+                while len(current) <= col:
+                    current.append("")
+                current[col] = value
+        self.row_count = max(self.row_count, len(self._values))
+        self.col_count = max([self.col_count] + [len(row) for row in self._values])
+
+    def _clear(self, cells=None):
+        if not cells:
+            self._values = []
+            return
+        start_row, start_col, end_row, end_col = self._bounds(cells)
+        for row in self._values[start_row:end_row]:
+            for col in range(start_col, min(len(row), end_col if end_col is not None else len(row))):
+                row[col] = ""
+
+    # ------------------------------------------------------------------
+    # Subconjunto de gspread.Worksheet
+    # ------------------------------------------------------------------
+    def get_all_values(self, range_name=None, value_render_option=None, pad_values=True, **kwargs):
+        self._backend._call("values.get", self.title)
+        rows = self._read(range_name, value_render_option)
+        if pad_values and rows:
+            width = max(len(row) for row in rows)
+            rows = [row + [""] * (width - len(row)) for row in rows]
+        return rows
+
+    get_values = get_all_values
+
+    def get_all_records(self, head=1, expected_headers=None, value_render_option=None,
+                        default_blank="", numericise_ignore=(), allow_underscores_in_numeric_literals=False,
+                        empty2zero=False):
+        values = self.get_all_values(value_render_option=value_render_option)
+        if len(values) < head:
+            return []
+        keys = values[head - 1]
+        values = values[head:]
+        duplicates = [key for key, count in Counter(keys).items() if count > 1]
+        if expected_headers is None and duplicates:
+            raise GSpreadException(
+                f"the header row in the worksheet contains duplicates: {duplicates}")
+        if list(numericise_ignore) != ["all"]:
+            values = [
+                numericise_all(row, empty2zero, default_blank,
+                               allow_underscores_in_numeric_literals, list(numericise_ignore))
+                for row in values
+            ]
+        return to_records(keys, values)
+
+    def row_values(self, row, value_render_option=None, **kwargs):
+        self._backend._call("values.get", self.title)
+        rows = self._read(f"A{row}:{row}", value_render_option)
+        return rows[0] if rows else []
+
+    def col_values(self, col, value_render_option="FORMATTED_VALUE"):
+        self._backend._call("values.get", self.title)
+        with self._backend._lock:
+            column = [row[col - 1] if len(row) >= col else "" for row in self._values]
+        while column and column[-1] in ("", None):
+            column.pop()
+        if value_render_option not in ("UNFORMATTED_VALUE", "FORMULA"):
+            column = [_formatted(v) for v in column]
+        return column
+
+    def update(self, values=None, range_name=None, **kwargs):
+        # Acepta tambien el orden antiguo de gspread: update("A1", values).
+        if isinstance(values, str):
+            values, range_name = range_name, values
+        self._backend._call("values.update", self.title)
+        with self._backend._lock:
+            self._write(range_name or "A1", values or [])
+            self._backend._persist()
+        return {"updatedRange": f"'{self.title}'!{range_name or 'A1'}"}
+
+    def update_cell(self, row, col, value):
+        return self.update([[value]], rowcol_to_a1(row, col))
+
+    def append_rows(self, values, value_input_option="RAW", insert_data_option=None,
+                    table_range=None, include_values_in_response=None):
+        self._backend._call("values.append", self.title)
+        with self._backend._lock:
+            start_row = self._bounds(table_range)[0] if table_range else 0
+            last = len(self._trimmed())
+            first_row = max(last, start_row)
+            self._write(rowcol_to_a1(first_row + 1, 1), values)
+            self._backend._persist()
+        width = max((len(row) for row in values), default=1)
+        updated = f"{rowcol_to_a1(first_row + 1, 1)}:{rowcol_to_a1(first_row + len(values), width)}"
+        return {
+            "spreadsheetId": self.spreadsheet_id,
+            "tableRange": f"'{self.title}'!{table_range or 'A1'}",
+            "updates": {"updatedRange": f"'{self.title}'!{updated}", "updatedRows": len(values)},
+        }
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def add_rows(self, rows):
+        self._backend._call("spreadsheets.batchUpdate")
+        self.row_count += int(rows)
+
+    def add_cols(self, cols):
+        self._backend._call("spreadsheets.batchUpdate")
+        self.col_count += int(cols)
+
+    def clear(self):
+        self._backend._call("values.clear", self.title)
+        with self._backend._lock:
+            self._clear()
+            self._backend._persist()
+        return {"clearedRange": f"'{self.title}'"}
+
+    def format(self, ranges, format):
+        self._backend._call("spreadsheets.batchUpdate")
+        self.formats.append((ranges, format))
+        return {}
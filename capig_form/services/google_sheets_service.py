@@ -3,18 +3,18 @@ import base64
 import json
 import logging
 import re
-import traceback
+import threading
+import time
 
-import gspread
+from cachetools import TTLCache
 from django.conf import settings
-from google.oauth2.service_account import Credentials
-from gspread.utils import rowcol_to_a1
-from gspread.exceptions import APIError, SpreadsheetNotFound, WorksheetNotFound
 
-try:
-    from googleapiclient.errors import HttpError
-except ImportError:  # pragma: no cover - dependencia opcional
-    HttpError = Exception
+from capig_form.log import diagnostic
+from capig_form.services import sheet_schema, tracing
+
+# gspread, google-auth y googleapiclient se importan al usarse (ver
+# _api_errors y _build_credentials): importar este modulo no debe costarle
+# al worker ~0.3 s y decenas de MB antes de atender /health/.
 
 
 logger = logging.getLogger(__name__)
@@ -23,26 +23,6 @@ SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 REQUIRED_SERVICE_FIELDS = {"private_key", "client_email", "project_id"}
 
 
-def _print_utf8(message):
-    """
-    Imprime en consola sin reventar en Windows cuando stdout tiene encoding CP1252.
-    Silencia OSError errno 22 (invalid argument) para no romper la vista.
-    """
-    try:
-        text = str(message).encode("utf-8", errors="replace").decode("utf-8")
-        try:
-            # En Windows, usar buffer evita problemas de encoding.
-            import sys
-            sys.stdout.buffer.write(
-                (text + "\n").encode("utf-8", errors="replace"))
-            sys.stdout.buffer.flush()
-        except Exception:
-            print(text)
-    except OSError as exc:  # pragma: no cover - defensivo
-        if getattr(exc, "errno", None) != 22:
-            raise
-
-
 def _load_service_account_info():
     try:
         raw_service = settings.SERVICE
@@ -77,101 +57,403 @@ def _load_service_account_info():
     return info
 
 
-SERVICE_ACCOUNT_INFO = _load_service_account_info()
+_service_account_info = None
+_service_account_lock = threading.Lock()
+
+
+def get_service_account_info():
+    """Interpreta SERVICE la primera vez que se necesita, no al importar el modulo."""
+    global _service_account_info
+    with _service_account_lock:
+        if _service_account_info is None:
+            _service_account_info = _load_service_account_info()
+        return _service_account_info
+
+
+def __getattr__(name):
+    # Compatibilidad: SERVICE_ACCOUNT_INFO era una constante del modulo.
+    if name == "SERVICE_ACCOUNT_INFO":
+        return get_service_account_info()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ======================
 # CLIENTE DE AUTENTICACION
 # ======================
+def _build_credentials():
+    from google.oauth2.service_account import Credentials
+
+    return Credentials.from_service_account_info(
+        get_service_account_info(), scopes=SCOPES)
+
+
+def _create_backend():
+    name = getattr(settings, "SHEETS_BACKEND", "google")
+    if name == "google":
+        from capig_form.services.sheets_client import GoogleSheetsBackend
+
+        return GoogleSheetsBackend(_build_credentials)
+    if name == "fake":
+        from capig_form.services.fake_sheets import FakeSheetsBackend
+
+        return FakeSheetsBackend(
+            latency=getattr(settings, "SHEETS_FAKE_LATENCY", 0.0),
+            error_rate=getattr(settings, "SHEETS_FAKE_ERROR_RATE", 0.0),
+            path=getattr(settings, "SHEETS_FAKE_PATH", "") or None,
+            quota=getattr(settings, "SHEETS_FAKE_QUOTA", False),
+        )
+    raise RuntimeError(f"SHEETS_BACKEND desconocido: {name!r} (usa 'google' o 'fake').")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _api_errors():
+    """Excepciones de la API de Google (HttpError solo si googleapiclient esta instalado)."""
+    from gspread.exceptions import APIError
+
+    try:
+        from googleapiclient.errors import HttpError
+    except ImportError:  # pragma: no cover - dependencia opcional
+        return (APIError,)
+    return (APIError, HttpError)
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _create_backend()
+        return _backend
+
+
+def set_backend(backend):
+    """Reemplaza el backend (p. ej. por un FakeSheetsBackend) y devuelve el anterior."""
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    invalidate_sheet_metadata()
+    sheet_schema.invalidate_schema()
+    return previous
+
+
 def _get_client():
     try:
-        creds = Credentials.from_service_account_info(
-            SERVICE_ACCOUNT_INFO, scopes=SCOPES)
-        return gspread.authorize(creds)
+        return get_backend().get_client()
     except Exception as exc:
         logger.exception("Error autenticando con Google Sheets.")
-        _print_utf8(traceback.format_exc())
         raise RuntimeError(
             "No fue posible autenticarse con Google Sheets.") from exc
 
 
+def get_client_stats():
+    """Renovaciones de token y conexiones nuevas (o llamadas simuladas) de este worker."""
+    return get_backend().stats()
+
+
+# ==========================
+# CACHE DE METADATA DEL DOCUMENTO
+# ==========================
+DEFAULT_METADATA_TTL = 300
+_METADATA_MAX_DOCUMENTS = 16
+
+_metadata_cache = TTLCache(
+    maxsize=_METADATA_MAX_DOCUMENTS,
+    ttl=getattr(settings, "SHEETS_METADATA_TTL", DEFAULT_METADATA_TTL),
+)
+_metadata_lock = threading.Lock()
+
+
+def _fetch_sheet_metadata(client, sheet_id):
+    """Abre el documento y guarda id, titulo y tamano de cada hoja (un spreadsheets.get)."""
+    spreadsheet, metadata = get_backend().open_spreadsheet(client, sheet_id)
+    worksheets = {}
+    for item in metadata.get("sheets", []):
+        properties = item.get("properties", {})
+        title = properties.get("title")
+        if title is not None and title not in worksheets:
+            worksheets[title] = properties
+
+    available_titles = list(worksheets)
+    diagnostic(logger, "Metadata de %s cargada; hojas: %s", sheet_id, available_titles)
+
+    return {
+        "client": client,
+        "spreadsheet": spreadsheet,
+        "worksheets": worksheets,
+        "loaded_at": time.time(),
+    }
+
+
+def _get_sheet_metadata(client, sheet_id, refresh=False):
+    with _metadata_lock:
+        entry = _metadata_cache.get(sheet_id)
+    # Tras un fork el cliente cambia; el Spreadsheet cacheado usaria la sesion vieja.
+    if refresh or entry is None or entry["client"] is not client:
+        with tracing.span("cache metadata", category="cache", result="miss", refresh=refresh):
+            entry = _fetch_sheet_metadata(client, sheet_id)
+        with _metadata_lock:
+            _metadata_cache[sheet_id] = entry
+    else:
+        tracing.event("cache metadata", category="cache", result="hit")
+    return entry
+
+
+def invalidate_sheet_metadata(sheet_id=None):
+    """Olvida la metadata de un documento (o de todos si no se indica)."""
+    with _metadata_lock:
+        if sheet_id is None:
+            _metadata_cache.clear()
+        else:
+            _metadata_cache.pop(sheet_id, None)
+
+
+def _worksheet_from_metadata(entry, properties):
+    return get_backend().worksheet_from_properties(entry["spreadsheet"], properties)
+
+
 # ==========================
 # OBTENER HOJA POR NOMBRE
 # ==========================
 def get_google_sheet(sheet_id, worksheet_name):
+    from gspread.exceptions import SpreadsheetNotFound, WorksheetNotFound
+
     try:
         client = _get_client()
-        spreadsheet = client.open_by_key(sheet_id)
-        worksheets = spreadsheet.worksheets()
-        available_titles = [ws.title for ws in worksheets]
+        entry = _get_sheet_metadata(client, sheet_id)
+        properties = entry["worksheets"].get(worksheet_name)
 
-        _print_utf8(f"sheet_id solicitado: {sheet_id}")
-        _print_utf8(f"worksheet_name solicitado: {repr(worksheet_name)}")
-        _print_utf8(f"Hojas disponibles en el documento: {available_titles}")
+        if properties is None:
+            # La hoja pudo crearse despues de cachear: recargar una sola vez.
+            entry = _get_sheet_metadata(client, sheet_id, refresh=True)
+            properties = entry["worksheets"].get(worksheet_name)
 
-        if worksheet_name not in available_titles:
+        if properties is None:
+            available_titles = list(entry["worksheets"])
             logger.warning(
                 "El nombre de hoja '%s' no coincide exactamente con las hojas disponibles: %s",
                 worksheet_name,
                 available_titles,
             )
+            raise WorksheetNotFound(worksheet_name)
 
-        return spreadsheet.worksheet(worksheet_name)
+        return _worksheet_from_metadata(entry, properties)
 
     except WorksheetNotFound as exc:
         msg = f"La hoja '{worksheet_name}' no fue encontrada. Revisa mayusculas y espacios."
         logger.exception(msg)
-        _print_utf8(msg)
-        _print_utf8(traceback.format_exc())
         raise
 
     except SpreadsheetNotFound as exc:
         msg = f"No se encontro el Google Sheet con ID: {sheet_id}"
         logger.exception(msg)
-        _print_utf8(msg)
-        _print_utf8(traceback.format_exc())
         raise
 
     except Exception as exc:
         msg = f"Error inesperado al acceder a la hoja: {exc}"
         logger.exception(msg)
-        _print_utf8(msg)
-        _print_utf8(traceback.format_exc())
         raise
 
 
-def find_first_empty_row(sheet, start_row=2):
+def batch_get_values(sheet_id, ranges, value_render_option=None):
+    """
+    Lee varios rangos (de una o varias hojas del documento) en un solo
+    values.batchGet. `ranges` va en notacion A1 absoluta ("'SOCIOS'",
+    "'DASH_DATA'!A:A"); devuelve las filas de cada rango en el mismo orden,
+    sin rellenar (las filas pueden tener largos distintos).
+    """
+    ranges = list(ranges)
+    if not ranges:
+        return []
+    client = _get_client()
+    entry = _get_sheet_metadata(client, sheet_id)
+    params = {"valueRenderOption": value_render_option} if value_render_option else None
+    response = entry["spreadsheet"].client.values_batch_get(sheet_id, ranges, params=params)
+    return [item.get("values", []) for item in response.get("valueRanges", [])]
+
+
+def _column_runs(indexes):
+    """[2, 3, 4, 7] -> [(2, 4), (7, 7)] (columnas 1-based contiguas)."""
+    runs = []
+    for idx in sorted(set(indexes)):
+        if runs and idx == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], idx)
+        else:
+            runs.append((idx, idx))
+    return runs
+
+
+def _projected_columns(schema, columns, pattern):
+    indexes = [schema.column_of(name) for name in columns]
+    missing = [name for name, idx in zip(columns, indexes) if idx is None]
+    if pattern:
+        regex = re.compile(pattern)
+        indexes += [
+            idx for idx, col in enumerate(schema.header, start=1)
+            if regex.fullmatch(sheet_schema.normalize_header(col))
+        ]
+    return sorted({idx for idx in indexes if idx}), missing
+
+
+class ProjectedRead:
     """
-    Devuelve el índice de la primera fila vacía (sin texto) a partir de start_row.
-    Usa UNFORMATTED_VALUE para no introducir espacios por formato.
+    Lectura de algunas columnas de una hoja (ver get_projected_records),
+    separada en los rangos a pedir y el armado de los registros para poder
+    juntarla con otras lecturas en un mismo values.batchGet (batch_read).
+    Si el esquema no esta en cache, crearla lo detecta con una lectura.
     """
-    values = sheet.get_all_values(value_render_option="UNFORMATTED_VALUE")
-    if not values:
-        return start_row
-    for idx, row in enumerate(values[start_row - 1:], start=start_row):
-        if not any(((str(cell) if cell is not None else "").strip() for cell in row)):
-            return idx
-    return len(values) + 1
+
+    def __init__(self, sheet, columns, head=1, required_keys=(), pattern=None):
+        from gspread.utils import absolute_range_name, rowcol_to_a1
+
+        self.sheet = sheet
+        # Un esquema recien detectado no se vuelve a validar.
+        self.fresh = sheet_schema.cached_schema(sheet, required_keys) is None
+        self.schema = sheet_schema.get_schema(sheet, preferred=head, required_keys=required_keys)
+        self.indexes, self.missing = _projected_columns(self.schema, list(columns), pattern)
+        self.runs = _column_runs(self.indexes)
+        self.ranges = [
+            absolute_range_name(
+                sheet.title,
+                f"{rowcol_to_a1(self.schema.head, start)}:{rowcol_to_a1(1, end).rstrip('0123456789')}",
+            )
+            for start, end in self.runs
+        ]
+
+    def parse(self, results):
+        """
+        (fila de encabezado, encabezado leido, registros), o None si el
+        esquema cacheado quedo viejo (ya se invalido: hay que volver a leer).
+        """
+        height = max((len(rows) for rows in results), default=0)
+        table = [[] for _ in range(height)]
+        for (start, end), rows in zip(self.runs, results):
+            width = end - start + 1
+            for row, values in zip(table, rows + [[]] * (height - len(rows))):
+                row.extend(list(values[:width]) + [""] * (width - len(values)))
+
+        header = table[0] if table else []
+        expected = [
+            self.schema.header[idx - 1] if idx <= len(self.schema.header) else "" for idx in self.indexes
+        ]
+        unconfirmed = [name for name in self.missing if not self.schema.is_absent(name)]
+        if not self.fresh and (header != expected or unconfirmed):
+            # El encabezado cambio (o falta una columna): redetectar y releer.
+            sheet_schema.invalidate_schema(self.sheet)
+            return None
+        # Lo que falta tras una deteccion no existe en la hoja: no se vuelve a
+        # redetectar por eso mientras el encabezado leido no cambie.
+        self.schema.mark_absent(self.missing)
+        absent = {name: "" for name in self.missing}
+        return self.schema.head, header, [dict(absent, **dict(zip(header, row))) for row in table[1:]]
+
+
+class WholeSheetRead:
+    """La hoja completa (como get_all_values) para batch_read."""
+
+    def __init__(self, sheet):
+        from gspread.utils import absolute_range_name
+
+        self.sheet = sheet
+        self.ranges = [absolute_range_name(sheet.title)]
+
+    def parse(self, results):
+        from gspread.utils import fill_gaps
+
+        values = results[0] if results else []
+        return fill_gaps(values) if values else []
+
+
+def batch_read(sheet_id, reads):
+    """
+    Hace varias lecturas (ProjectedRead, WholeSheetRead; de una o varias hojas
+    del documento) en un solo values.batchGet. Devuelve el parse de cada una,
+    en el mismo orden.
+    """
+    ranges = [range_name for read in reads for range_name in read.ranges]
+    with tracing.span("batch read", category="records", ranges=len(ranges)):
+        results = batch_get_values(sheet_id, ranges, "UNFORMATTED_VALUE") if ranges else []
+    parsed = []
+    position = 0
+    for read in reads:
+        parsed.append(read.parse(results[position:position + len(read.ranges)]))
+        position += len(read.ranges)
+    return parsed
+
+
+def get_projected_records(sheet, columns, head=1, required_keys=(), pattern=None):
+    """
+    Registros con solo algunas columnas de la hoja, como get_all_records pero
+    sin bajar las demas.
+
+    `columns` son nombres de encabezado (se comparan normalizados) y `pattern`
+    una regex opcional para sumar columnas variables (p. ej. r"\\d{4}" para los
+    años). El esquema de la hoja (sheet_schema) traduce los nombres a rangos
+    A1 por columna, que se piden juntos en un values.batchGet; cada rango
+    incluye la fila de encabezado para validar el esquema cacheado y, si no
+    coincide, se redetecta y se lee de nuevo una vez.
+
+    Devuelve (fila de encabezado, encabezado leido, registros). Las columnas
+    que no existen en la hoja no estan en el encabezado y en los registros
+    quedan vacias ("").
+    """
+    while True:
+        read = ProjectedRead(sheet, columns, head=head, required_keys=required_keys, pattern=pattern)
+        with tracing.span("projected read", category="records", worksheet=sheet.title, columns=len(read.indexes)):
+            parsed = batch_read(sheet.spreadsheet_id, [read])[0]
+        if parsed is not None:
+            return parsed
 
 
-def ensure_row_capacity(sheet, target_row):
-    """Amplía la hoja si el índice de fila objetivo excede el tamaño actual."""
+# ========================
+# AGREGAR FILAS AL FINAL
+# ========================
+def append_rows_to_sheet(sheet, rows, header_row=1, value_input_option="USER_ENTERED",
+                         insert_data_option="OVERWRITE"):
+    """
+    Agrega filas despues de la ultima fila con datos usando values.append.
+
+    Sheets resuelve la fila destino en el servidor y serializa los append
+    concurrentes, asi que no hace falta descargar la hoja y dos workers nunca
+    escriben sobre la misma fila. Devuelve el numero de la primera fila escrita
+    (o None si la API no informa el rango).
+    """
+    from gspread.utils import a1_range_to_grid_range
+
+    if not rows:
+        return None
+    response = sheet.append_rows(
+        rows,
+        value_input_option=value_input_option,
+        insert_data_option=insert_data_option,
+        table_range=f"A{header_row}",
+    )
+    updated_range = ((response or {}).get("updates") or {}).get("updatedRange", "")
+    if "!" in updated_range:
+        updated_range = updated_range.rsplit("!", 1)[1]
     try:
-        current = sheet.row_count
-        if target_row > current:
-            sheet.add_rows(target_row - current)
-    except Exception:
-        # Silenciar si la API no expone row_count; se intentará y fallará en update si persiste.
-        pass
+        return a1_range_to_grid_range(updated_range)["startRowIndex"] + 1
+    except (KeyError, ValueError, TypeError, AttributeError):
+        return None
+
+
+def append_row_to_sheet(sheet, row, header_row=1, value_input_option="USER_ENTERED"):
+    """Atajo de append_rows_to_sheet para una sola fila."""
+    return append_rows_to_sheet(
+        sheet, [row], header_row=header_row, value_input_option=value_input_option)
 
 
 # ========================
 # INSERTAR UNA FILA
 # ========================
 def insert_row_to_sheet(sheet_id, worksheet_name, data):
+    from gspread.exceptions import SpreadsheetNotFound, WorksheetNotFound
+
+    sheet = None
     try:
         sheet = get_google_sheet(sheet_id, worksheet_name)
-        header = sheet.row_values(1)
+        header = sheet_schema.get_schema(sheet).header
         header_len = max(len(header), len(data))
 
         # Ajustar tamaño de data al header
@@ -180,36 +462,98 @@ def insert_row_to_sheet(sheet_id, worksheet_name, data):
         elif len(data) > header_len:
             data = data[:header_len]
 
-        target_row = find_first_empty_row(sheet, start_row=2)
-        start = f"A{target_row}"
-        end = rowcol_to_a1(target_row, header_len)
-        sheet.update(f"{start}:{end}", [data],
-                     value_input_option="USER_ENTERED")
-        logger.info("Insertando fila en hoja '%s': len=%s datos=%s",
-                    worksheet_name, len(data), data)
-        _print_utf8(
-            f"Insertando {len(data)} valores en '{worksheet_name}': {data}")
+        append_row_to_sheet(sheet, data, header_row=1)
+        logger.info("Fila insertada en hoja '%s' (%s valores).",
+                    worksheet_name, len(data), extra={"row": data})
         return True
 
     except (WorksheetNotFound, SpreadsheetNotFound) as exc:
         logger.exception(
             "No se pudo insertar porque no se encontro el documento u hoja.")
-        _print_utf8(traceback.format_exc())
         return False
 
-    except (APIError, HttpError) as exc:
+    except _api_errors() as exc:
         logger.exception(
             "La API de Google rechazo la insercion en '%s'.", worksheet_name)
-        _print_utf8(traceback.format_exc())
+        if sheet is not None:
+            # El encabezado cacheado pudo quedar viejo: se redetecta al reintentar.
+            sheet_schema.invalidate_schema(sheet)
         return False
 
     except Exception as exc:
         logger.exception(
             "Error inesperado al insertar fila en '%s'.", worksheet_name)
-        _print_utf8(traceback.format_exc())
         return False
 
 
+# ========================
+# ACTUALIZACIONES EN LOTE
+# ========================
+class SheetBatch:
+    """
+    Acumula ediciones de celdas y rangos (en una o varias hojas) y las envia
+    juntas: un values.batchClear y un values.batchUpdate por documento, sin
+    importar cuantas celdas u hojas se toquen.
+
+        batch = SheetBatch()
+        batch.update_cell(ws, 5, 4, "ACTIVO")
+        batch.update_range(otra_ws, "A1", filas)
+        batch.commit()
+    """
+
+    def __init__(self, value_input_option="USER_ENTERED"):
+        self.value_input_option = value_input_option
+        self._documents = {}
+
+    def _document(self, worksheet):
+        doc = self._documents.get(worksheet.spreadsheet_id)
+        if doc is None:
+            doc = {"client": worksheet.client, "clear": [], "data": []}
+            self._documents[worksheet.spreadsheet_id] = doc
+        return doc
+
+    def update_cell(self, worksheet, row, col, value):
+        from gspread.utils import rowcol_to_a1
+
+        return self.update_range(worksheet, rowcol_to_a1(row, col), [[value]])
+
+    def update_range(self, worksheet, range_name, values):
+        from gspread.utils import absolute_range_name
+
+        self._document(worksheet)["data"].append(
+            {"range": absolute_range_name(worksheet.title, range_name), "values": values}
+        )
+        return self
+
+    def clear(self, worksheet, range_name=None):
+        """Borra valores de la hoja (o de un rango); se aplica antes que las escrituras."""
+        from gspread.utils import absolute_range_name
+
+        self._document(worksheet)["clear"].append(
+            absolute_range_name(worksheet.title, range_name))
+        return self
+
+    def __len__(self):
+        return sum(len(doc["data"]) + len(doc["clear"]) for doc in self._documents.values())
+
+    def commit(self):
+        """Envia las ediciones y devuelve cuantas llamadas a la API hicieron falta."""
+        calls = 0
+        for spreadsheet_id, doc in self._documents.items():
+            client = doc["client"]
+            if doc["clear"]:
+                client.values_batch_clear(spreadsheet_id, body={"ranges": doc["clear"]})
+                calls += 1
+            if doc["data"]:
+                client.values_batch_update(
+                    spreadsheet_id,
+                    body={"valueInputOption": self.value_input_option, "data": doc["data"]},
+                )
+                calls += 1
+        self._documents = {}
+        return calls
+
+
 def update_sheet_with_dataframe(sheet_id, worksheet_name, df):
     """
     Borra la hoja indicada y sube el contenido del DataFrame.
@@ -225,14 +569,13 @@ def update_sheet_with_dataframe(sheet_id, worksheet_name, df):
         data = df.values.tolist()
         all_data = [headers] + data
 
-        _print_utf8(
-            f"Subiendo {len(data)} filas + headers a '{worksheet_name}' en {sheet_id}")
+        logger.info("Subiendo %s filas + headers a '%s' en %s.",
+                    len(data), worksheet_name, sheet_id)
         sheet.update(all_data)
         return True
 
     except Exception as exc:
         logger.exception("Error al actualizar hoja con DataFrame.")
-        _print_utf8(traceback.format_exc())
         return False
 
 # ========================
@@ -250,7 +593,19 @@ def get_column_data(sheet_id, worksheet_index=0, column='A', start_row=2):
                 "El parametro 'column' debe ser una sola letra de la A a la Z.")
 
         client = _get_client()
-        sheet = client.open_by_key(sheet_id).get_worksheet(worksheet_index)
+        entry = _get_sheet_metadata(client, sheet_id)
+        properties = next(
+            (
+                props
+                for props in entry["worksheets"].values()
+                if props.get("index") == worksheet_index
+            ),
+            None,
+        )
+        if properties is None:
+            sheet = entry["spreadsheet"].get_worksheet(worksheet_index)
+        else:
+            sheet = _worksheet_from_metadata(entry, properties)
 
         col_num = ord(column.upper()) - ord('A') + 1
         column_values = sheet.col_values(col_num)
@@ -264,11 +619,8 @@ def get_column_data(sheet_id, worksheet_index=0, column='A', start_row=2):
     except ValueError as exc:
         logger.exception(
             "Se recibio un identificador de columna invalido: '%s'.", column)
-        _print_utf8(str(exc))
-        _print_utf8(traceback.format_exc())
         raise
 
     except Exception as exc:
         logger.exception("Error al leer columna '%s'.", column)
-        _print_utf8(traceback.format_exc())
         return []
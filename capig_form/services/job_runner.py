@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Runner comun de los jobs batch (dash_data_job, tamano_empresas_job).
+
+Cada job declara las hojas que lee (REQUIRED_SHEETS) y expone
+`compute(snapshot, **opciones)`, que calcula sin escribir y devuelve un
+JobOutput. El runner:
+
+1. junta los requisitos de todos los jobs y descarga cada hoja una sola vez,
+   todas en un unico values.batchGet, en un WorkbookSnapshot;
+2. pasa el mismo snapshot al compute de cada job;
+3. publica al final: todas las salidas se encolan en un SheetBatch comun (un
+   values.batchClear y un values.batchUpdate) y despues corre el
+   after_commit de cada job (estado local, respaldos).
+
+    python -m capig_form.services.job_runner                 # todos los jobs
+    python -m capig_form.services.job_runner dash_data --full
+"""
+import importlib
+import logging
+import os
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+JOBS = {
+    "dash_data": "capig_form.services.dash_data_job",
+    "tamano_empresas": "capig_form.services.tamano_empresas_job",
+}
+
+# names: hojas candidatas (se usa la primera que exista); cells: rango A1
+# dentro de la hoja (None = hoja completa); optional: no falla si no existe.
+Requirement = namedtuple("Requirement", ["names", "cells", "optional"], defaults=(None, False))
+
+
+def _ensure_django():
+    import django
+    from django.conf import settings
+
+    if not settings.configured:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "capig_form.settings")
+        django.setup()
+
+
+class WorkbookSnapshot:
+    """
+    Valores de las hojas leidas para una corrida. Los jobs comparten las
+    mismas listas: no deben mutarlas.
+    """
+
+    def __init__(self, sheet_id, entry, values):
+        self.sheet_id = sheet_id
+        self.spreadsheet = entry["spreadsheet"]
+        self._entry = entry
+        self._values = values
+        self.fetched_at = time.time()
+
+    def title(self, names):
+        """Primera hoja existente entre `names` (o None)."""
+        worksheets = self._entry["worksheets"]
+        return next((name for name in names if name in worksheets), None)
+
+    def values(self, names, cells=None):
+        """Filas de la hoja (rellenadas como get_all_values); None si no existe."""
+        title = self.title(names)
+        if title is None:
+            return None
+        return self._values[(title, cells)]
+
+    def worksheet(self, names):
+        from capig_form.services.google_sheets_service import _worksheet_from_metadata
+
+        title = self.title(names)
+        if title is None:
+            return None
+        return _worksheet_from_metadata(self._entry, self._entry["worksheets"][title])
+
+    def ensure_worksheet(self, name, rows=2000, cols=20):
+        """Hoja de salida; se crea si no existe."""
+        ws = self.worksheet((name,))
+        if ws is not None:
+            return ws
+        from capig_form.services.google_sheets_service import invalidate_sheet_metadata
+
+        ws = self.spreadsheet.add_worksheet(title=name, rows=rows, cols=cols)
+        invalidate_sheet_metadata(self.sheet_id)
+        return ws
+
+
+class JobOutput:
+    """Resultado de un compute: que publicar y que hacer tras publicarlo."""
+
+    def __init__(self, name, publish, after_commit=None, summary=None):
+        self.name = name
+        self._publish = publish
+        self._after_commit = after_commit
+        self.summary = summary or {}
+
+    def publish(self, batch):
+        self._publish(batch)
+
+    def after_commit(self):
+        if self._after_commit is not None:
+            self._after_commit()
+
+
+def fetch_snapshot(sheet_id, requirements):
+    """Descarga las hojas requeridas (cada una una vez) en un solo values.batchGet."""
+    from gspread.exceptions import WorksheetNotFound
+    from gspread.utils import absolute_range_name, fill_gaps
+
+    from capig_form.services import google_sheets_service as gss
+
+    client = gss._get_client()
+
+    def missing_sheets(entry):
+        snapshot = WorkbookSnapshot(sheet_id, entry, {})
+        return snapshot, [req for req in requirements if not req.optional and snapshot.title(req.names) is None]
+
+    snapshot, missing = missing_sheets(gss._get_sheet_metadata(client, sheet_id))
+    if missing:
+        # Alguna hoja pudo crearse despues de cachear la metadata.
+        snapshot, missing = missing_sheets(gss._get_sheet_metadata(client, sheet_id, refresh=True))
+    if missing:
+        raise WorksheetNotFound(missing[0].names[0])
+
+    wanted = []
+    for req in requirements:
+        title = snapshot.title(req.names)
+        if title is not None and (title, req.cells) not in wanted:
+            wanted.append((title, req.cells))
+
+    start = time.perf_counter()
+    ranges = [absolute_range_name(title, cells) for title, cells in wanted]
+    results = gss.batch_get_values(sheet_id, ranges)
+    values = {key: fill_gaps(rows) if rows else [] for key, rows in zip(wanted, results)}
+    logger.info(
+        "Snapshot del libro en %.0f ms.", (time.perf_counter() - start) * 1000,
+        extra={"ranges": ranges, "row_counts": {title: len(values[(title, cells)]) for title, cells in wanted}},
+    )
+    return WorkbookSnapshot(sheet_id, snapshot._entry, values)
+
+
+def run_jobs(names=None, options=None, sheet_id=None):
+    """
+    Corre los jobs indicados (todos por defecto) sobre un unico snapshot.
+    `options` es {job: {opcion: valor}}, p. ej. {"dash_data": {"full": True}}.
+    """
+    _ensure_django()
+    from django.conf import settings
+
+    from capig_form.services.google_sheets_service import SheetBatch
+    from capig_form.services.rate_limit import BATCH, sheets_priority
+
+    names = list(names or JOBS)
+    options = options or {}
+    sheet_id = sheet_id or os.getenv("SHEET_PATH") or getattr(settings, "SHEET_PATH", "")
+    if not sheet_id:
+        raise RuntimeError("SHEET_PATH no esta configurado.")
+    modules = {name: importlib.import_module(JOBS[name]) for name in names}
+
+    # Los jobs ceden cuota a las vistas interactivas.
+    with sheets_priority(BATCH):
+        requirements = [req for module in modules.values() for req in module.REQUIRED_SHEETS]
+        snapshot = fetch_snapshot(sheet_id, requirements)
+
+        outputs = [modules[name].compute(snapshot, **options.get(name, {})) for name in names]
+
+        batch = SheetBatch(value_input_option="RAW")
+        for output in outputs:
+            output.publish(batch)
+        calls = batch.commit()
+        for output in outputs:
+            output.after_commit()
+
+    summary = {output.name: output.summary for output in outputs}
+    logger.info("Jobs publicados.", extra={"jobs": summary, "write_calls": calls})
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Corre los jobs batch sobre un snapshot comun del libro.")
+    parser.add_argument("jobs", nargs="*", help=f"Jobs a correr: {', '.join(JOBS)} (por defecto todos).")
+    parser.add_argument("--full", action="store_true", help="Reconstruye DASH_DATA completa.")
+    args = parser.parse_args()
+    unknown = sorted(set(args.jobs) - set(JOBS))
+    if unknown:
+        parser.error(f"jobs desconocidos: {', '.join(unknown)}")
+    run_jobs(args.jobs or None, options={"dash_data": {"full": args.full}})
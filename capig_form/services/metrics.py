@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+Metricas de la aplicacion en formato de texto de Prometheus.
+
+Cada llamada a la API de Sheets (real o del backend falso) se cuenta y se mide
+por operacion y hoja; MetricsMiddleware agrega por vista cuantas llamadas y
+cuanto tiempo de Sheets hizo cada request. Cada worker de gunicorn guarda su
+registro en METRICS_DIR (como mucho cada FLUSH_INTERVAL segundos) y el
+endpoint /metrics/ suma los archivos de todos los workers, asi que el scrape
+no depende de que worker atienda la peticion.
+
+Cuando un worker termina, el maestro de gunicorn (hook child_exit) suma su
+archivo a DEAD_FILE y lo borra: los totales no retroceden si el PID se
+reutiliza y no se acumulan archivos de workers reciclados. Al arrancar el
+maestro se borran los archivos de la corrida anterior.
+"""
+import atexit
+import contextlib
+import contextvars
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from urllib.parse import unquote
+
+from django.conf import settings
+
+from capig_form.services import tracing
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CALLS_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+FLUSH_INTERVAL = 5.0
+DEAD_FILE = "dead.json"
+
+HELP = {
+    "sheets_api_calls_total": ("counter", "Llamadas a la API de Google Sheets."),
+    "sheets_api_call_duration_seconds": ("histogram", "Duracion de cada llamada a la API de Sheets."),
+    "http_requests_total": ("counter", "Requests atendidos por vista."),
+    "http_request_duration_seconds": ("histogram", "Duracion de los requests por vista."),
+    "http_request_sheets_calls": ("histogram", "Llamadas a Sheets hechas por request."),
+    "http_request_sheets_seconds": ("histogram", "Tiempo en Sheets por request."),
+}
+
+_request_stats = contextvars.ContextVar("sheets_request_stats", default=None)
+
+
+class Registry:
+    """Contadores e histogramas en memoria de un proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels, value=1.0):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = {"buckets": list(buckets), "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+                self.histograms[key] = hist
+            for idx, bound in enumerate(hist["buckets"]):
+                if value <= bound:
+                    hist["counts"][idx] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                "histograms": [
+                    [name, list(labels), dict(hist, counts=list(hist["counts"]))]
+                    for (name, labels), hist in self.histograms.items()
+                ],
+            }
+
+    def clear(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def merge(self, snapshot):
+        with self._lock:
+            for name, labels, value in snapshot.get("counters", []):
+                key = (name, tuple(tuple(item) for item in labels))
+                self.counters[key] = self.counters.get(key, 0.0) + value
+            for name, labels, hist in snapshot.get("histograms", []):
+                key = (name, tuple(tuple(item) for item in labels))
+                current = self.histograms.get(key)
+                if current is None:
+                    self.histograms[key] = dict(hist, counts=list(hist["counts"]))
+                    continue
+                current["counts"] = [a + b for a, b in zip(current["counts"], hist["counts"])]
+                current["sum"] += hist["sum"]
+                current["count"] += hist["count"]
+
+
+registry = Registry()
+
+
+# ========================
+# REGISTRO DE LLAMADAS
+# ========================
+_VALUES_RE = re.compile(r"/values/([^?:]+)(?::(\w+))?")
+
+
+def classify_request(method, endpoint):
+    """Traduce un request de gspread a (operacion, hoja), p. ej. ("values.get", "SOCIOS")."""
+    method = method.upper()
+    path = endpoint.split("?", 1)[0]
+    match = _VALUES_RE.search(path)
+    if match:
+        title = unquote(match.group(1))
+        title = title.rsplit("!", 1)[0] if "!" in title else title
+        if title.startswith("'") and title.endswith("'"):
+            title = title[1:-1].replace("''", "'")
+        action = match.group(2) or {"GET": "get", "PUT": "update"}.get(method, method.lower())
+        return f"values.{action}", title
+    if "/values:" in path:
+        return f"values.{path.rsplit(':', 1)[1]}", ""
+    if path.endswith(":batchUpdate"):
+        return "spreadsheets.batchUpdate", ""
+    if "/spreadsheets" in path:
+        return f"spreadsheets.{'get' if method == 'GET' else method.lower()}", ""
+    return f"{method.lower()}", ""
+
+
+def record_sheets_call(operation, worksheet, seconds, error=False):
+    labels = {"operation": operation, "worksheet": worksheet or ""}
+    registry.inc("sheets_api_calls_total", dict(labels, status="error" if error else "ok"))
+    registry.observe("sheets_api_call_duration_seconds", labels, seconds)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+
+
+@contextlib.contextmanager
+def track_sheets_call(operation, worksheet=""):
+    start = time.perf_counter()
+    with tracing.span(f"sheets {operation}", category="sheets", worksheet=worksheet):
+        try:
+            yield
+        except Exception:
+            record_sheets_call(operation, worksheet, time.perf_counter() - start, error=True)
+            raise
+    record_sheets_call(operation, worksheet, time.perf_counter() - start)
+
+
+def begin_request():
+    """Empieza a acumular las llamadas a Sheets del request actual."""
+    return _request_stats.set({"calls": 0, "seconds": 0.0})
+
+
+def end_request(token, view, method, status, seconds):
+    stats = _request_stats.get() or {"calls": 0, "seconds": 0.0}
+    _request_stats.reset(token)
+    registry.inc("http_requests_total", {"view": view, "method": method, "status": str(status)})
+    registry.observe("http_request_duration_seconds", {"view": view}, seconds)
+    registry.observe("http_request_sheets_calls", {"view": view}, stats["calls"], CALLS_BUCKETS)
+    registry.observe("http_request_sheets_seconds", {"view": view}, stats["seconds"])
+    flush()
+    return stats
+
+
+# ========================
+# MULTIPROCESO
+# ========================
+_last_flush = 0.0
+_flush_lock = threading.Lock()
+
+
+def _metrics_dir():
+    path = getattr(settings, "METRICS_DIR", None)
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), "capig_form_metrics")
+    return path
+
+
+def flush(force=False):
+    """Guarda el registro de este worker para que /metrics/ lo sume."""
+    global _last_flush
+    directory = _metrics_dir()
+    if not directory:
+        return
+    now = time.monotonic()
+    with _flush_lock:
+        if not force and now - _last_flush < FLUSH_INTERVAL:
+            return
+        _last_flush = now
+    try:
+        os.makedirs(directory, exist_ok=True)
+        _write_snapshot(directory, f"{os.getpid()}.json", registry.snapshot())
+    except OSError:
+        pass
+
+
+atexit.register(flush, True)
+
+
+def _write_snapshot(directory, name, snapshot):
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as fh:
+        json.dump(snapshot, fh)
+    os.replace(tmp, os.path.join(directory, name))
+
+
+def mark_process_dead(pid):
+    """Pasa el registro del worker `pid` (ya terminado) al acumulado de workers muertos."""
+    directory = _metrics_dir()
+    if not directory:
+        return
+    path = os.path.join(directory, f"{pid}.json")
+    try:
+        with open(path) as fh:
+            snapshot = json.load(fh)
+    except (OSError, ValueError):
+        return
+    combined = Registry()
+    try:
+        with open(os.path.join(directory, DEAD_FILE)) as fh:
+            combined.merge(json.load(fh))
+    except (OSError, ValueError):
+        pass
+    combined.merge(snapshot)
+    try:
+        _write_snapshot(directory, DEAD_FILE, combined.snapshot())
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def reset_process_files():
+    """Borra los registros de una corrida anterior (al arrancar el maestro)."""
+    directory = _metrics_dir()
+    if not directory:
+        return
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith((".json", ".tmp"))]
+    except OSError:
+        return
+    for name in names:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            continue
+
+
+def collect():
+    """Registro combinado de todos los workers (o solo el propio sin METRICS_DIR)."""
+    directory = _metrics_dir()
+    if not directory:
+        return registry
+    flush(force=True)
+    combined = Registry()
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith(".json")]
+    except OSError:
+        return registry
+    for name in names:
+        try:
+            with open(os.path.join(directory, name)) as fh:
+                combined.merge(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    return combined
+
+
+# ========================
+# EXPOSICION
+# ========================
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in items
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render(source=None):
+    source = source or collect()
+    lines = []
+    for name, (kind, help_text) in HELP.items():
+        counters = sorted((labels, value) for (n, labels), value in source.counters.items() if n == name)
+        histograms = sorted(
+            ((labels, hist) for (n, labels), hist in source.histograms.items() if n == name),
+            key=lambda item: item[0],
+        )
+        if not counters and not histograms:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in counters:
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for labels, hist in histograms:
+            for bound, count in zip(hist["buckets"], hist["counts"]):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_value(bound))])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(hist['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Limitador de cuota y reintentos para la API de Google Sheets.
+
+La cuota de Sheets es por proyecto/usuario y por minuto, asi que el token
+bucket vive en un archivo SQLite compartido por todos los workers de gunicorn
+(una transaccion BEGIN IMMEDIATE serializa el consumo). Hay un bucket para
+lecturas y otro para escrituras.
+
+Las llamadas llevan prioridad: las vistas (interactivas) pueden gastar todo el
+bucket; los jobs (batch) dejan libre una reserva y esperan mas, de modo que
+un dash_data_job corriendo en horario laboral no le quita cupo a un usuario.
+
+Ante 429/5xx se reintenta con backoff exponencial con jitter sin pasar del
+deadline de la llamada (las vistas no pueden exceder el timeout de gunicorn).
+Solo las operaciones idempotentes se reintentan ante timeouts, errores de
+conexion o 5xx: un values.append que vence por timeout puede haberse escrito
+igual, y repetirlo duplicaria la fila. Las demas solo reintentan 429, que
+Sheets rechaza antes de ejecutar.
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+READ = "read"
+WRITE = "write"
+
+DEFAULT_QUOTA_PER_MINUTE = {READ: 60, WRITE: 60}
+DEFAULT_BATCH_RESERVE = 0.25
+DEFAULT_DEADLINES = {INTERACTIVE: 20.0, BATCH: 300.0}
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Operaciones (nombres de metrics.classify_request) que se pueden repetir sin
+# efectos extra aunque el intento anterior se haya ejecutado.
+IDEMPOTENT_OPERATIONS = {
+    "spreadsheets.get",
+    "values.get",
+    "values.batchGet",
+    "values.update",
+    "values.clear",
+    "values.batchUpdate",
+    "values.batchClear",
+}
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 32.0
+
+_priority = contextvars.ContextVar("sheets_priority", default=INTERACTIVE)
+_deadline = contextvars.ContextVar("sheets_deadline", default=None)
+
+
+class QuotaDeadlineExceeded(RuntimeError):
+    """No hubo cupo (o la API siguio fallando) antes del deadline de la llamada."""
+
+
+@contextlib.contextmanager
+def sheets_priority(priority):
+    """Marca las llamadas a Sheets hechas dentro del bloque (INTERACTIVE o BATCH)."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@contextlib.contextmanager
+def sheets_deadline(deadline):
+    """
+    Acota los reintentos de las llamadas del bloque a `deadline`
+    (time.monotonic()), ademas del deadline de su prioridad.
+    """
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ========================
+# TOKEN BUCKET COMPARTIDO
+# ========================
+class SQLiteTokenBucket:
+    """Token bucket persistido en SQLite; seguro entre procesos e hilos."""
+
+    # Tras un error de SQLite se limita en memoria durante este tiempo y
+    # luego se vuelve a intentar con el archivo compartido.
+    FAILURE_COOLDOWN = 60.0
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        self._memory = {}
+        self._memory_lock = threading.Lock()
+        self._failed_at = None
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def try_acquire(self, name, capacity, per_second, reserve=0.0):
+        """
+        Consume un token si quedan mas de `reserve`. Devuelve 0 si lo consiguio
+        o los segundos estimados hasta que haya uno disponible.
+        """
+        failed_at = self._failed_at
+        if failed_at is not None and time.monotonic() - failed_at < self.FAILURE_COOLDOWN:
+            return self._try_acquire_memory(name, capacity, per_second, reserve)
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute(
+                    "SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+                tokens, updated = row if row else (capacity, now)
+                tokens = min(capacity, tokens + max(0.0, now - updated) * per_second)
+                wait = self._take(tokens, per_second, reserve)
+                if not wait:
+                    tokens -= 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                    (name, tokens, now),
+                )
+                conn.execute("COMMIT")
+                return wait
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.OperationalError as exc:
+            if "locked" not in str(exc):
+                self._mark_failed()
+            else:
+                # Contencion pasajera: solo esta llamada se limita en memoria.
+                logger.warning("%s esta bloqueado; esta llamada se limita en memoria.", self.path)
+            return self._try_acquire_memory(name, capacity, per_second, reserve)
+        except sqlite3.Error:
+            self._mark_failed()
+            return self._try_acquire_memory(name, capacity, per_second, reserve)
+
+    def _mark_failed(self):
+        # Sin archivo compartido se limita por proceso en lugar de bloquear.
+        logger.exception(
+            "No se pudo usar %s para la cuota de Sheets; se limita en memoria por %.0f s.",
+            self.path, self.FAILURE_COOLDOWN)
+        self._failed_at = time.monotonic()
+        self._local.conn = None
+
+    @staticmethod
+    def _take(tokens, per_second, reserve):
+        if tokens - 1 >= reserve:
+            return 0.0
+        return max((reserve + 1 - tokens) / per_second, 0.01)
+
+    def _try_acquire_memory(self, name, capacity, per_second, reserve):
+        with self._memory_lock:
+            now = time.monotonic()
+            tokens, updated = self._memory.get(name, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * per_second)
+            wait = self._take(tokens, per_second, reserve)
+            if not wait:
+                tokens -= 1
+            self._memory[name] = (tokens, now)
+            return wait
+
+
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def _get_bucket():
+    global _bucket
+    with _bucket_lock:
+        if _bucket is None:
+            path = _setting("SHEETS_QUOTA_DB", None) or os.path.join(
+                str(getattr(settings, "BASE_DIR", ".")), "sheets_quota.sqlite3")
+            _bucket = SQLiteTokenBucket(path)
+        return _bucket
+
+
+def acquire(kind, priority=None, deadline=None):
+    """
+    Espera un token del bucket `kind` (READ o WRITE) respetando la prioridad.
+    Lanza QuotaDeadlineExceeded si no llega antes de `deadline` (time.monotonic()).
+    """
+    priority = priority or current_priority()
+    per_minute = _setting("SHEETS_QUOTA_PER_MINUTE", {}).get(kind) or DEFAULT_QUOTA_PER_MINUTE[kind]
+    capacity = float(per_minute)
+    per_second = capacity / 60.0
+    reserve = 0.0
+    if priority == BATCH:
+        reserve = capacity * _setting("SHEETS_QUOTA_BATCH_RESERVE", DEFAULT_BATCH_RESERVE)
+
+    bucket = _get_bucket()
+    while True:
+        wait = bucket.try_acquire(kind, capacity, per_second, reserve)
+        if not wait:
+            return
+        if deadline is not None and time.monotonic() + wait > deadline:
+            raise QuotaDeadlineExceeded(
+                f"Sin cuota de Sheets ({kind}) antes del deadline ({priority}).")
+        time.sleep(wait + random.uniform(0, 0.05))
+
+
+# ========================
+# REINTENTOS
+# ========================
+def _status_of(exc):
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def retry_deadline(priority):
+    """Segundos que una llamada de `priority` puede pasar reintentando."""
+    deadlines = _setting("SHEETS_RETRY_DEADLINES", {}) or {}
+    return float(deadlines.get(priority, DEFAULT_DEADLINES[priority]))
+
+
+def _is_retryable(exc, idempotent=True):
+    import requests
+
+    if not idempotent:
+        return _status_of(exc) == 429
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return _status_of(exc) in RETRYABLE_STATUS
+
+
+def call_with_quota(kind, func, *args, idempotent=True, **kwargs):
+    """
+    Ejecuta `func` consumiendo cuota y reintentando 429/5xx con backoff
+    exponencial con jitter ("full jitter") hasta el deadline de la prioridad.
+    Con idempotent=False solo se reintenta 429.
+    """
+    priority = current_priority()
+    deadline = time.monotonic() + retry_deadline(priority)
+    if _deadline.get() is not None:
+        deadline = min(deadline, _deadline.get())
+
+    attempt = 0
+    while True:
+        acquire(kind, priority=priority, deadline=deadline)
+        try:
+            return func(*args, **kwargs)
+        except Exception as exc:
+            if not _is_retryable(exc, idempotent):
+                raise
+            attempt += 1
+            delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+            if time.monotonic() + delay > deadline:
+                logger.warning(
+                    "Sheets sigue respondiendo %s tras %s intentos; se abandona (%s).",
+                    _status_of(exc), attempt, priority,
+                )
+                raise
+            logger.info(
+                "Sheets respondio %s; reintento %s en %.1fs (%s).",
+                _status_of(exc), attempt, delay, priority,
+            )
+            time.sleep(delay)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Lecturas memorizadas durante un request.
+
+RequestReadCacheMiddleware abre un ambito por request (contextvar, asi que
+cada hilo o tarea tiene el suyo). Dentro del ambito, `memoize(clave, loader)`
+llama a `loader` la primera vez y devuelve el mismo objeto en las siguientes:
+una vista que busca un RUC, actualiza su estado y vuelve a mirar la hoja usa
+una sola lectura y ve siempre los mismos datos, aunque el snapshot global se
+recargue en segundo plano a mitad del request.
+
+Las escrituras de la propia vista deben llamar a `forget(clave)` (lo hacen
+las funciones de invalidacion de forms.utils) para que la lectura siguiente
+las vea. Fuera de un request (jobs, outbox) `memoize` solo llama a `loader`.
+"""
+import contextlib
+import contextvars
+
+from capig_form.services import tracing
+
+_scope = contextvars.ContextVar("sheets_request_reads", default=None)
+
+
+def begin_request():
+    return _scope.set({})
+
+
+def end_request(token):
+    _scope.reset(token)
+
+
+@contextlib.contextmanager
+def request_scope():
+    """Ambito de lecturas memorizadas fuera del middleware (tests, shell)."""
+    token = begin_request()
+    try:
+        yield
+    finally:
+        end_request(token)
+
+
+def memoize(key, loader):
+    reads = _scope.get()
+    if reads is None:
+        return loader()
+    if key in reads:
+        tracing.event(f"request {key}", category="cache", result="hit")
+        return reads[key]
+    value = reads[key] = loader()
+    return value
+
+
+def contains(key):
+    reads = _scope.get()
+    return reads is not None and key in reads
+
+
+def forget(key=None):
+    """Descarta una lectura del request en curso (todas si key es None)."""
+    reads = _scope.get()
+    if reads is None:
+        return
+    if key is None:
+        reads.clear()
+    else:
+        reads.pop(key, None)
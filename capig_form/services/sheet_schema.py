@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Registro de esquemas de las hojas: en que fila esta el encabezado y que
+columna ocupa cada campo.
+
+Antes cada lectura probaba hasta tres filas candidatas (un row_values por
+intento) antes de get_all_records, y cada alta en SOCIOS volvia a leer las
+filas 1 y 2. Ahora el esquema se detecta una vez por hoja y se guarda en
+memoria bajo SCHEMA_VERSION:
+
+- `observe(sheet, values, ...)`: para quien ya leyo la hoja completa. Valida
+  el esquema cacheado contra la fila de encabezado leida y solo lo redetecta
+  (sobre los mismos datos, sin otra llamada) si ya no coincide.
+- `get_schema(sheet, ...)`: para las escrituras. Usa el esquema cacheado o lo
+  detecta con una sola lectura de las primeras filas.
+- `invalidate_schema(sheet)`: cuando una escritura falla, para que la
+  siguiente vuelva a detectar el encabezado.
+
+Los esquemas vencen a los SHEETS_SCHEMA_TTL segundos aunque nadie lea la
+hoja, por si alguien edita el encabezado a mano entre lecturas.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+# Subirlo cuando cambie la forma de detectar o de guardar el esquema.
+SCHEMA_VERSION = 1
+DEFAULT_TTL = 3600
+
+_lock = threading.Lock()
+_schemas = {}
+
+
+def normalize_header(value):
+    """Normaliza encabezados para comparaciones."""
+    return str(value or "").replace("\u00a0", " ").strip().upper()
+
+
+def _trimmed(row):
+    row = list(row)
+    while row and row[-1] in ("", None):
+        row.pop()
+    return row
+
+
+class SheetSchema:
+    """Fila de encabezado (1-based), encabezado tal cual y mapa columna -> indice."""
+
+    def __init__(self, head, header):
+        self.head = head
+        # Como row_values: sin celdas vacias a la derecha.
+        self.header = _trimmed(header)
+        self.version = SCHEMA_VERSION
+        self.detected_at = time.monotonic()
+        self.columns = {}
+        for idx, col in enumerate(self.header, start=1):
+            key = normalize_header(col)
+            if key:
+                self.columns.setdefault(key, idx)
+        # Columnas pedidas que siguieron faltando tras detectar este esquema.
+        self.absent = set()
+
+    def column_of(self, name):
+        """Numero de columna (1-based) del encabezado, o None."""
+        return self.columns.get(normalize_header(name))
+
+    def is_absent(self, name):
+        return normalize_header(name) in self.absent
+
+    def mark_absent(self, names):
+        self.absent.update(normalize_header(name) for name in names)
+
+    def has_any(self, required_keys):
+        """True si el encabezado tiene alguna de `required_keys` (o si no hay requeridas)."""
+        required = {normalize_header(k) for k in required_keys if k}
+        return not required or bool(required & set(self.columns))
+
+    def matches(self, values):
+        """True si la fila de encabezado de `values` sigue siendo la cacheada."""
+        return len(values) >= self.head and _trimmed(values[self.head - 1]) == self.header
+
+
+def detect_head(values, preferred, required_keys=()):
+    """
+    Fila de encabezado entre (preferred, 1, 2): la primera con texto que
+    contenga alguna de `required_keys` (o la primera con texto si no hay
+    requeridas). Sin candidata valida devuelve la primera con texto, o
+    `preferred` si todas estan vacias.
+    """
+    required = {normalize_header(k) for k in required_keys if k}
+    fallback = None
+    for candidate in (preferred, 1, 2):
+        if not candidate or candidate > len(values):
+            continue
+        header_keys = {normalize_header(v) for v in values[candidate - 1] if str(v or "").strip()}
+        if not header_keys:
+            continue
+        if not required or header_keys & required:
+            return candidate
+        if fallback is None:
+            fallback = candidate
+    return fallback or preferred
+
+
+def _key(sheet):
+    return getattr(sheet, "spreadsheet_id", ""), sheet.title, SCHEMA_VERSION
+
+
+def _ttl():
+    return getattr(settings, "SHEETS_SCHEMA_TTL", DEFAULT_TTL)
+
+
+def cached_schema(sheet, required_keys=()):
+    """
+    Esquema vigente de la hoja, o None (no hace llamadas). El esquema lo
+    detecta el primero que lee la hoja; si no tiene ninguna de las
+    `required_keys` de quien pregunta (otra fila preferida, otras columnas
+    clave) se trata como ausente y se vuelve a detectar.
+    """
+    with _lock:
+        schema = _schemas.get(_key(sheet))
+    if schema is None or time.monotonic() - schema.detected_at > _ttl():
+        return None
+    if not schema.has_any(required_keys):
+        return None
+    return schema
+
+
+def _store(sheet, values, preferred, required_keys):
+    head = detect_head(values, preferred, required_keys)
+    header = values[head - 1] if len(values) >= head else []
+    schema = SheetSchema(head, header)
+    with _lock:
+        _schemas[_key(sheet)] = schema
+    return schema
+
+
+def observe(sheet, values, preferred=1, required_keys=()):
+    """Esquema para datos ya leidos de la hoja (desde la fila 1)."""
+    schema = cached_schema(sheet, required_keys)
+    if schema is not None and schema.matches(values):
+        return schema
+    return _store(sheet, values, preferred, required_keys)
+
+
+def get_schema(sheet, preferred=1, required_keys=()):
+    """Esquema de la hoja; si no esta en cache lo detecta con una lectura."""
+    from gspread.utils import fill_gaps
+
+    schema = cached_schema(sheet, required_keys)
+    if schema is not None:
+        return schema
+    last_row = max(preferred or 1, 2)
+    values = sheet.get_values(f"1:{last_row}", value_render_option="UNFORMATTED_VALUE")
+    return _store(sheet, fill_gaps(values) if values else [], preferred, required_keys)
+
+
+def invalidate_schema(sheet=None):
+    with _lock:
+        if sheet is None:
+            _schemas.clear()
+        else:
+            _schemas.pop(_key(sheet), None)
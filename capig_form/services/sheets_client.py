@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Cliente de Google Sheets compartido por proceso.
+
+Mantiene un unico cliente gspread autorizado por worker, con una sesion HTTP
+que reutiliza conexiones keep-alive y un token que se renueva antes de vencer.
+Tras un fork (gunicorn) el proceso hijo descarta la sesion heredada y crea la
+suya, para no compartir sockets con el proceso padre.
+
+Cada request pasa por el limitador de cuota compartido (rate_limit), que
+ademas reintenta 429/5xx con backoff (solo 429 si la operacion no es
+idempotente, p. ej. values.append).
+
+SheetsBackend es la interfaz que usa google_sheets_service; GoogleSheetsBackend
+habla con la API real y fake_sheets.FakeSheetsBackend la simula en memoria.
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+
+import gspread
+from google.auth.transport.requests import AuthorizedSession, Request
+from gspread.exceptions import APIError, SpreadsheetNotFound
+from gspread.http_client import HTTPClient
+from gspread.spreadsheet import Spreadsheet
+from gspread.worksheet import Worksheet
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from capig_form.services import metrics, rate_limit
+
+logger = logging.getLogger(__name__)
+
+REFRESH_MARGIN = timedelta(minutes=5)
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 10
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter que avisa al manager cada vez que el pool abre una conexion."""
+
+    def __init__(self, on_new_connection, **kwargs):
+        self._on_new_connection = on_new_connection
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        callback = self._on_new_connection
+
+        class _HTTPPool(HTTPConnectionPool):
+            def _new_conn(self):
+                callback()
+                return super()._new_conn()
+
+        class _HTTPSPool(HTTPSConnectionPool):
+            def _new_conn(self):
+                callback()
+                return super()._new_conn()
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _HTTPPool,
+            "https": _HTTPSPool,
+        }
+
+
+class QuotaHTTPClient(HTTPClient):
+    """
+    HTTPClient de gspread que consume cuota y reintenta antes de fallar.
+    Cada intento queda registrado en metrics por operacion y hoja.
+    """
+
+    def request(self, method, endpoint, *args, **kwargs):
+        kind = rate_limit.READ if method.upper() == "GET" else rate_limit.WRITE
+        operation, _ = metrics.classify_request(method, endpoint)
+        return rate_limit.call_with_quota(
+            kind, self._tracked_request, method, endpoint, *args,
+            idempotent=method.upper() == "GET" or operation in rate_limit.IDEMPOTENT_OPERATIONS, **kwargs)
+
+    def _tracked_request(self, method, endpoint, *args, **kwargs):
+        operation, worksheet = metrics.classify_request(method, endpoint)
+        with metrics.track_sheets_call(operation, worksheet):
+            return super().request(method, endpoint, *args, **kwargs)
+
+
+class _OpenedSpreadsheet(Spreadsheet):
+    """Spreadsheet armado con metadata ya descargada (sin otro spreadsheets.get)."""
+
+    def __init__(self, http_client, metadata):
+        self.client = http_client
+        self._properties = {"id": metadata["spreadsheetId"]}
+        self._properties.update(metadata["properties"])
+
+
+class SheetsClientManager:
+    """
+    Entrega un cliente gspread autorizado y reutilizable.
+
+    `credentials_factory` debe devolver credenciales de google-auth nuevas;
+    solo se invoca la primera vez (o si la construccion anterior fallo).
+    """
+
+    def __init__(self, credentials_factory, refresh_margin=REFRESH_MARGIN,
+                 pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+        self._credentials_factory = credentials_factory
+        self._refresh_margin = refresh_margin
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+        self._credentials = None
+        self._session = None
+        self._client = None
+        self._last_token = None
+        self.token_refreshes = 0
+        self.new_connections = 0
+        self.client_builds = 0
+
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    # ------------------------------------------------------------------
+    # API publica
+    # ------------------------------------------------------------------
+    def get_client(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._after_fork()
+            if self._client is None:
+                self._build_client()
+            self._refresh_if_needed()
+            return self._client
+
+    def reset(self):
+        """Descarta cliente y sesion; el siguiente get_client los recrea."""
+        with self._lock:
+            if self._session is not None:
+                try:
+                    self._session.close()
+                except Exception:  # pragma: no cover - defensivo
+                    logger.debug("No se pudo cerrar la sesion de Sheets.", exc_info=True)
+            self._session = None
+            self._client = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pid": self._pid,
+                "token_refreshes": self.token_refreshes,
+                "new_connections": self.new_connections,
+                "client_builds": self.client_builds,
+                "token_expiry": (
+                    self._credentials.expiry.isoformat()
+                    if self._credentials is not None and self._credentials.expiry
+                    else None
+                ),
+            }
+
+    # ------------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------------
+    def _after_fork(self):
+        # No se cierra la sesion heredada: sus sockets pertenecen al padre.
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+        self._session = None
+        self._client = None
+        self.token_refreshes = 0
+        self.new_connections = 0
+        self.client_builds = 0
+
+    def _record_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def _build_client(self):
+        if self._credentials is None:
+            self._credentials = self._credentials_factory()
+
+        session = AuthorizedSession(self._credentials)
+        adapter = _CountingAdapter(
+            self._record_new_connection,
+            pool_connections=self._pool_connections,
+            pool_maxsize=self._pool_maxsize,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        self._session = session
+        self._client = gspread.Client(
+            auth=self._credentials, session=session, http_client=QuotaHTTPClient)
+        self.client_builds += 1
+        logger.info("Cliente de Google Sheets creado (pid=%s).", self._pid)
+
+    def _refresh_if_needed(self):
+        creds = self._credentials
+        expiry = creds.expiry
+        # google-auth maneja expiry como datetime UTC naive.
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if not creds.token or expiry is None or expiry - now <= self._refresh_margin:
+            # El intercambio del token va por una sesion sin credenciales (la
+            # misma que usa AuthorizedSession), no por la sesion autorizada:
+            # esa agregaria el Bearer viejo y podria renovar dos veces.
+            creds.refresh(getattr(self._session, "_auth_request", None) or Request())
+
+        # AuthorizedSession tambien puede renovar por su cuenta (401), asi que
+        # se cuenta cualquier cambio de token, no solo los propios.
+        if creds.token != self._last_token:
+            self._last_token = creds.token
+            self.token_refreshes += 1
+
+
+class SheetsBackend:
+    """Lo que google_sheets_service necesita de un proveedor de hojas."""
+
+    name = "base"
+
+    def get_client(self):
+        """Objeto con la interfaz de gspread.Client (open_by_key, ...)."""
+        raise NotImplementedError
+
+    def open_spreadsheet(self, client, sheet_id):
+        """(Spreadsheet, metadata de fetch_sheet_metadata) del documento."""
+        spreadsheet = client.open_by_key(sheet_id)
+        return spreadsheet, spreadsheet.fetch_sheet_metadata()
+
+    def worksheet_from_properties(self, spreadsheet, properties):
+        """Hoja a partir de las `properties` de fetch_sheet_metadata, sin llamar a la API."""
+        raise NotImplementedError
+
+    def stats(self):
+        return {"backend": self.name}
+
+    def reset(self):
+        pass
+
+
+class GoogleSheetsBackend(SheetsBackend):
+    """API real de Google Sheets a traves de un SheetsClientManager."""
+
+    name = "google"
+
+    def __init__(self, credentials_factory, **manager_kwargs):
+        self.manager = SheetsClientManager(credentials_factory, **manager_kwargs)
+
+    def get_client(self):
+        return self.manager.get_client()
+
+    def open_spreadsheet(self, client, sheet_id):
+        # open_by_key ya descarga la metadata pero solo guarda las properties
+        # del documento; se descarga una vez y se usa para ambas cosas.
+        try:
+            metadata = client.http_client.fetch_sheet_metadata(sheet_id)
+        except APIError as exc:
+            if exc.response.status_code == HTTPStatus.NOT_FOUND:
+                raise SpreadsheetNotFound(exc.response) from exc
+            if exc.response.status_code == HTTPStatus.FORBIDDEN:
+                raise PermissionError from exc
+            raise
+        return _OpenedSpreadsheet(client.http_client, metadata), metadata
+
+    def worksheet_from_properties(self, spreadsheet, properties):
+        return Worksheet(spreadsheet, dict(properties), spreadsheet.id, spreadsheet.client)
+
+    def stats(self):
+        return {"backend": self.name, **self.manager.stats()}
+
+    def reset(self):
+        self.manager.reset()
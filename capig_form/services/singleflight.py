@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Coalescencia de cargas concurrentes ("singleflight").
+
+Cuando vence un cache, todos los requests que lo leen en ese momento fallan
+a la vez y cada uno lanzaria su propia lectura a Sheets. Con un Group, el
+primero que pide una clave (el lider) ejecuta la carga y los demas esperan
+ese mismo resultado (o su excepcion) en vez de repetirla:
+
+    flights = Group()
+    value = flights.do(("SOCIOS", version), cargar, timeout=10)
+
+Si la espera supera `timeout` se lanza FlightTimeout y el que espera decide
+que hacer (tipicamente servir el ultimo valor viejo). La carga del lider no
+se cancela: termina y deja su resultado a quien siga esperando.
+"""
+import threading
+
+from capig_form.services import tracing
+
+
+class FlightTimeout(TimeoutError):
+    """La carga en curso de otra peticion no termino a tiempo."""
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class Group:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, timeout=None):
+        """
+        Devuelve `fn()`; si ya hay una carga de `key` en curso espera la suya.
+        Con `timeout` (segundos) los que esperan lanzan FlightTimeout al
+        vencer; el lider nunca espera.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            with tracing.span(f"singleflight {key}", category="cache", result="wait"):
+                finished = call.done.wait(timeout)
+            if not finished:
+                raise FlightTimeout(f"La carga de {key} no termino en {timeout} s.")
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+            if call.waiters:
+                tracing.event(f"singleflight {key}", category="cache", result="shared", waiters=call.waiters)
+        return call.value
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Cache en memoria de "snapshots" derivados de Google Sheets.
+
+Cada clave guarda el ultimo valor cargado junto con un numero de version.
+Mientras el valor esta fresco (ttl) se entrega tal cual; pasado el ttl y
+dentro de la ventana stale_ttl se sigue entregando el valor viejo mientras
+un hilo de fondo lo recarga (stale-while-revalidate). Invalidar una clave
+sube su version, de modo que una recarga que empezo antes de la invalidacion
+no puede reinstalar datos desactualizados.
+
+Las cargas de una misma clave (y version) se coalescen con singleflight: si
+vence el snapshot y llegan varios requests a la vez, uno solo lee Sheets y
+los demas esperan su resultado. La espera dura a lo sumo
+SHEETS_FETCH_WAIT_TIMEOUT segundos; al vencer se sirve el ultimo valor
+cargado aunque este fuera de la ventana stale, y solo si no hay ninguno se
+lanza FlightTimeout.
+
+Los valores se comparten entre hilos: quien los lea no debe mutarlos.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from capig_form.services import tracing
+from capig_form.services.singleflight import FlightTimeout, Group
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 120
+DEFAULT_STALE_TTL = 600
+DEFAULT_WAIT_TIMEOUT = 15
+
+
+class _Snapshot:
+    __slots__ = ("value", "version", "loaded_at")
+
+    def __init__(self, value, version, loaded_at):
+        self.value = value
+        self.version = version
+        self.loaded_at = loaded_at
+
+
+class SnapshotCache:
+    def __init__(self, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._versions = {}
+        self._refreshing = set()
+        self._flights = Group()
+
+    def get(self, key, loader, ttl=None, stale_ttl=None):
+        """
+        Devuelve el snapshot de `key`, cargandolo con `loader()` si hace falta.
+
+        Si la carga sincrona falla la excepcion se propaga (tambien a quienes
+        la estaban esperando); si falla una recarga de fondo se conserva el
+        valor anterior.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+
+        with self._lock:
+            entry = self._entries.get(key)
+            version = self._versions.get(key, 0)
+
+        if entry is not None:
+            age = time.monotonic() - entry.loaded_at
+            if age < ttl:
+                tracing.event(f"cache {key}", category="cache", result="hit")
+                return entry.value
+            if age < ttl + stale_ttl:
+                tracing.event(f"cache {key}", category="cache", result="stale")
+                self._refresh_in_background(key, loader)
+                return entry.value
+
+        with tracing.span(f"cache {key}", category="cache", result="miss"):
+            try:
+                return self._flights.do(
+                    (key, version), lambda: self._load(key, loader, version), timeout=self._wait_timeout())
+            except FlightTimeout:
+                if entry is None:
+                    raise
+                logger.warning("La carga de '%s' sigue en curso; se sirve el valor anterior.", key)
+                return entry.value
+
+    def has(self, key, ttl=None, stale_ttl=None):
+        """True si get() devolveria un valor sin esperar una carga (fresco o stale)."""
+        ttl = self.ttl if ttl is None else ttl
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry is not None and time.monotonic() - entry.loaded_at < ttl + stale_ttl
+
+    def loading(self, key):
+        """True si hay una carga de `key` en curso."""
+        return self._flights.in_flight((key, self.version(key)))
+
+    def peek(self, key):
+        """Valor actual sin cargar ni revalidar (None si no existe)."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry.value if entry is not None else None
+
+    def set(self, key, value):
+        """Reemplaza el snapshot de `key` (p. ej. tras una escritura conocida)."""
+        with self._lock:
+            version = self._versions.get(key, 0) + 1
+            self._versions[key] = version
+            self._entries[key] = _Snapshot(value, version, time.monotonic())
+
+    def invalidate(self, key=None):
+        with self._lock:
+            keys = list(self._entries) if key is None else [key]
+            for item in keys:
+                self._versions[item] = self._versions.get(item, 0) + 1
+                self._entries.pop(item, None)
+
+    def version(self, key):
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key: {
+                    "version": entry.version,
+                    "age_seconds": round(now - entry.loaded_at, 3),
+                }
+                for key, entry in self._entries.items()
+            }
+
+    def _wait_timeout(self):
+        return getattr(settings, "SHEETS_FETCH_WAIT_TIMEOUT", DEFAULT_WAIT_TIMEOUT)
+
+    def _load(self, key, loader, version):
+        value = loader()
+        with self._lock:
+            # Si alguien invalido mientras cargabamos, no se guarda el resultado.
+            if self._versions.get(key, 0) == version:
+                self._entries[key] = _Snapshot(value, version, time.monotonic())
+        return value
+
+    def _refresh_in_background(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            version = self._versions.get(key, 0)
+
+        def _worker():
+            try:
+                # Si un request ya esta cargando la clave, se reutiliza esa carga.
+                self._flights.do((key, version), lambda: self._load(key, loader, version))
+            except Exception:
+                logger.exception("No se pudo refrescar el snapshot '%s'; se mantiene el anterior.", key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(
+            target=_worker, name=f"snapshot-refresh-{key}", daemon=True).start()
+
+
+snapshots = SnapshotCache()
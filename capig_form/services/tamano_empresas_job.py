@@ -1,18 +1,13 @@
-﻿import os
+﻿import logging
+import os
 import unicodedata
 from collections import defaultdict
 from typing import Dict, List, Tuple
 
-import pandas as pd
+from capig_form.services.dates import parse_years
+from capig_form.services.job_runner import JobOutput, Requirement, run_jobs
 
-
-def _ensure_django():
-    import django
-    from django.conf import settings
-
-    if not settings.configured:
-        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "capig_form.settings")
-        django.setup()
+logger = logging.getLogger(__name__)
 
 
 def _normalize_label(value: str) -> str:
@@ -35,19 +30,6 @@ def _clean_ruc(raw) -> str:
     return "".join(ch for ch in str(raw or "") if ch.isdigit())
 
 
-def _open_first_existing_worksheet(ss, names: List[str]):
-    last_error = None
-    for name in names:
-        try:
-            return ss.worksheet(name)
-        except Exception as exc:
-            last_error = exc
-            continue
-    if last_error:
-        raise last_error
-    raise RuntimeError("No se encontro ninguna hoja candidata.")
-
-
 def _detect_blocks(data: List[List[str]]) -> List[Tuple[int, List[str], List[List[str]]]]:
     header_idxs: List[int] = []
     for idx, row in enumerate(data):
@@ -66,13 +48,6 @@ def _detect_blocks(data: List[List[str]]) -> List[Tuple[int, List[str], List[Lis
     return blocks
 
 
-def _parse_year(value) -> int:
-    ts = pd.to_datetime(value, errors="coerce", dayfirst=True)
-    if pd.isna(ts):
-        return None
-    return int(ts.year)
-
-
 def _clasificar_tamano(monto: float) -> str:
     if monto <= 100_000:
         return "MICRO"
@@ -92,10 +67,11 @@ def _collect_historicos(data_bd: List[List[str]]) -> List[Tuple[str, int, str]]:
         col_fecha = _find_col(header_row, "FECHA_AFILIACION")
         if min(col_ruc, col_tam, col_fecha) < 0:
             return
-        for row in rows:
+        # Las fechas se interpretan por columna: cada fecha distinta una vez.
+        anios = parse_years(row[col_fecha] if col_fecha < len(row) else None for row in rows)
+        for row, anio in zip(rows, anios):
             ruc = _clean_ruc(row[col_ruc]) if col_ruc < len(row) else ""
             tam = str(row[col_tam] or "").strip().upper() if col_tam < len(row) else ""
-            anio = _parse_year(row[col_fecha]) if col_fecha < len(row) else None
             if ruc and tam and anio:
                 historicos.append((ruc, anio, tam))
 
@@ -176,19 +152,17 @@ def _build_tamano_global(registros: Dict[str, Dict[int, str]]):
     return salida
 
 
-def _ensure_worksheet(spreadsheet, name: str):
-    from gspread.exceptions import WorksheetNotFound
-
-    try:
-        return spreadsheet.worksheet(name)
-    except WorksheetNotFound:
-        return spreadsheet.add_worksheet(title=name, rows=2000, cols=20)
+def _update_sheet(ws, rows: List[List], batch=None):
+    """Reemplaza el contenido de la hoja; con `batch` solo encola la edicion."""
+    from capig_form.services.google_sheets_service import SheetBatch
 
-
-def _update_sheet(ws, rows: List[List]):
-    ws.clear()
+    own_batch = batch is None
+    batch = SheetBatch(value_input_option="RAW") if own_batch else batch
+    batch.clear(ws)
     if rows:
-        ws.update(rows)
+        batch.update_range(ws, "A1", rows)
+    if own_batch:
+        batch.commit()
 
 
 def _tamano_to_code(tamano: str) -> str:
@@ -205,83 +179,134 @@ def _tamano_to_code(tamano: str) -> str:
     return mapping.get(tamano.upper().strip(), "")
 
 
-def _write_t202x_columns(data_bd: List[List[str]], registros: Dict[str, Dict[int, str]]) -> List[List[str]]:
+def _t202x_patch(data_bd: List[List[str]], registros: Dict[str, Dict[int, str]]) -> Dict[int, Dict[int, str]]:
     """
-    Actualiza data_bd con columnas T202x basado en los registros calculados.
-    Retorna una copia modificada de data_bd sin alterar el original.
-    
+    Calcula solo las celdas T202x de SOCIOS/BASE DE DATOS que cambian.
+
     Parámetros:
     - data_bd: datos completos de BASE DE DATOS (tal como se leen de Sheets)
     - registros: dict {RUC: {anio: tamano}} ya calculado
-    
-    Retorna:
-    - data_bd actualizada con columnas T202x
+
+    Retorna {columna: {fila: valor}} (indices 0-based) con los codigos que
+    difieren de la hoja y los encabezados T202x nuevos. No copia la grilla:
+    la memoria es proporcional a las celdas que cambian.
     """
     if not data_bd or len(data_bd) < 2:
-        return data_bd
-    
-    # Trabajar con copia para no modificar el original
-    data_bd_copy = [row[:] for row in data_bd]
-    
+        return {}
+
     # Obtener años únicos de todos los registros
     anios_unicos = set()
     for ruc_data in registros.values():
         anios_unicos.update(ruc_data.keys())
     anios_ordenados = sorted([a for a in anios_unicos if a and isinstance(a, int)])
-    
+
     if not anios_ordenados:
-        return data_bd_copy
-    
-    for header_idx, headers, rows in _detect_blocks(data_bd_copy):
+        return {}
+
+    patch: Dict[int, Dict[int, str]] = defaultdict(dict)
+    for header_idx, headers, rows in _detect_blocks(data_bd):
         col_ruc = _find_col(headers, "RUC")
         if col_ruc < 0:
             continue
 
+        # Encabezados T202x que faltan: se agregan a la derecha del bloque.
+        nuevos: List[str] = []
         t_col_indices = {}
         for anio in anios_ordenados:
             col_name = f"T{anio}"
-            col_idx = _find_col(headers, col_name)
+            col_idx = _find_col(headers + nuevos, col_name)
             if col_idx == -1:
-                headers.append(col_name)
-                col_idx = len(headers) - 1
+                nuevos.append(col_name)
+                col_idx = len(headers) + len(nuevos) - 1
+                patch[col_idx][header_idx] = col_name
             t_col_indices[anio] = col_idx
 
-        for offset, _ in enumerate(rows, start=1):
-            absolute_idx = header_idx + offset
-            row = data_bd_copy[absolute_idx]
-            while len(row) < len(headers):
-                row.append("")
-
+        for offset, row in enumerate(rows, start=1):
             ruc = _clean_ruc(row[col_ruc]) if col_ruc < len(row) else ""
             if not ruc or ruc not in registros:
                 continue
 
             for anio, col_idx in t_col_indices.items():
                 if anio in registros[ruc]:
-                    tamano = registros[ruc][anio]
-                    codigo = _tamano_to_code(tamano)
-                    row[col_idx] = codigo
-    
-    return data_bd_copy
+                    codigo = _tamano_to_code(registros[ruc][anio])
+                    actual = row[col_idx] if col_idx < len(row) else ""
+                    if str(actual if actual is not None else "") != codigo:
+                        patch[col_idx][header_idx + offset] = codigo
 
+    return dict(patch)
 
-def run():
-    _ensure_django()
-    from django.conf import settings
-    from capig_form.services import google_sheets_service as gss
 
-    sheet_id = os.getenv("SHEET_PATH") or getattr(settings, "SHEET_PATH", "")
-    if not sheet_id:
-        raise RuntimeError("SHEET_PATH no esta configurado.")
+def _queue_t202x_patch(batch, ws, patch: Dict[int, Dict[int, str]]) -> int:
+    """
+    Encola el parche como rangos de una columna (filas contiguas juntas) en
+    `batch`. Amplia la grilla si hay encabezados nuevos fuera de ella.
+    Retorna cuantas celdas se escriben.
+    """
+    from gspread.utils import rowcol_to_a1
+
+    if not patch:
+        return 0
+    needed_cols = max(patch) + 1
+    if needed_cols > getattr(ws, "col_count", needed_cols):
+        ws.add_cols(needed_cols - ws.col_count)
+
+    cells = 0
+    for col_idx in sorted(patch):
+        filas = sorted(patch[col_idx])
+        start = 0
+        for pos in range(1, len(filas) + 1):
+            if pos < len(filas) and filas[pos] == filas[pos - 1] + 1:
+                continue
+            tramo = filas[start:pos]
+            rango = f"{rowcol_to_a1(tramo[0] + 1, col_idx + 1)}:{rowcol_to_a1(tramo[-1] + 1, col_idx + 1)}"
+            batch.update_range(ws, rango, [[patch[col_idx][fila]] for fila in tramo])
+            cells += len(tramo)
+            start = pos
+    return cells
+
+
+SOCIOS_SHEETS = ("SOCIOS", "BASE DE DATOS")
+VENTAS_SHEETS = ("VENTAS_SOCIO", "VENTAS_AFILIADOS")
+OUTPUT_SHEETS = ("CAMBIO_TAMANIO_EMPRESAS", "RESUMEN_CAMBIOS_TAMANIO", "TAMANO_EMPRESA_GLOBAL")
+
+REQUIRED_SHEETS = [Requirement(SOCIOS_SHEETS), Requirement(VENTAS_SHEETS)]
+
+
+def _publish(batch, snapshot, outputs: List[List[List]], patch: Dict[int, Dict[int, str]]):
+    # Las hojas de salida se reemplazan completas.
+    for name, rows in zip(OUTPUT_SHEETS, outputs):
+        _update_sheet(snapshot.ensure_worksheet(name), rows, batch)
+
+    # Columnas T202x en BASE DE DATOS: solo las celdas que cambian, sin
+    # limpiar ni reescribir la hoja maestra.
+    hoja_bd = snapshot.worksheet(SOCIOS_SHEETS)
+    celdas = _queue_t202x_patch(batch, hoja_bd, patch)
+    if celdas:
+        logger.info(
+            "Columnas T202x actualizadas en %s.", hoja_bd.title,
+            extra={"cells": celdas, "columns": len(patch)},
+        )
+    else:
+        logger.info("Columnas T202x sin cambios.")
+
+
+def _write_backup(outputs: List[List[List]]):
+    """Backup local opcional de las hojas de salida."""
+    import pandas as pd
 
-    client = gss._get_client()
-    ss = client.open_by_key(sheet_id)
+    detalle_rows, resumen_rows, global_rows = outputs
+    output_path = os.path.join(os.path.dirname(__file__), "data", "cambio_tamano_empresas.xlsx")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with pd.ExcelWriter(output_path) as writer:
+        pd.DataFrame(detalle_rows[1:], columns=detalle_rows[0]).to_excel(writer, sheet_name="cambios", index=False)
+        pd.DataFrame(resumen_rows[1:], columns=resumen_rows[0]).to_excel(writer, sheet_name="resumen", index=False)
+        pd.DataFrame(global_rows[1:], columns=global_rows[0]).to_excel(writer, sheet_name="tamano_global", index=False)
 
-    hoja_bd = _open_first_existing_worksheet(ss, ["SOCIOS", "BASE DE DATOS"])
-    hoja_ventas = _open_first_existing_worksheet(ss, ["VENTAS_SOCIO", "VENTAS_AFILIADOS"])
 
-    data_bd = hoja_bd.get_all_values()
-    data_ventas = hoja_ventas.get_all_values()
+def compute(snapshot):
+    """Calcula los cambios de tamano sobre el snapshot del libro."""
+    data_bd = snapshot.values(SOCIOS_SHEETS)
+    data_ventas = snapshot.values(VENTAS_SHEETS)
 
     historicos = _collect_historicos(data_bd)
     ventas_agrupadas = _collect_ventas(data_ventas)
@@ -289,10 +314,6 @@ def run():
     cambios, resumen = _build_cambios_y_resumen(registros)
     tamano_global = _build_tamano_global(registros)
 
-    hoja_detalle = _ensure_worksheet(ss, "CAMBIO_TAMANIO_EMPRESAS")
-    hoja_resumen = _ensure_worksheet(ss, "RESUMEN_CAMBIOS_TAMANIO")
-    hoja_global = _ensure_worksheet(ss, "TAMANO_EMPRESA_GLOBAL")
-
     detalle_rows = [["RUC", "Ano Inicial", "Tamano Inicial", "Ano Final", "Tamano Final"]] + cambios
     resumen_rows = [["Cambio", "Empresas", "%"]]
     total = len(cambios)
@@ -300,27 +321,20 @@ def run():
         for clave, cuenta in resumen.items():
             resumen_rows.append([clave, cuenta, f"{(cuenta / total) * 100:.2f}%"])
     global_rows = [["RUC", "Tamano"]] + tamano_global
+    outputs = [detalle_rows, resumen_rows, global_rows]
 
-    _update_sheet(hoja_detalle, detalle_rows)
-    _update_sheet(hoja_resumen, resumen_rows)
-    _update_sheet(hoja_global, global_rows)
+    patch = _t202x_patch(data_bd, registros)
+    return JobOutput(
+        "tamano_empresas",
+        publish=lambda batch: _publish(batch, snapshot, outputs, patch),
+        after_commit=lambda: _write_backup(outputs),
+        summary={"cambios": len(cambios), "empresas": len(tamano_global), "t202x_cells": sum(map(len, patch.values()))},
+    )
 
-    # Actualizar columnas T202x en BASE DE DATOS
-    print("[tamano_empresas_job] Actualizando columnas T202x en SOCIOS/BASE DE DATOS...")
-    data_bd_actualizada = _write_t202x_columns(data_bd, registros)
-    if data_bd_actualizada:
-        _update_sheet(hoja_bd, data_bd_actualizada)
-        print("[tamano_empresas_job] Columnas T202x actualizadas exitosamente.")
-    else:
-        print("[tamano_empresas_job] No se generaron columnas T202x (datos insuficientes).")
 
-    # Backup local opcional
-    output_path = os.path.join(os.path.dirname(__file__), "data", "cambio_tamano_empresas.xlsx")
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with pd.ExcelWriter(output_path) as writer:
-        pd.DataFrame(detalle_rows[1:], columns=detalle_rows[0]).to_excel(writer, sheet_name="cambios", index=False)
-        pd.DataFrame(resumen_rows[1:], columns=resumen_rows[0]).to_excel(writer, sheet_name="resumen", index=False)
-        pd.DataFrame(global_rows[1:], columns=global_rows[0]).to_excel(writer, sheet_name="tamano_global", index=False)
+def run():
+    """Corre solo este job (ver job_runner para correrlo junto a los demas)."""
+    return run_jobs(["tamano_empresas"])["tamano_empresas"]
 
 
 if __name__ == "__main__":
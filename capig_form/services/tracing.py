@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Trazas livianas por request.
+
+TracingMiddleware abre una traza por request; `span()` mide un tramo (llamada
+a Sheets, carga de cache, render de plantilla, ...) y `event()` marca un hecho
+puntual (hit de cache). Fuera de un request ambas son casi gratis: no hay
+traza activa y no se guarda nada.
+
+Al terminar, la respuesta lleva un header Server-Timing con el total por
+categoria, y si el request supero SLOW_REQUEST_THRESHOLD_MS se agrega una
+linea JSON con la cascada de tramos a SLOW_REQUEST_LOG.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_SPANS = 500
+DEFAULT_SLOW_THRESHOLD_MS = 1000
+
+_current = contextvars.ContextVar("request_trace", default=None)
+_log_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = []
+        self.dropped = 0
+        self._stack = []
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def _add(self, span):
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append(span)
+
+    def server_timing(self):
+        """Totales por categoria en formato Server-Timing."""
+        totals = OrderedDict()
+        for span in self.spans:
+            if span.get("nested"):
+                continue  # ya cuenta en un tramo padre de la misma categoria
+            item = totals.setdefault(span["category"], {"dur": 0.0, "count": 0, "hits": 0})
+            if span.get("event"):
+                item["hits"] += span["attrs"].get("result") in ("hit", "stale")
+                continue
+            item["dur"] += span["duration_ms"]
+            item["count"] += 1
+        parts = []
+        for category, item in totals.items():
+            desc = f"{item['count']} tramos" + (f", {item['hits']} hits" if item["hits"] else "")
+            parts.append(f'{category};dur={item["dur"]:.1f};desc="{desc}"')
+        parts.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(parts)
+
+
+def start_trace():
+    return _current.set(Trace())
+
+
+def finish_trace(token):
+    trace = _current.get()
+    _current.reset(token)
+    return trace
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextlib.contextmanager
+def span(name, category="app", **attrs):
+    """Mide el bloque como un tramo de la traza activa (si la hay)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    record = {
+        "name": name,
+        "category": category,
+        "start_ms": round(trace.elapsed_ms(), 2),
+        "depth": len(trace._stack),
+        "attrs": attrs,
+    }
+    if category in trace._stack:
+        record["nested"] = True
+    trace._stack.append(category)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as exc:
+        record["error"] = type(exc).__name__
+        raise
+    finally:
+        trace._stack.pop()
+        record["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        trace._add(record)
+
+
+def event(name, category="app", **attrs):
+    """Marca un hecho instantaneo (p. ej. un hit de cache) en la traza activa."""
+    trace = _current.get()
+    if trace is None:
+        return
+    trace._add({
+        "name": name,
+        "category": category,
+        "start_ms": round(trace.elapsed_ms(), 2),
+        "depth": len(trace._stack),
+        "duration_ms": 0.0,
+        "event": True,
+        "attrs": attrs,
+    })
+
+
+def write_slow_log(trace, request_info):
+    """Agrega la traza al log de requests lentos si supero el umbral."""
+    threshold = getattr(settings, "SLOW_REQUEST_THRESHOLD_MS", DEFAULT_SLOW_THRESHOLD_MS)
+    path = getattr(settings, "SLOW_REQUEST_LOG", "")
+    duration = trace.elapsed_ms()
+    if not path or threshold is None or duration < threshold:
+        return False
+    entry = dict(
+        request_info,
+        timestamp=datetime.now(timezone.utc).isoformat(),
+        duration_ms=round(duration, 1),
+        pid=os.getpid(),
+        spans=sorted(trace.spans, key=lambda item: item["start_ms"]),
+        dropped_spans=trace.dropped,
+    )
+    line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+    try:
+        with _log_lock:
+            with open(path, "a", encoding="utf-8") as fh:
+                fh.write(line)
+    except OSError:
+        logger.warning("No se pudo escribir el log de requests lentos en %s.", path)
+        return False
+    return True
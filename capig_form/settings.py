@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 import environ
 
@@ -56,6 +58,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'capig_form.middleware.MetricsMiddleware',
+    'capig_form.middleware.TracingMiddleware',
+    'capig_form.middleware.RequestReadCacheMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -70,7 +75,8 @@ ROOT_URLCONF = 'capig_form.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que registra el render en la traza del request.
+        'BACKEND': 'capig_form.templating.TracedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -142,7 +148,120 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 SHEET_PATH = env.str('SHEET_PATH')
-SERVICE = env.str('SERVICE')
+# Credencial de la cuenta de servicio (JSON o base64); no hace falta con SHEETS_BACKEND=fake.
+SERVICE = env.str('SERVICE', default='')
+
+# Segundos que se reutiliza la metadata (hojas, ids, tamanos) de cada documento.
+SHEETS_METADATA_TTL = env.int('SHEETS_METADATA_TTL', default=300)
+
+# Lista de socios en memoria: fresca durante TTL y servida "stale" mientras se
+# recarga en segundo plano hasta STALE_TTL segundos adicionales.
+SOCIOS_CACHE_TTL = env.int('SOCIOS_CACHE_TTL', default=120)
+SOCIOS_CACHE_STALE_TTL = env.int('SOCIOS_CACHE_STALE_TTL', default=600)
+
+# Lista de sectores (hoja SECTOR): cambia poco, se cachea por mas tiempo.
+SECTOR_CACHE_TTL = env.int('SECTOR_CACHE_TTL', default=600)
+SECTOR_CACHE_STALE_TTL = env.int('SECTOR_CACHE_STALE_TTL', default=3600)
+
+# Warm-up de gunicorn: precarga socios, sectores e indices por RUC antes de
+# atender (en el maestro con preload). Los pasos que no empiezan antes de
+# TIMEOUT segundos se omiten y se cargan en frio.
+SHEETS_WARMUP_ENABLED = env.bool('SHEETS_WARMUP_ENABLED', default=True)
+SHEETS_WARMUP_TIMEOUT = env.int('SHEETS_WARMUP_TIMEOUT', default=30)
+
+# Indices por RUC de ESTADO_SOCIO, SOCIOS y VENTAS_SOCIO (mismo esquema de TTL).
+RUC_INDEX_TTL = env.int('RUC_INDEX_TTL', default=60)
+RUC_INDEX_STALE_TTL = env.int('RUC_INDEX_STALE_TTL', default=120)
+
+# Cuando vence un snapshot, los requests concurrentes esperan la lectura que
+# ya esta en curso en vez de repetirla; tras estos segundos sirven el ultimo
+# valor cargado (si lo hay).
+SHEETS_FETCH_WAIT_TIMEOUT = env.int('SHEETS_FETCH_WAIT_TIMEOUT', default=15)
+
+# Fila de encabezado y mapa de columnas de cada hoja (sheet_schema). Las
+# lecturas completas lo revalidan gratis; esto acota cuanto puede usarse sin
+# releerlo en hojas que solo se escriben.
+SHEETS_SCHEMA_TTL = env.int('SHEETS_SCHEMA_TTL', default=3600)
+
+# Espejo SQLite del libro (python manage.py sync_sheets_mirror). Las lecturas
+# lo usan si la ultima sincronizacion tiene menos de MAX_AGE segundos, y en
+# cualquier caso si la API de Sheets falla. Apagado por defecto: activarlo solo
+# si sync_sheets_mirror corre programado (cron) con un intervalo menor a
+# MAX_AGE. Las escrituras nunca usan los numeros de fila del espejo.
+SHEETS_MIRROR_READS = env.bool('SHEETS_MIRROR_READS', default=False)
+SHEETS_MIRROR_MAX_AGE = env.int('SHEETS_MIRROR_MAX_AGE', default=900)
+
+# Outbox: los formularios guardan primero en SQLite y un hilo por worker
+# (o python manage.py drain_outbox) envia las filas agrupadas a Sheets.
+# Apagado por defecto: activarlo solo donde la base este migrada y sea
+# persistente (un disco efimero pierde las filas pendientes al redeploy).
+SHEETS_OUTBOX_ENABLED = env.bool('SHEETS_OUTBOX_ENABLED', default=False)
+SHEETS_OUTBOX_DRAIN_INTERVAL = env.int('SHEETS_OUTBOX_DRAIN_INTERVAL', default=5)
+SHEETS_OUTBOX_MAX_ATTEMPTS = env.int('SHEETS_OUTBOX_MAX_ATTEMPTS', default=10)
+
+# Cuota de la API de Sheets compartida por todos los workers (token bucket en
+# SQLite). Los jobs dejan libre BATCH_RESERVE del bucket para las vistas; los
+# 429/5xx se reintentan con backoff hasta el deadline de cada prioridad.
+SHEETS_QUOTA_DB = env.str('SHEETS_QUOTA_DB', default=str(BASE_DIR / 'sheets_quota.sqlite3'))
+SHEETS_QUOTA_PER_MINUTE = {
+    'read': env.int('SHEETS_READ_QUOTA_PER_MINUTE', default=60),
+    'write': env.int('SHEETS_WRITE_QUOTA_PER_MINUTE', default=60),
+}
+SHEETS_QUOTA_BATCH_RESERVE = env.float('SHEETS_QUOTA_BATCH_RESERVE', default=0.25)
+SHEETS_RETRY_DEADLINES = {
+    'interactive': env.float('SHEETS_RETRY_DEADLINE_INTERACTIVE', default=20.0),
+    'batch': env.float('SHEETS_RETRY_DEADLINE_BATCH', default=300.0),
+}
+
+# Proveedor de hojas: 'google' (API real) o 'fake' (en memoria, sin
+# credenciales; FAKE_PATH es un JSON opcional con los libros de prueba).
+SHEETS_BACKEND = env.str('SHEETS_BACKEND', default='google')
+SHEETS_FAKE_PATH = env.str('SHEETS_FAKE_PATH', default='')
+SHEETS_FAKE_LATENCY = env.float('SHEETS_FAKE_LATENCY', default=0.0)
+SHEETS_FAKE_ERROR_RATE = env.float('SHEETS_FAKE_ERROR_RATE', default=0.0)
+SHEETS_FAKE_QUOTA = env.bool('SHEETS_FAKE_QUOTA', default=False)
+
+# Carpeta donde cada worker deja sus metricas para que /metrics/ las sume;
+# vacio = solo las del worker que atiende el scrape.
+METRICS_DIR = env.str('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'capig_form_metrics'))
+
+# Requests mas lentos que el umbral (ms) se guardan con su cascada de tramos
+# en un archivo JSON lines; SLOW_REQUEST_LOG vacio lo desactiva.
+SLOW_REQUEST_THRESHOLD_MS = env.int('SLOW_REQUEST_THRESHOLD_MS', default=1000)
+SLOW_REQUEST_LOG = env.str('SLOW_REQUEST_LOG', default=str(BASE_DIR / 'slow_requests.jsonl'))
+
+# Logging: los registros pasan por una cola y un hilo los escribe en stdout.
+# LOG_FORMAT 'json' o 'text'; los datos de filas se redactan salvo que
+# LOG_REDACT_ROWS sea False, y de los diagnosticos verbosos (DEBUG) solo se
+# escribe la fraccion LOG_DIAGNOSTIC_SAMPLE_RATE.
+LOG_LEVEL = env.str('LOG_LEVEL', default='INFO')
+LOG_FORMAT = env.str('LOG_FORMAT', default='json')
+LOG_REDACT_ROWS = env.bool('LOG_REDACT_ROWS', default=True)
+LOG_DIAGNOSTIC_SAMPLE_RATE = env.float('LOG_DIAGNOSTIC_SAMPLE_RATE', default=0.1)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'sample': {'()': 'capig_form.log.SampleFilter'},
+        'redact': {'()': 'capig_form.log.RedactFilter'},
+    },
+    'formatters': {
+        'json': {'()': 'capig_form.log.JsonFormatter'},
+        'text': {'()': 'capig_form.log.TextFormatter'},
+    },
+    'handlers': {
+        'queued': {
+            '()': 'capig_form.log.QueuedStreamHandler',
+            'formatter': LOG_FORMAT,
+            'filters': ['sample', 'redact'],
+        },
+    },
+    'root': {
+        'handlers': ['queued'],
+        'level': LOG_LEVEL,
+    },
+}
 
 # Código de seguridad para formularios (6 dígitos)
 SECURITY_CODE = env.str('SECURITY_CODE', default='123456')
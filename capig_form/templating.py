@@ -0,0 +1,25 @@
+from django.template.backends.django import DjangoTemplates
+
+from capig_form.services import tracing
+
+
+class _TracedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with tracing.span(f"render {self.template.origin.template_name}", category="render"):
+            return self.template.render(context, request)
+
+
+class TracedDjangoTemplates(DjangoTemplates):
+    """Motor de plantillas de Django que registra cada render en la traza del request."""
+
+    def get_template(self, template_name):
+        return _TracedTemplate(super().get_template(template_name))
+
+    def from_string(self, template_code):
+        return _TracedTemplate(super().from_string(template_code))
@@ -0,0 +1,90 @@
+import os
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+
+from capig_form.services import dash_data_job, google_sheets_service
+from capig_form.services.fake_sheets import FakeSheetsBackend
+
+SHEET_ID = "test-sheet"
+HEADER = ["N", "RUC", "RAZON SOCIAL", "TAMAÑO", "ESTADO", "SECTOR", "No. COLABORADORES", "SEMAFORO", "2022", "2023"]
+
+
+def _socios(count):
+    rows = [["BASE DE DATOS SOCIOS"], list(HEADER)]
+    for i in range(count):
+        rows.append([str(i), f"09{i:011d}", f"EMPRESA {i}", "MICRO", "ACTIVO", "ALIMENTOS", "10", "VERDE",
+                     str(100 * i), str(50 + i)])
+    return rows
+
+
+VENTAS = [["RUC", "RAZON_SOCIAL", "ANIO", "MONTO_ESTIMADO"], ["0900000000003", "X", "2024", "1200"]]
+SECTOR = [["RUC", "SECTOR"], ["0900000000004", "TEXTIL"]]
+
+
+@override_settings(SHEETS_MIRROR_READS=False)
+class DashDataJobTests(TestCase):
+    def setUp(self):
+        env = mock.patch.dict(os.environ, {"SHEET_PATH": SHEET_ID})
+        env.start()
+        self.addCleanup(env.stop)
+        self.addCleanup(google_sheets_service.set_backend, google_sheets_service.get_backend())
+
+    def _book(self, socios):
+        backend = FakeSheetsBackend()
+        backend.create_spreadsheet(SHEET_ID, {
+            "SOCIOS": [list(row) for row in socios], "VENTAS_SOCIO": VENTAS, "SECTOR": SECTOR})
+        google_sheets_service.set_backend(backend)
+        return backend
+
+    def _dash(self, backend):
+        values = backend.values(SHEET_ID, "DASH_DATA")
+        return values[0], sorted(map(tuple, values[1:]))
+
+    def test_incremental_run_matches_a_full_rebuild(self):
+        socios = _socios(40)
+        backend = self._book(socios)
+        self.assertEqual(dash_data_job.run()["mode"], "full")
+
+        sheet = backend._spreadsheets[SHEET_ID]._by_title("SOCIOS")._values
+        sheet[5][2] = "EMPRESA CAMBIADA"
+        del sheet[20]
+        sheet.append(["99", "0900000000099", "EMPRESA NUEVA", "GRANDE", "ACTIVO", "QUIMICO", "300", "ROJO", "1", "2"])
+        summary = dash_data_job.run()
+        self.assertEqual(summary["mode"], "incremental")
+        self.assertEqual(summary["deleted"], 1)
+        self.assertEqual(summary["written"], 2)
+
+        reference = self._book(sheet)
+        self.assertEqual(dash_data_job.run(full=True)["mode"], "full")
+        self.assertEqual(self._dash(backend), self._dash(reference))
+
+    def test_unchanged_sources_write_nothing(self):
+        backend = self._book(_socios(10))
+        dash_data_job.run()
+        backend.reset_stats()
+        summary = dash_data_job.run()
+        self.assertEqual((summary["mode"], summary["written"]), ("incremental", 0))
+        self.assertNotIn("values.batchUpdate", backend.stats()["calls"])
+
+    def test_edited_dash_data_forces_a_full_rebuild(self):
+        backend = self._book(_socios(10))
+        dash_data_job.run()
+        del backend._spreadsheets[SHEET_ID]._by_title("DASH_DATA")._values[3]
+        with self.assertLogs("capig_form.services.dash_data_job", "WARNING"):
+            self.assertEqual(dash_data_job.run()["mode"], "full")
+
+    def test_missing_local_state_falls_back_to_full(self):
+        backend = self._book(_socios(10))
+        broken = mock.patch("forms.models.MirrorSyncState.objects.filter", side_effect=DatabaseError("no such table"))
+        with broken, self.assertLogs("capig_form.services.dash_data_job", "ERROR"):
+            self.assertEqual(dash_data_job.run()["mode"], "full")
+        self.assertEqual(len(backend.values(SHEET_ID, "DASH_DATA")), 11)
+
+    def test_failing_state_save_does_not_fail_the_job(self):
+        self._book(_socios(10))
+        broken = mock.patch.object(dash_data_job, "_write_state", side_effect=DatabaseError("no such table"))
+        with broken, self.assertLogs("capig_form.services.dash_data_job", "ERROR"):
+            self.assertEqual(dash_data_job.run()["mode"], "full")
+        self.assertEqual(dash_data_job.run()["mode"], "full")
@@ -0,0 +1,38 @@
+from datetime import date
+
+from django.test import SimpleTestCase
+
+from capig_form.services.dates import from_excel_serial, parse_date, parse_dates, parse_years
+
+
+class ParseDateTests(SimpleTestCase):
+    def test_sheet_formats(self):
+        self.assertEqual(parse_date("05/03/2021"), date(2021, 3, 5))
+        self.assertEqual(parse_date("2021-03-05"), date(2021, 3, 5))
+        self.assertEqual(parse_date("2021-03-05T10:20:00"), date(2021, 3, 5))
+        self.assertEqual(parse_date(44260), date(2021, 3, 5))
+        self.assertEqual(parse_date("44260"), date(2021, 3, 5))
+        self.assertEqual(parse_date(44260.75), date(2021, 3, 5))
+
+    def test_only_five_digit_numbers_are_serials(self):
+        # "2019" es un año, no el serial de 1905.
+        self.assertIsNone(parse_date(2019))
+        self.assertIsNone(parse_date("2019"))
+        self.assertIsNone(parse_date(100000))
+        self.assertEqual(parse_date(10000), date(1927, 5, 18))
+        self.assertEqual(parse_years([2019, "2019"]), [2019, 2019])
+
+    def test_empty_and_unknown_values(self):
+        for value in (None, "", "   ", True, "sin fecha"):
+            self.assertIsNone(parse_date(value))
+        self.assertIsNone(from_excel_serial(0))
+
+    def test_invalid_dates_fall_back_to_pandas_only_when_lenient(self):
+        self.assertIsNone(parse_date("12/31/2020"))
+        self.assertEqual(parse_date("12/31/2020", lenient=True), date(2020, 12, 31))
+
+    def test_parse_dates_keeps_order_and_unhashable_values(self):
+        self.assertEqual(
+            parse_dates(["05/03/2021", 44260, "", "05/03/2021", ["x"]]),
+            [date(2021, 3, 5), date(2021, 3, 5), None, date(2021, 3, 5), None],
+        )
@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from capig_form.services import google_sheets_service, rate_limit
+from capig_form.services.fake_sheets import FakeSheetsBackend
+
+SHEET_ID = "test-sheet"
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "quota.sqlite3")
+
+    def _stored_tokens(self, name):
+        conn = sqlite3.connect(self.path)
+        try:
+            row = conn.execute("SELECT tokens FROM buckets WHERE name = ?", (name,)).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def test_shared_bucket_limits_across_instances(self):
+        first = rate_limit.SQLiteTokenBucket(self.path)
+        second = rate_limit.SQLiteTokenBucket(self.path)
+        self.assertEqual(first.try_acquire("read", 2, 1.0), 0)
+        self.assertEqual(second.try_acquire("read", 2, 1.0), 0)
+        self.assertGreater(first.try_acquire("read", 2, 1.0), 0)
+
+    def test_retries_sqlite_after_the_cooldown(self):
+        bucket = rate_limit.SQLiteTokenBucket(os.path.join(self.path, "no-existe", "quota.sqlite3"))
+        with self.assertLogs("capig_form.services.rate_limit", "ERROR"):
+            self.assertEqual(bucket.try_acquire("read", 10, 1.0), 0)
+        self.assertIsNotNone(bucket._failed_at)
+
+        # Durante el cooldown no se toca SQLite aunque ya funcione.
+        bucket.path = self.path
+        bucket.try_acquire("read", 10, 1.0)
+        self.assertIsNone(self._stored_tokens("read"))
+
+        bucket._failed_at -= bucket.FAILURE_COOLDOWN + 1
+        bucket.try_acquire("read", 10, 1.0)
+        self.assertIsNotNone(self._stored_tokens("read"))
+
+    def test_locked_database_only_skips_that_call(self):
+        bucket = rate_limit.SQLiteTokenBucket(self.path)
+        bucket.try_acquire("read", 10, 1.0)
+        holder = sqlite3.connect(self.path, isolation_level=None)
+        holder.execute("BEGIN IMMEDIATE")
+        bucket._local.conn.execute("PRAGMA busy_timeout = 10")
+        with self.assertLogs("capig_form.services.rate_limit", "WARNING"):
+            self.assertEqual(bucket.try_acquire("read", 10, 1.0), 0)
+        holder.execute("COMMIT")
+        holder.close()
+        self.assertIsNone(bucket._failed_at)
+
+        bucket.try_acquire("read", 10, 1.0)
+        self.assertLess(self._stored_tokens("read"), 9)
+
+
+# Backoff minimo para que los reintentos no demoren el test.
+@mock.patch.object(rate_limit, "BACKOFF_BASE", 0.001)
+@override_settings(SHEETS_RETRY_DEADLINES={"batch": 5, "interactive": 5})
+class RetryTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        bucket = mock.patch.object(rate_limit, "_bucket", rate_limit.SQLiteTokenBucket(os.path.join(tmp.name, "q")))
+        bucket.start()
+        self.addCleanup(bucket.stop)
+        self.backend = FakeSheetsBackend(quota=True)
+        self.backend.create_spreadsheet(SHEET_ID, {"VENTAS_SOCIO": [["RUC", "ANIO"], ["0900000000001", "2023"]]})
+        self.addCleanup(google_sheets_service.set_backend, google_sheets_service.set_backend(self.backend))
+        self.sheet = google_sheets_service.get_google_sheet(SHEET_ID, "VENTAS_SOCIO")
+        self.backend.reset_stats()
+
+    def test_reads_are_retried_on_5xx(self):
+        self.backend.fail_next(2, 503, "values.get")
+        self.assertEqual(self.sheet.get_values("A2:B2"), [["0900000000001", "2023"]])
+        self.assertEqual(self.backend.stats()["calls"]["values.get"], 3)
+
+    def test_appends_are_not_retried_on_5xx(self):
+        self.backend.fail_next(1, 503, "values.append")
+        with self.assertRaises(Exception):
+            self.sheet.append_rows([["0900000000002", "2024"]])
+        self.assertEqual(self.backend.stats()["calls"]["values.append"], 1)
+        self.assertEqual(len(self.backend.values(SHEET_ID, "VENTAS_SOCIO")), 2)
+
+    def test_appends_are_retried_on_429(self):
+        self.backend.fail_next(1, 429, "values.append")
+        self.sheet.append_rows([["0900000000002", "2024"]])
+        self.assertEqual(self.backend.stats()["calls"]["values.append"], 2)
+        self.assertEqual(len(self.backend.values(SHEET_ID, "VENTAS_SOCIO")), 3)
@@ -0,0 +1,94 @@
+from django.test import SimpleTestCase
+
+from capig_form.services import google_sheets_service, sheet_schema
+from capig_form.services.fake_sheets import FakeSheetsBackend
+
+SHEET_ID = "test-sheet"
+SOCIOS = [
+    ["BASE DE DATOS"],
+    ["No", "RUC", "RAZON_SOCIAL", "FECHA_AFILIACION"],
+    ["1", "0900000000001", "EMPRESA A", ""],
+]
+
+
+class SheetSchemaTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = FakeSheetsBackend()
+        self.backend.create_spreadsheet(SHEET_ID, {"SOCIOS": [list(row) for row in SOCIOS]})
+        self.addCleanup(google_sheets_service.set_backend, google_sheets_service.set_backend(self.backend))
+        self.sheet = google_sheets_service.get_google_sheet(SHEET_ID, "SOCIOS")
+        self.backend.reset_stats()
+
+    def _reads(self):
+        return sum(self.backend.stats()["calls"].values())
+
+    def test_schema_is_detected_once(self):
+        schema = sheet_schema.get_schema(self.sheet, preferred=2, required_keys=("RUC",))
+        self.assertEqual((schema.head, schema.column_of("ruc")), (2, 2))
+        sheet_schema.get_schema(self.sheet, preferred=2, required_keys=("RUC",))
+        self.assertEqual(self._reads(), 1)
+
+    def test_cached_schema_without_the_callers_keys_is_redetected(self):
+        # Quien lee sin claves requeridas se queda con la fila 1 (el titulo).
+        self.assertEqual(sheet_schema.get_schema(self.sheet).head, 1)
+        self.assertIsNone(sheet_schema.cached_schema(self.sheet, ("RUC",)))
+
+        schema = sheet_schema.get_schema(self.sheet, preferred=2, required_keys=("RUC", "RAZON_SOCIAL"))
+        self.assertEqual(schema.head, 2)
+        self.assertEqual(self._reads(), 2)
+        # El esquema nuevo sirve tambien a quien no pide claves.
+        self.assertIs(sheet_schema.get_schema(self.sheet), schema)
+        self.assertEqual(self._reads(), 2)
+
+    def test_observe_redetects_only_when_the_header_changes(self):
+        values = [list(row) for row in SOCIOS]
+        schema = sheet_schema.observe(self.sheet, values, preferred=2, required_keys=("RUC",))
+        self.assertIs(sheet_schema.observe(self.sheet, values, preferred=2, required_keys=("RUC",)), schema)
+
+        values[1] = ["No", "RAZON_SOCIAL", "RUC", "FECHA_AFILIACION"]
+        moved = sheet_schema.observe(self.sheet, values, preferred=2, required_keys=("RUC",))
+        self.assertIsNot(moved, schema)
+        self.assertEqual(moved.column_of("RUC"), 3)
+        self.assertEqual(self._reads(), 0)
+
+
+class ProjectedRecordsTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = FakeSheetsBackend()
+        self.backend.create_spreadsheet(SHEET_ID, {"VENTAS_SOCIO": [
+            ["RUC", "RAZON_SOCIAL", "2022", "2023"],
+            ["0900000000001", "EMPRESA A", "10", "20"],
+        ]})
+        self.addCleanup(google_sheets_service.set_backend, google_sheets_service.set_backend(self.backend))
+        self.sheet = google_sheets_service.get_google_sheet(SHEET_ID, "VENTAS_SOCIO")
+        self.backend.reset_stats()
+
+    def _read(self):
+        self.backend.reset_stats()
+        result = google_sheets_service.get_projected_records(
+            self.sheet, ["RUC", "CIUDAD"], required_keys=("RUC",), pattern=r"\d{4}")
+        return result, dict(self.backend.stats()["calls"])
+
+    def test_only_the_projected_columns_are_read(self):
+        (head, header, records), calls = self._read()
+        self.assertEqual((head, header), (1, ["RUC", "2022", "2023"]))
+        self.assertEqual(records, [{"RUC": "0900000000001", "2022": "10", "2023": "20", "CIUDAD": ""}])
+        self.assertEqual(calls, {"values.get": 1, "values.batchGet": 1})
+
+    def test_missing_column_does_not_redetect_every_read(self):
+        self._read()
+        sheet_schema.invalidate_schema()
+        sheet_schema.get_schema(self.sheet, required_keys=("RUC",))
+        # Esquema cacheado con una columna que falta: se redetecta una vez...
+        _, calls = self._read()
+        self.assertEqual(calls, {"values.get": 1, "values.batchGet": 2})
+        # ...y despues se lee solo lo proyectado.
+        _, calls = self._read()
+        self.assertEqual(calls, {"values.batchGet": 1})
+
+    def test_changed_header_is_redetected(self):
+        self._read()
+        self.backend._spreadsheets[SHEET_ID]._by_title("VENTAS_SOCIO")._values[0][0] = "RUC_EMPRESA"
+        (head, header, records), calls = self._read()
+        self.assertEqual(calls, {"values.get": 1, "values.batchGet": 2})
+        self.assertEqual(header, ["2022", "2023"])
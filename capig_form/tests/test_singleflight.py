@@ -0,0 +1,137 @@
+import threading
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from capig_form.services.singleflight import FlightTimeout, Group
+from capig_form.services.snapshot_cache import SnapshotCache
+
+
+class _BlockingLoader:
+    """Carga que no termina hasta release(); cuenta cuantas veces se llamo."""
+
+    def __init__(self, value="valor", error=None):
+        self.value = value
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self._release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self._release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def release(self):
+        self._release.set()
+
+
+def _run(target, count):
+    results, errors = [], []
+
+    def _call():
+        try:
+            results.append(target())
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=_call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def _wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("La condicion no se cumplio a tiempo.")
+        time.sleep(0.001)
+
+
+class GroupTests(SimpleTestCase):
+    def _start(self, group, loader, count, timeout=None):
+        leader, results, errors = _run(lambda: group.do("k", loader, timeout=timeout), 1)
+        loader.started.wait(5)
+        waiters, more_results, more_errors = _run(lambda: group.do("k", loader, timeout=timeout), count - 1)
+        _wait_for(lambda: group._calls["k"].waiters == count - 1)
+        return leader + waiters, results, more_results, errors, more_errors
+
+    def test_concurrent_callers_share_one_load(self):
+        group, loader = Group(), _BlockingLoader()
+        threads, results, waited, errors, _ = self._start(group, loader, 8)
+        loader.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(loader.calls, 1)
+        self.assertEqual(results + waited, ["valor"] * 8)
+        self.assertFalse(group.in_flight("k"))
+
+    def test_waiters_get_the_leaders_error(self):
+        group, loader = Group(), _BlockingLoader(error=ValueError("sin datos"))
+        threads, _, _, errors, waiter_errors = self._start(group, loader, 4)
+        loader.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(loader.calls, 1)
+        self.assertEqual([type(exc) for exc in errors + waiter_errors], [ValueError] * 4)
+
+    def test_waiter_times_out_without_cancelling_the_load(self):
+        group, loader = Group(), _BlockingLoader()
+        leader, results, _ = _run(lambda: group.do("k", loader), 1)
+        loader.started.wait(5)
+        with self.assertRaises(FlightTimeout):
+            group.do("k", loader, timeout=0.01)
+        loader.release()
+        leader[0].join()
+        self.assertEqual((results, loader.calls), (["valor"], 1))
+
+
+class SnapshotCacheFlightTests(SimpleTestCase):
+    def test_expired_snapshot_is_loaded_once(self):
+        cache, loader = SnapshotCache(ttl=0, stale_ttl=0), _BlockingLoader()
+        threads, results, errors = _run(lambda: cache.get("k", loader), 6)
+        loader.started.wait(5)
+        _wait_for(lambda: cache._flights._calls[("k", 0)].waiters == 5)
+        loader.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((loader.calls, results, errors), (1, ["valor"] * 6, []))
+
+    @override_settings(SHEETS_FETCH_WAIT_TIMEOUT=0.01)
+    def test_slow_reload_serves_the_previous_value(self):
+        cache = SnapshotCache(ttl=0, stale_ttl=0)
+        cache.set("k", "viejo")
+        loader = _BlockingLoader("nuevo")
+        leader, results, _ = _run(lambda: cache.get("k", loader), 1)
+        loader.started.wait(5)
+        with self.assertLogs("capig_form.services.snapshot_cache", "WARNING"):
+            self.assertEqual(cache.get("k", loader), "viejo")
+        loader.release()
+        leader[0].join()
+        self.assertEqual((results, loader.calls), (["nuevo"], 1))
+
+    @override_settings(SHEETS_FETCH_WAIT_TIMEOUT=0.01)
+    def test_slow_first_load_raises_for_waiters(self):
+        cache, loader = SnapshotCache(), _BlockingLoader()
+        leader, _, _ = _run(lambda: cache.get("k", loader), 1)
+        loader.started.wait(5)
+        with self.assertRaises(FlightTimeout):
+            cache.get("k", loader)
+        loader.release()
+        leader[0].join()
+
+    def test_load_invalidated_midway_is_not_kept(self):
+        cache, loader = SnapshotCache(), _BlockingLoader("viejo")
+        leader, results, _ = _run(lambda: cache.get("k", loader), 1)
+        loader.started.wait(5)
+        cache.invalidate("k")
+        # La version cambio: no se espera la carga vieja, se hace una nueva.
+        self.assertEqual(cache.get("k", lambda: "nuevo"), "nuevo")
+        loader.release()
+        leader[0].join()
+        self.assertEqual(results, ["viejo"])
+        self.assertEqual(cache.peek("k"), "nuevo")
@@ -17,8 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from capig_form.health import health_check, metrics_view, outbox_health, readiness_check
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('health/', health_check, name='health'),
+    path('health/ready/', readiness_check, name='health_ready'),
+    path('health/outbox/', outbox_health, name='health_outbox'),
+    path('metrics/', metrics_view, name='metrics'),
     path('', include('forms.urls')),
 ]
 
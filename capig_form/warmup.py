@@ -0,0 +1,194 @@
+"""
+Arranque de gunicorn con --preload.
+
+`preload()` corre una sola vez en el proceso maestro, despues de cargar la
+app: resuelve el URLconf (importa vistas y servicios), importa gspread y
+google-auth e interpreta las credenciales. Los workers heredan todo eso por
+fork (copy-on-write) y atienden el primer request sin pagar esos imports.
+
+`warm_caches()` precarga ademas los snapshots que piden los formularios
+(lista de socios, sectores e indices por RUC). Con preload corre tambien una
+sola vez en el maestro (hook when_ready) y los workers heredan las caches ya
+cargadas: una ronda de lecturas a Sheets por despliegue, no una por worker.
+Ninguna llamada del warm-up reintenta mas alla de SHEETS_WARMUP_TIMEOUT, asi
+que un Sheets lento demora la creacion de los workers a lo sumo ese tiempo;
+lo que no alcanzo a cargarse se carga en frio en el primer request. Sin
+preload cada worker precarga en un hilo tras el fork (post_worker_init) y
+`/health/ready/` responde 503 mientras tanto.
+
+En el maestro no quedan conexiones ni hilos abiertos: la sesion HTTP de
+Sheets se recrea en cada worker tras el fork y el drenador del outbox
+arranca en `worker_started()` (hook post_fork).
+"""
+import importlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PRELOAD_ENV = "CAPIG_GUNICORN_PRELOAD"
+
+# Modulos pesados que los workers heredan ya importados.
+PRELOAD_MODULES = (
+    "gspread",
+    "google.auth.transport.requests",
+    "google.oauth2.service_account",
+    "capig_form.services.sheets_client",
+)
+
+
+def is_preloading():
+    """True si la app se carga en el maestro de gunicorn (preload_app)."""
+    return os.environ.get(PRELOAD_ENV) == "1"
+
+
+def preload():
+    from django.conf import settings
+    from django.urls import get_resolver
+
+    start = time.perf_counter()
+    get_resolver().url_patterns  # importa forms.urls -> vistas -> servicios
+
+    if getattr(settings, "SHEETS_BACKEND", "google") == "google":
+        for module in PRELOAD_MODULES:
+            importlib.import_module(module)
+
+        from capig_form.services import google_sheets_service
+
+        try:
+            google_sheets_service.get_service_account_info()
+        except Exception:
+            logger.exception("No se pudieron interpretar las credenciales durante el preload.")
+
+    logger.info("Preload listo en %.0f ms.", (time.perf_counter() - start) * 1000)
+
+
+# Estado del warm-up de caches; los workers lo heredan del maestro por fork.
+_warmup_lock = threading.Lock()
+_warmup_state = {"status": "idle", "items": {}}
+
+
+def _warmup_items():
+    from forms.utils import (
+        RUC_INDEXES,
+        get_ruc_index,
+        listar_empresas_socias,
+        listar_sectores,
+    )
+
+    # listar_empresas_socias reutiliza el indice de SOCIOS, por eso va primero.
+    items = [("SOCIOS:empresas", listar_empresas_socias), ("SECTOR:lista", listar_sectores)]
+    for name, projection in RUC_INDEXES:
+        label = f"ruc_index:{name}:{projection}" if projection else f"ruc_index:{name}"
+        items.append((label, lambda name=name, projection=projection: get_ruc_index(name, projection)))
+    return items
+
+
+def _warmup_enabled():
+    from django.conf import settings
+
+    return getattr(settings, "SHEETS_WARMUP_ENABLED", True)
+
+
+def mark_warmup_pending():
+    """Marca el warm-up como pendiente: /health/ready/ responde 503 hasta que termine."""
+    if _warmup_enabled():
+        with _warmup_lock:
+            _warmup_state.update(status="pending", items={})
+
+
+def warm_caches():
+    """
+    Precarga la lista de socios, los sectores y los indices por RUC.
+
+    Cada paso es independiente: si uno falla se registra y se sigue con el
+    resto (el request que lo necesite lo cargara en frio). Los pasos que no
+    alcanzan a empezar antes de SHEETS_WARMUP_TIMEOUT se omiten, y los
+    reintentos de cada llamada no pasan de ese limite.
+    """
+    from django.conf import settings
+    from django.db import connections
+
+    from capig_form.services.rate_limit import BATCH, sheets_deadline, sheets_priority
+
+    if not _warmup_enabled():
+        with _warmup_lock:
+            _warmup_state.update(status="disabled", items={})
+        return dict(_warmup_state)
+
+    timeout = getattr(settings, "SHEETS_WARMUP_TIMEOUT", 30)
+    start = time.perf_counter()
+    with _warmup_lock:
+        _warmup_state.update(status="running", items={}, pid=os.getpid())
+
+    items = {}
+    failed = False
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        with sheets_priority(BATCH), sheets_deadline(deadline):
+            for name, loader in _warmup_items():
+                if timeout and time.perf_counter() - start > timeout:
+                    items[name] = {"status": "skipped"}
+                    failed = True
+                    continue
+                step = time.perf_counter()
+                try:
+                    loader()
+                except Exception as exc:
+                    logger.warning("Warm-up de %s fallo: %s", name, exc)
+                    items[name] = {"status": "failed", "error": type(exc).__name__}
+                    failed = True
+                else:
+                    items[name] = {"status": "ok"}
+                items[name]["ms"] = round((time.perf_counter() - step) * 1000, 1)
+    finally:
+        # El hilo del warm-up no vuelve a usar sus conexiones a SQLite (espejo).
+        connections.close_all()
+
+    duration = round((time.perf_counter() - start) * 1000, 1)
+    with _warmup_lock:
+        _warmup_state.update(
+            status="partial" if failed else "done",
+            items=items,
+            duration_ms=duration,
+            finished_at=time.time(),
+        )
+    logger.info("Warm-up de caches en %.0f ms.", duration, extra={"warmup": items})
+    return warmup_status()
+
+
+def warm_caches_in_background():
+    """Warm-up por worker tras el fork (sin preload); no bloquea el arranque."""
+    mark_warmup_pending()
+    if _warmup_state["status"] != "pending":
+        return None
+    thread = threading.Thread(target=warm_caches, name="sheets-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def warmup_status():
+    with _warmup_lock:
+        state = dict(_warmup_state)
+        state["items"] = dict(state.get("items", {}))
+    # "partial" tambien cuenta como listo: lo que falto se carga en frio.
+    state["ready"] = state["status"] not in ("pending", "running")
+    return state
+
+
+def worker_started():
+    """Inicializacion por worker tras el fork (solo con preload)."""
+    from django.conf import settings
+
+    from capig_form.services import metrics
+
+    # Las llamadas del warm-up ya quedaron en el archivo de metricas del
+    # maestro; el worker no las vuelve a contar.
+    metrics.registry.clear()
+
+    if getattr(settings, "SHEETS_OUTBOX_ENABLED", False):
+        from forms.outbox import start_drainer
+
+        start_drainer()
@@ -14,3 +14,14 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'capig_form.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+from capig_form.warmup import is_preloading  # noqa: E402
+
+# Con --preload esto corre en el maestro: el drenador arranca en cada worker
+# desde el hook post_fork (gunicorn.conf.py), no aca.
+if getattr(settings, 'SHEETS_OUTBOX_ENABLED', False) and not is_preloading():
+    # Drena escrituras que quedaron pendientes de un despliegue anterior.
+    from forms.outbox import start_drainer  # noqa: E402
+
+    start_drainer()
@@ -5,14 +5,18 @@ import unicodedata
 from typing import Dict, List
 
 from django.conf import settings
-from gspread.utils import rowcol_to_a1
-
+from capig_form.services import sheet_schema
 from capig_form.services.google_sheets_service import (
-    ensure_row_capacity,
-    find_first_empty_row,
+    append_row_to_sheet,
     get_google_sheet,
 )
-from forms.utils import limpiar_ruc
+from forms.utils import (
+    _ruc_compare_key,
+    invalidar_indice_ruc,
+    invalidar_snapshot_socios,
+    limpiar_ruc,
+    registrar_fila_en_indice,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -112,19 +116,12 @@ def _normalize(col: str) -> str:
 
 def _get_header_row(sheet):
     """Prefiere la fila 2 como encabezado real de SOCIOS y usa fila 1 como fallback."""
-    fallback = None
-    for row_number in (2, 1):
-        header = sheet.row_values(row_number)
-        if not any((cell or "").strip() for cell in header):
-            continue
-        header_keys = {_normalize(cell) for cell in header if (cell or "").strip()}
-        if {"RUC", "RAZON_SOCIAL", "FECHA_AFILIACION"} & header_keys:
-            return row_number, header
-        if fallback is None:
-            fallback = (row_number, header)
-    if fallback is not None:
-        return fallback
-    raise RuntimeError("La hoja SOCIOS no tiene encabezados disponibles.")
+    schema = sheet_schema.get_schema(
+        sheet, preferred=2, required_keys=("RUC", "RAZON_SOCIAL", "FECHA_AFILIACION"))
+    if not schema.header:
+        sheet_schema.invalidate_schema(sheet)
+        raise RuntimeError("La hoja SOCIOS no tiene encabezados disponibles.")
+    return schema.head, schema.header
 
 
 def _next_autoincrement_value(sheet, header_row: int, header: List[str]) -> str:
@@ -226,10 +223,31 @@ def _build_fila(header: List[str], data: Dict[str, str]) -> List[str]:
     return fila
 
 
-def guardar_nuevo_afiliado_en_google_sheets(data: Dict[str, str]) -> bool:
+def afiliado_registrado(ruc) -> bool:
+    """True si el RUC ya tiene fila en SOCIOS (lee solo la columna RUC, sin caches)."""
+    sheet_id = os.getenv("SHEET_PATH") or getattr(settings, "SHEET_PATH", "")
+    if not sheet_id:
+        raise RuntimeError("SHEET_PATH no esta configurado.")
+
+    ruc_key = _ruc_compare_key(ruc)
+    if not ruc_key:
+        return False
+    sheet = get_google_sheet(sheet_id, "SOCIOS")
+    header_row, header = _get_header_row(sheet)
+    ruc_col = next(
+        (idx for idx, col in enumerate(header, start=1) if sheet_schema.normalize_header(col) == "RUC"), None)
+    if not ruc_col:
+        return False
+    return any(_ruc_compare_key(value) == ruc_key for value in sheet.col_values(ruc_col)[header_row:])
+
+
+def guardar_nuevo_afiliado_en_google_sheets(data: Dict[str, str], on_appended=None) -> bool:
     """
     Guarda un nuevo registro de afiliado en la hoja SOCIOS,
     alineado con los encabezados reales de la hoja.
+
+    `on_appended(fila)` se llama apenas el append tiene exito, antes de los
+    pasos posteriores (el outbox lo usa para no volver a escribir la fila).
     """
     sheet_id = os.getenv("SHEET_PATH") or getattr(settings, "SHEET_PATH", "")
     if not sheet_id:
@@ -247,13 +265,19 @@ def guardar_nuevo_afiliado_en_google_sheets(data: Dict[str, str]) -> bool:
     elif len(fila) > len(header):
         fila = fila[: len(header)]
 
-    next_row = find_first_empty_row(sheet, start_row=header_row + 1)
-    ensure_row_capacity(sheet, next_row)
-    start_cell = rowcol_to_a1(next_row, 1)
-    end_cell = rowcol_to_a1(next_row, len(header))
     try:
-        sheet.update(f"{start_cell}:{end_cell}", [fila], value_input_option="USER_ENTERED")
+        next_row = append_row_to_sheet(sheet, fila, header_row=header_row)
     except Exception:  # pragma: no cover - depende de API externa
-        logger.exception("Error al insertar afiliado en SOCIOS fila %s", next_row)
+        logger.exception("Error al insertar afiliado en SOCIOS (encabezado fila %s)", header_row)
+        # Aun si la API fallo, la fila pudo quedar escrita: mejor releer. El
+        # encabezado tambien se vuelve a detectar por si cambio la hoja.
+        invalidar_indice_ruc("SOCIOS")
+        sheet_schema.invalidate_schema(sheet)
         raise
+    else:
+        if on_appended is not None:
+            on_appended(next_row)
+    finally:
+        invalidar_snapshot_socios()
+    registrar_fila_en_indice("SOCIOS", next_row, dict(zip(header, fila)))
     return True
@@ -0,0 +1,22 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from forms.outbox import drain_all, outbox_stats
+
+
+class Command(BaseCommand):
+    help = "Envia a Google Sheets las escrituras pendientes del outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Solo muestra profundidad y antiguedad del outbox.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["stats"]:
+            sent = drain_all()
+            self.stdout.write(f"Entradas enviadas: {sent}")
+        self.stdout.write(json.dumps(outbox_stats()))
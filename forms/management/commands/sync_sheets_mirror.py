@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from forms.mirror import MIRROR_SHEETS, sync_all
+
+
+class Command(BaseCommand):
+    help = "Sincroniza el espejo SQLite con las hojas de Google Sheets."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sheet",
+            action="append",
+            choices=sorted(MIRROR_SHEETS),
+            help="Hoja a sincronizar (se puede repetir). Por defecto, todas.",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Reescribe todas las filas aunque no hayan cambiado.",
+        )
+
+    def handle(self, *args, **options):
+        failed = False
+        for result in sync_all(full=options["full"], worksheets=options["sheet"]):
+            if "error" in result:
+                failed = True
+                self.stderr.write(f"{result['worksheet']}: ERROR {result['error']}")
+                continue
+            self.stdout.write(
+                f"{result['worksheet']}: {result['created']} nuevas, "
+                f"{result['changed']} cambiadas, {result['deleted']} borradas"
+            )
+        if failed:
+            raise SystemExit(1)
@@ -0,0 +1,126 @@
+# Generated by Django 4.2.26 on 2026-10-17 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsesoriaMirror',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_number', models.PositiveIntegerField(unique=True)),
+                ('ruc_key', models.CharField(blank=True, db_index=True, max_length=20)),
+                ('values', models.JSONField(default=list)),
+                ('content_hash', models.CharField(max_length=40)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'mirror_asesorias',
+                'ordering': ['row_number'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CapacitacionMirror',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_number', models.PositiveIntegerField(unique=True)),
+                ('ruc_key', models.CharField(blank=True, db_index=True, max_length=20)),
+                ('values', models.JSONField(default=list)),
+                ('content_hash', models.CharField(max_length=40)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'mirror_capacitaciones',
+                'ordering': ['row_number'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='EstadoSocioMirror',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_number', models.PositiveIntegerField(unique=True)),
+                ('ruc_key', models.CharField(blank=True, db_index=True, max_length=20)),
+                ('values', models.JSONField(default=list)),
+                ('content_hash', models.CharField(max_length=40)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'mirror_estado_socio',
+                'ordering': ['row_number'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='MirrorSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('worksheet', models.CharField(max_length=100, unique=True)),
+                ('head', models.PositiveSmallIntegerField(default=1)),
+                ('header', models.JSONField(default=list)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('content_hash', models.CharField(blank=True, max_length=40)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'db_table': 'mirror_sync_state',
+            },
+        ),
+        migrations.CreateModel(
+            name='SectorMirror',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_number', models.PositiveIntegerField(unique=True)),
+                ('ruc_key', models.CharField(blank=True, db_index=True, max_length=20)),
+                ('values', models.JSONField(default=list)),
+                ('content_hash', models.CharField(max_length=40)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'mirror_sector',
+                'ordering': ['row_number'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='SocioMirror',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_number', models.PositiveIntegerField(unique=True)),
+                ('ruc_key', models.CharField(blank=True, db_index=True, max_length=20)),
+                ('values', models.JSONField(default=list)),
+                ('content_hash', models.CharField(max_length=40)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'mirror_socios',
+                'ordering': ['row_number'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaSocioMirror',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_number', models.PositiveIntegerField(unique=True)),
+                ('ruc_key', models.CharField(blank=True, db_index=True, max_length=20)),
+                ('values', models.JSONField(default=list)),
+                ('content_hash', models.CharField(max_length=40)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'mirror_ventas_socio',
+                'ordering': ['row_number'],
+                'abstract': False,
+            },
+        ),
+    ]
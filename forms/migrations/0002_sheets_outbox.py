@@ -0,0 +1,35 @@
+# Generated by Django 4.2.26 on 2026-10-17 17:36
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0001_sheets_mirror'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('worksheet', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('row', 'Fila'), ('afiliado', 'Nuevo afiliado')], default='row', max_length=20)),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('processing', 'Procesando'), ('sent', 'Enviado'), ('failed', 'Fallido')], db_index=True, default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('claim', models.CharField(blank=True, max_length=40)),
+                ('lease_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'sheets_outbox',
+                'ordering': ['id'],
+            },
+        ),
+    ]
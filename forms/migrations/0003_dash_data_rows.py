@@ -0,0 +1,27 @@
+# Generated by Django 4.2.26 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0002_sheets_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashDataRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ruc', models.CharField(max_length=20, unique=True)),
+                ('row_number', models.PositiveIntegerField()),
+                ('source_hash', models.CharField(max_length=40)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'dash_data_rows',
+                'ordering': ['row_number'],
+            },
+        ),
+    ]
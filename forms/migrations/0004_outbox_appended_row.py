@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-17 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0003_dash_data_rows'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxentry',
+            name='appended_row',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,204 @@
+"""
+Espejo local (SQLite) de las hojas del libro de Google Sheets.
+
+`sync_worksheet` descarga una hoja con una sola lectura y solo reescribe en
+la base las filas cuyo contenido cambio. Las vistas leen del espejo a traves
+de `load_records`, que devuelve None si la hoja nunca se sincronizo o si la
+copia es mas vieja que lo permitido; en ese caso se usa la API en vivo.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from capig_form.services import sheet_schema
+from capig_form.services.google_sheets_service import get_google_sheet
+from forms.models import (
+    AsesoriaMirror,
+    CapacitacionMirror,
+    EstadoSocioMirror,
+    MirrorSyncState,
+    SectorMirror,
+    SocioMirror,
+    VentaSocioMirror,
+)
+from forms.utils import _normalize_header_key, _ruc_compare_key
+
+logger = logging.getLogger(__name__)
+
+# hoja: (modelo, fila de encabezado preferida, columnas que validan el encabezado)
+MIRROR_SHEETS = {
+    "SOCIOS": (SocioMirror, 2, ("RUC",)),
+    "ESTADO_SOCIO": (EstadoSocioMirror, 1, ("RUC",)),
+    "VENTAS_SOCIO": (VentaSocioMirror, 1, ("RUC", "RAZON_SOCIAL", "ANIO", "AÑO", "ANO")),
+    "SECTOR": (SectorMirror, 1, ()),
+    "ASESORIAS": (AsesoriaMirror, 1, ()),
+    "CAPACITACIONES": (CapacitacionMirror, 1, ()),
+}
+
+
+def _sheet_id():
+    sheet_id = os.getenv("SHEET_PATH") or getattr(settings, "SHEET_PATH", "")
+    if not sheet_id:
+        raise RuntimeError("SHEET_PATH no esta configurado.")
+    return sheet_id
+
+
+def _hash(value):
+    payload = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _row_ruc_key(header, row):
+    for idx, col in enumerate(header):
+        if _normalize_header_key(col) == "RUC":
+            return _ruc_compare_key(row[idx] if idx < len(row) else "")
+    return ""
+
+
+def sync_worksheet(worksheet_name, full=False):
+    """
+    Sincroniza una hoja y devuelve un resumen con filas creadas/cambiadas/borradas.
+    Con full=True se reescriben todas las filas aunque el contenido no haya cambiado.
+    """
+    model, preferred_head, required_keys = MIRROR_SHEETS[worksheet_name]
+    state, _ = MirrorSyncState.objects.get_or_create(worksheet=worksheet_name)
+
+    try:
+        sheet = get_google_sheet(_sheet_id(), worksheet_name)
+        values = sheet.get_all_values(value_render_option="UNFORMATTED_VALUE")
+    except Exception as exc:
+        state.last_error = str(exc)[:2000]
+        state.save(update_fields=["last_error"])
+        raise
+
+    digest = _hash(values)
+    summary = {"worksheet": worksheet_name, "created": 0, "changed": 0, "deleted": 0}
+    if not full and state.content_hash == digest and state.last_synced_at:
+        state.last_synced_at = timezone.now()
+        state.last_error = ""
+        state.save(update_fields=["last_synced_at", "last_error"])
+        return summary
+
+    # La misma lectura deja al dia el esquema que usan las escrituras.
+    head = sheet_schema.observe(sheet, values, preferred=preferred_head, required_keys=required_keys).head
+    header = list(values[head - 1]) if len(values) >= head else []
+    # Si cambia el encabezado cambia el significado de cada columna: reescribir todo.
+    rebuild = full or header != state.header
+
+    existing = {} if rebuild else dict(model.objects.values_list("row_number", "content_hash"))
+    seen = set()
+    to_write = []
+    for row_number, row in enumerate(values[head:], start=head + 1):
+        seen.add(row_number)
+        row_hash = _hash(row)
+        previous = existing.get(row_number)
+        if previous == row_hash:
+            continue
+        summary["changed" if previous else "created"] += 1
+        to_write.append(
+            model(
+                row_number=row_number,
+                ruc_key=_row_ruc_key(header, row),
+                values=row,
+                content_hash=row_hash,
+            )
+        )
+
+    with transaction.atomic():
+        if rebuild:
+            summary["deleted"] = model.objects.exclude(row_number__in=seen).count()
+            model.objects.all().delete()
+        else:
+            stale = (set(existing) - seen) | {obj.row_number for obj in to_write}
+            summary["deleted"] = len(set(existing) - seen)
+            model.objects.filter(row_number__in=stale).delete()
+        model.objects.bulk_create(to_write, batch_size=500)
+
+        state.head = head
+        state.header = header
+        state.row_count = len(values) - head if len(values) >= head else 0
+        state.content_hash = digest
+        state.last_synced_at = timezone.now()
+        state.last_error = ""
+        state.save()
+
+    logger.info("Espejo %s sincronizado: %s", worksheet_name, summary)
+    return summary
+
+
+def sync_all(full=False, worksheets=None):
+    """Sincroniza todas las hojas espejadas; los errores de una no frenan a las demas."""
+    results = []
+    for name in worksheets or MIRROR_SHEETS:
+        try:
+            results.append(sync_worksheet(name, full=full))
+        except Exception as exc:
+            logger.exception("No se pudo sincronizar %s.", name)
+            results.append({"worksheet": name, "error": str(exc)})
+    return results
+
+
+def load_records(worksheet_name, max_age=None):
+    """
+    Devuelve (head, header, registros, numeros de fila) desde el espejo.
+
+    max_age en segundos; None usa SHEETS_MIRROR_MAX_AGE y 0 acepta cualquier
+    antiguedad (util cuando la API de Sheets no responde).
+    """
+    if worksheet_name not in MIRROR_SHEETS:
+        return None
+    if max_age is None:
+        max_age = getattr(settings, "SHEETS_MIRROR_MAX_AGE", 900)
+
+    state = MirrorSyncState.objects.filter(worksheet=worksheet_name).first()
+    if state is None or state.last_synced_at is None:
+        return None
+    if max_age and timezone.now() - state.last_synced_at > timedelta(seconds=max_age):
+        return None
+
+    model = MIRROR_SHEETS[worksheet_name][0]
+    header = state.header
+    records = []
+    row_numbers = []
+    for row_number, values in model.objects.values_list("row_number", "values"):
+        padded = list(values) + [""] * (len(header) - len(values))
+        records.append(dict(zip(header, padded)))
+        row_numbers.append(row_number)
+    return state.head, header, records, row_numbers
+
+
+def apply_row(worksheet_name, row_number, record):
+    """Refleja en el espejo una fila escrita por la aplicacion (write-through)."""
+    if worksheet_name not in MIRROR_SHEETS or not row_number:
+        return
+    state = MirrorSyncState.objects.filter(worksheet=worksheet_name).first()
+    if state is None or not state.header:
+        return
+    model = MIRROR_SHEETS[worksheet_name][0]
+    row = [record.get(col, "") for col in state.header]
+    model.objects.update_or_create(
+        row_number=row_number,
+        defaults={
+            "ruc_key": _row_ruc_key(state.header, row),
+            "values": row,
+            "content_hash": _hash(row),
+        },
+    )
+
+
+def mirror_status():
+    return [
+        {
+            "worksheet": state.worksheet,
+            "rows": state.row_count,
+            "last_synced_at": state.last_synced_at.isoformat() if state.last_synced_at else None,
+            "last_error": state.last_error,
+        }
+        for state in MirrorSyncState.objects.order_by("worksheet")
+    ]
@@ -0,0 +1,133 @@
+from django.db import models
+from django.utils import timezone
+
+
+class MirrorRow(models.Model):
+    """
+    Fila espejo de una hoja de Google Sheets.
+
+    `values` guarda la fila tal como la devuelve la API (UNFORMATTED_VALUE);
+    el encabezado vive en MirrorSyncState para armar los registros.
+    """
+
+    row_number = models.PositiveIntegerField(unique=True)
+    ruc_key = models.CharField(max_length=20, blank=True, db_index=True)
+    values = models.JSONField(default=list)
+    content_hash = models.CharField(max_length=40)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+        ordering = ["row_number"]
+
+
+class SocioMirror(MirrorRow):
+    class Meta(MirrorRow.Meta):
+        db_table = "mirror_socios"
+
+
+class EstadoSocioMirror(MirrorRow):
+    class Meta(MirrorRow.Meta):
+        db_table = "mirror_estado_socio"
+
+
+class VentaSocioMirror(MirrorRow):
+    class Meta(MirrorRow.Meta):
+        db_table = "mirror_ventas_socio"
+
+
+class SectorMirror(MirrorRow):
+    class Meta(MirrorRow.Meta):
+        db_table = "mirror_sector"
+
+
+class AsesoriaMirror(MirrorRow):
+    class Meta(MirrorRow.Meta):
+        db_table = "mirror_asesorias"
+
+
+class CapacitacionMirror(MirrorRow):
+    class Meta(MirrorRow.Meta):
+        db_table = "mirror_capacitaciones"
+
+
+class MirrorSyncState(models.Model):
+    """Marca de agua de la ultima sincronizacion de cada hoja."""
+
+    worksheet = models.CharField(max_length=100, unique=True)
+    head = models.PositiveSmallIntegerField(default=1)
+    header = models.JSONField(default=list)
+    row_count = models.PositiveIntegerField(default=0)
+    content_hash = models.CharField(max_length=40, blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        db_table = "mirror_sync_state"
+
+    def __str__(self):
+        return f"{self.worksheet} ({self.row_count} filas)"
+
+
+class DashDataRow(models.Model):
+    """
+    Fila de DASH_DATA escrita por dash_data_job: en que fila quedo cada RUC y
+    el hash de las filas de origen con que se calculo (modo incremental).
+    """
+
+    ruc = models.CharField(max_length=20, unique=True)
+    row_number = models.PositiveIntegerField()
+    source_hash = models.CharField(max_length=40)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "dash_data_rows"
+        ordering = ["row_number"]
+
+    def __str__(self):
+        return f"{self.ruc} -> fila {self.row_number}"
+
+
+class OutboxEntry(models.Model):
+    """Escritura pendiente hacia Google Sheets, registrada antes de responder."""
+
+    KIND_ROW = "row"
+    KIND_AFILIADO = "afiliado"
+    KIND_CHOICES = [
+        (KIND_ROW, "Fila"),
+        (KIND_AFILIADO, "Nuevo afiliado"),
+    ]
+
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pendiente"),
+        (STATUS_PROCESSING, "Procesando"),
+        (STATUS_SENT, "Enviado"),
+        (STATUS_FAILED, "Fallido"),
+    ]
+
+    worksheet = models.CharField(max_length=100)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_ROW)
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, db_index=True)
+    claim = models.CharField(max_length=40, blank=True)
+    lease_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    # Fila de SOCIOS donde quedo un afiliado: si falla un paso posterior al
+    # append, el reintento no lo vuelve a escribir.
+    appended_row = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "sheets_outbox"
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.worksheet} #{self.pk} ({self.status})"
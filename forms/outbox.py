@@ -0,0 +1,395 @@
+"""
+Outbox durable (SQLite) para las escrituras de formularios hacia Google Sheets.
+
+Las vistas registran la escritura en OutboxEntry y responden de inmediato.
+Un hilo de fondo por worker (o `manage.py drain_outbox`) toma las entradas
+pendientes, agrupa las filas por hoja en un unico values.append y reintenta
+con backoff exponencial con jitter cuando la API falla.
+
+El reclamo de entradas es un UPDATE condicional con un token: varios workers
+pueden drenar a la vez y cada entrada tiene un solo dueno. El dueno renueva
+su lease mientras envia (un envio BATCH puede reintentar varios minutos), y
+solo marca como enviadas o fallidas las entradas que siguen a su nombre. La
+entrega es "al menos una vez": si un worker muere despues de que Sheets
+acepto el append pero antes de marcarlo, al vencer el lease otro worker
+reenvia esas filas. Los afiliados guardan la fila escrita (appended_row) y
+antes de reintentarlos se busca su RUC en SOCIOS, para no duplicarlos.
+"""
+import contextlib
+import logging
+import os
+import random
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from capig_form.services import sheet_schema
+from capig_form.services.google_sheets_service import (
+    append_rows_to_sheet,
+    get_google_sheet,
+)
+from capig_form.services.rate_limit import BATCH, retry_deadline, sheets_priority
+from forms.models import OutboxEntry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_MAX_ATTEMPTS = 10
+DEFAULT_RETRY_BASE = 5
+DEFAULT_RETRY_CAP = 600
+DEFAULT_DRAIN_INTERVAL = 5
+DEFAULT_KEEP_DAYS = 7
+# Margen del lease sobre el deadline de reintentos BATCH de una llamada.
+LEASE_MARGIN_SECONDS = 120
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _sheet_id():
+    sheet_id = os.getenv("SHEET_PATH") or getattr(settings, "SHEET_PATH", "")
+    if not sheet_id:
+        raise RuntimeError("SHEET_PATH no esta configurado.")
+    return sheet_id
+
+
+def _lease_seconds():
+    return retry_deadline(BATCH) + LEASE_MARGIN_SECONDS
+
+
+_table_checked = None
+
+
+def _table_exists():
+    """
+    Revisa una vez por proceso que la tabla del outbox exista. Sin migrar, el
+    outbox queda apagado (escritura directa) en vez de fallar en cada POST.
+    """
+    global _table_checked
+    if _table_checked is None:
+        try:
+            _table_checked = OutboxEntry._meta.db_table in connection.introspection.table_names()
+        except Exception:
+            logger.exception("No se pudo revisar la tabla del outbox.")
+            _table_checked = False
+        if not _table_checked:
+            logger.warning("La tabla del outbox no existe (falta migrate); se escribe directo en Sheets.")
+    return _table_checked
+
+
+def outbox_enabled():
+    return bool(_setting("SHEETS_OUTBOX_ENABLED", False)) and _table_exists()
+
+
+# ========================
+# ENCOLAR
+# ========================
+def enqueue_row(worksheet_name, row):
+    entry = OutboxEntry.objects.create(
+        worksheet=worksheet_name, kind=OutboxEntry.KIND_ROW, payload=list(row))
+    _wake_drainer()
+    return entry
+
+
+def enqueue_afiliado(data):
+    entry = OutboxEntry.objects.create(
+        worksheet="SOCIOS", kind=OutboxEntry.KIND_AFILIADO, payload=dict(data))
+    _wake_drainer()
+    return entry
+
+
+def submit_row(worksheet_name, row):
+    """
+    Registra la fila en el outbox y devuelve True. Si el outbox esta apagado o
+    la base local falla, escribe directo en Sheets como antes.
+    """
+    if outbox_enabled():
+        try:
+            enqueue_row(worksheet_name, row)
+            return True
+        except Exception:
+            logger.exception("No se pudo usar el outbox; se escribe directo en '%s'.", worksheet_name)
+    from capig_form.services.google_sheets_service import insert_row_to_sheet
+
+    return insert_row_to_sheet(_sheet_id(), worksheet_name, row)
+
+
+def submit_ventas(data):
+    """Igual que submit_row para un registro de VENTAS_SOCIO."""
+    from forms.utils import construir_fila_ventas, guardar_ventas_afiliado
+
+    if outbox_enabled():
+        try:
+            enqueue_row("VENTAS_SOCIO", construir_fila_ventas(data))
+            return
+        except Exception:
+            logger.exception("No se pudo usar el outbox; se escribe directo en VENTAS_SOCIO.")
+    guardar_ventas_afiliado(data)
+
+
+def submit_afiliado(data):
+    """Igual que submit_row para un nuevo afiliado en SOCIOS."""
+    from forms.afiliacion_handler import guardar_nuevo_afiliado_en_google_sheets
+
+    if outbox_enabled():
+        try:
+            enqueue_afiliado(data)
+            return True
+        except Exception:
+            logger.exception("No se pudo usar el outbox; se escribe directo en SOCIOS.")
+    return guardar_nuevo_afiliado_en_google_sheets(data)
+
+
+# ========================
+# DRENAR
+# ========================
+def _backoff(attempts):
+    base = _setting("SHEETS_OUTBOX_RETRY_BASE", DEFAULT_RETRY_BASE)
+    cap = _setting("SHEETS_OUTBOX_RETRY_CAP", DEFAULT_RETRY_CAP)
+    delay = min(cap, base * (2 ** max(attempts - 1, 0)))
+    return timedelta(seconds=delay * random.uniform(0.5, 1.5))
+
+
+def _claim(limit):
+    """Marca como 'processing' hasta `limit` entradas listas y devuelve las reclamadas."""
+    now = timezone.now()
+    # Entradas de un worker que murio a mitad del envio vuelven a la cola.
+    OutboxEntry.objects.filter(
+        status=OutboxEntry.STATUS_PROCESSING, lease_until__lt=now,
+    ).update(status=OutboxEntry.STATUS_PENDING, claim="")
+
+    ids = list(
+        OutboxEntry.objects.filter(
+            status=OutboxEntry.STATUS_PENDING, next_attempt_at__lte=now,
+        ).values_list("id", flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    OutboxEntry.objects.filter(id__in=ids, status=OutboxEntry.STATUS_PENDING).update(
+        status=OutboxEntry.STATUS_PROCESSING,
+        claim=token,
+        lease_until=now + timedelta(seconds=_lease_seconds()),
+    )
+    return list(OutboxEntry.objects.filter(claim=token).order_by("id"))
+
+
+def _owned(entries):
+    """Entradas que siguen reclamadas por este drenador (mismo token)."""
+    return OutboxEntry.objects.filter(
+        id__in=[e.id for e in entries], claim=entries[0].claim,
+        status=OutboxEntry.STATUS_PROCESSING,
+    )
+
+
+@contextlib.contextmanager
+def _holding_lease(token):
+    """Renueva el lease de las entradas de `token` mientras dura el envio."""
+    stop = threading.Event()
+
+    def _renew():
+        try:
+            while not stop.wait(_lease_seconds() / 3):
+                OutboxEntry.objects.filter(claim=token, status=OutboxEntry.STATUS_PROCESSING).update(
+                    lease_until=timezone.now() + timedelta(seconds=_lease_seconds()))
+        except Exception:
+            logger.exception("No se pudo renovar el lease del outbox.")
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=_renew, name="sheets-outbox-lease", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _mark_sent(entries):
+    updated = _owned(entries).update(
+        status=OutboxEntry.STATUS_SENT, sent_at=timezone.now(), claim="", last_error="")
+    if updated < len(entries):
+        logger.warning("Se perdio el lease de %s entradas del outbox ya enviadas.", len(entries) - updated)
+
+
+def _mark_failed(entries, exc):
+    max_attempts = _setting("SHEETS_OUTBOX_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)
+    now = timezone.now()
+    for entry in entries:
+        entry.attempts += 1
+        fields = {"attempts": entry.attempts, "last_error": str(exc)[:2000], "claim": ""}
+        if entry.attempts >= max_attempts:
+            fields["status"] = OutboxEntry.STATUS_FAILED
+        else:
+            fields["status"] = OutboxEntry.STATUS_PENDING
+            fields["next_attempt_at"] = now + _backoff(entry.attempts)
+        # Si otro drenador ya la reclamo, su estado no se pisa.
+        _owned([entry]).update(**fields)
+
+
+def _pad_to_header(sheet, rows):
+    """Completa cada fila hasta el ancho del encabezado, como insert_row_to_sheet."""
+    header_len = len(sheet_schema.get_schema(sheet).header)
+    return [list(row) + [""] * (header_len - len(row)) for row in rows]
+
+
+def _send_rows(worksheet_name, entries):
+    from forms.utils import registrar_ventas_agregadas
+
+    sheet = get_google_sheet(_sheet_id(), worksheet_name)
+    rows = [entry.payload for entry in entries]
+    if worksheet_name != "VENTAS_SOCIO":
+        rows = _pad_to_header(sheet, rows)
+    try:
+        first_row = append_rows_to_sheet(sheet, rows, header_row=1)
+    except Exception:
+        # El reintento vuelve a detectar el encabezado por si cambio la hoja.
+        sheet_schema.invalidate_schema(sheet)
+        raise
+    if worksheet_name == "VENTAS_SOCIO":
+        registrar_ventas_agregadas(sheet, first_row, rows)
+
+
+def _record_append(entry, row_number):
+    entry.appended_row = row_number
+    _owned([entry]).update(appended_row=row_number)
+
+
+def _send_afiliado(entry):
+    from forms.afiliacion_handler import afiliado_registrado, guardar_nuevo_afiliado_en_google_sheets
+    from forms.utils import invalidar_indice_ruc, invalidar_snapshot_socios
+
+    if entry.appended_row or (entry.attempts and afiliado_registrado(entry.payload.get("ruc"))):
+        # Un intento anterior ya escribio la fila (quiza fallo despues, o el
+        # append vencio por timeout tras ejecutarse): solo falta refrescar.
+        logger.info("El afiliado del outbox #%s ya esta en SOCIOS; no se reescribe.", entry.id)
+        invalidar_indice_ruc("SOCIOS")
+        invalidar_snapshot_socios()
+        return
+    guardar_nuevo_afiliado_en_google_sheets(
+        entry.payload, on_appended=lambda row_number: _record_append(entry, row_number))
+
+
+def drain(limit=None):
+    """
+    Envia las entradas pendientes y devuelve cuantas quedaron enviadas.
+    Las filas de una misma hoja viajan en un solo values.append.
+    """
+    entries = _claim(limit or _setting("SHEETS_OUTBOX_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+    if not entries:
+        return 0
+
+    groups = OrderedDict()
+    afiliados = []
+    for entry in entries:
+        if entry.kind == OutboxEntry.KIND_AFILIADO:
+            afiliados.append(entry)
+        else:
+            groups.setdefault(entry.worksheet, []).append(entry)
+
+    sent = 0
+    with _holding_lease(entries[0].claim):
+        for worksheet_name, group in groups.items():
+            try:
+                _send_rows(worksheet_name, group)
+            except Exception as exc:
+                logger.exception("No se pudieron enviar %s filas a '%s'.", len(group), worksheet_name)
+                _mark_failed(group, exc)
+                continue
+            _mark_sent(group)
+            sent += len(group)
+
+        for entry in afiliados:
+            try:
+                _send_afiliado(entry)
+            except Exception as exc:
+                logger.exception("No se pudo registrar el afiliado del outbox #%s.", entry.id)
+                _mark_failed([entry], exc)
+                continue
+            _mark_sent([entry])
+            sent += 1
+    return sent
+
+
+def _prune_sent():
+    days = _setting("SHEETS_OUTBOX_KEEP_DAYS", DEFAULT_KEEP_DAYS)
+    OutboxEntry.objects.filter(
+        status=OutboxEntry.STATUS_SENT, sent_at__lt=timezone.now() - timedelta(days=days),
+    ).delete()
+
+
+def drain_all(max_rounds=50):
+    total = 0
+    for _ in range(max_rounds):
+        sent = drain()
+        if not sent:
+            break
+        total += sent
+    _prune_sent()
+    return total
+
+
+def outbox_stats():
+    """Profundidad del outbox y antiguedad de la entrada pendiente mas vieja."""
+    pending = OutboxEntry.objects.filter(
+        status__in=[OutboxEntry.STATUS_PENDING, OutboxEntry.STATUS_PROCESSING])
+    oldest = pending.order_by("created_at").values_list("created_at", flat=True).first()
+    return {
+        "depth": pending.count(),
+        "oldest_pending_age_seconds": (
+            round((timezone.now() - oldest).total_seconds(), 1) if oldest else 0
+        ),
+        "failed": OutboxEntry.objects.filter(status=OutboxEntry.STATUS_FAILED).count(),
+    }
+
+
+# ========================
+# HILO DE FONDO
+# ========================
+_drainer_lock = threading.Lock()
+_drainer_pid = None
+_drainer_event = threading.Event()
+
+
+def _drainer_loop(event):
+    interval = _setting("SHEETS_OUTBOX_DRAIN_INTERVAL", DEFAULT_DRAIN_INTERVAL)
+    while True:
+        event.wait(interval)
+        event.clear()
+        try:
+            close_old_connections()
+            # El envio diferido no compite con las vistas por la cuota.
+            with sheets_priority(BATCH):
+                drain_all()
+        except Exception:
+            logger.exception("Fallo inesperado drenando el outbox.")
+        finally:
+            close_old_connections()
+
+
+def start_drainer():
+    """Arranca (una vez por proceso) el hilo que drena el outbox."""
+    global _drainer_pid, _drainer_event
+    if not _table_exists():
+        return
+    with _drainer_lock:
+        if _drainer_pid == os.getpid():
+            return
+        # Tras un fork el hilo del padre no existe en el hijo: crear uno nuevo.
+        _drainer_pid = os.getpid()
+        _drainer_event = threading.Event()
+        threading.Thread(
+            target=_drainer_loop, args=(_drainer_event,), name="sheets-outbox", daemon=True,
+        ).start()
+
+
+def _wake_drainer():
+    start_drainer()
+    _drainer_event.set()
@@ -0,0 +1,86 @@
+import threading
+from typing import Callable, Dict, List, Optional
+
+
+class RucIndex:
+    """
+    Indice en memoria de una hoja por clave de RUC normalizada.
+
+    Guarda los registros leidos con get_all_records junto al numero de fila
+    real de cada uno, de modo que las busquedas son O(1) y las escrituras
+    puntuales pueden apuntar a la celda exacta. Se construye una vez por
+    snapshot y se actualiza en sitio cuando este worker escribe en la hoja.
+
+    Los indices armados desde el espejo local (from_mirror) pueden tener
+    numeros de fila viejos: no sirven para escribir en la hoja.
+    """
+
+    def __init__(self, records: List[dict], head: int, key_func: Callable[[dict], str],
+                 header: Optional[List[str]] = None, row_numbers: Optional[List[int]] = None,
+                 from_mirror: bool = False):
+        self.head = head
+        self.from_mirror = from_mirror
+        self.header = list(header) if header is not None else (
+            list(records[0].keys()) if records else [])
+        self._key_func = key_func
+        self._lock = threading.Lock()
+        self._records: List[dict] = []
+        self._row_numbers: List[int] = []
+        self._positions: Dict[str, List[int]] = {}
+        if row_numbers is None:
+            row_numbers = range(head + 1, head + 1 + len(records))
+        for row_number, record in zip(row_numbers, records):
+            self._append(row_number, record)
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def records(self) -> List[dict]:
+        """Registros en el orden de la hoja. No mutar."""
+        return self._records
+
+    def lookup(self, key: str) -> Optional[dict]:
+        """Primer registro con la clave indicada, como hacia el `next(...)` original."""
+        positions = self._positions.get(key) if key else None
+        return self._records[positions[0]] if positions else None
+
+    def lookup_all(self, key: str) -> List[dict]:
+        positions = self._positions.get(key, []) if key else []
+        return [self._records[pos] for pos in positions]
+
+    def row_of(self, key: str) -> Optional[int]:
+        """Numero de fila (1-based) del primer registro con la clave indicada."""
+        positions = self._positions.get(key) if key else None
+        return self._row_numbers[positions[0]] if positions else None
+
+    def column_of(self, name: str) -> Optional[int]:
+        """Numero de columna (1-based) del encabezado, comparando sin mayusculas/espacios."""
+        target = str(name or "").strip().upper()
+        for idx, col in enumerate(self.header, start=1):
+            if str(col or "").strip().upper() == target:
+                return idx
+        return None
+
+    def add(self, row_number: int, record: dict):
+        """Registra una fila recien agregada a la hoja."""
+        with self._lock:
+            self._append(row_number, record)
+
+    def update_fields(self, key: str, fields: dict):
+        """Actualiza en sitio el primer registro con la clave indicada."""
+        with self._lock:
+            positions = self._positions.get(key)
+            if not positions:
+                return
+            record = dict(self._records[positions[0]])
+            record.update(fields)
+            self._records[positions[0]] = record
+
+    def _append(self, row_number: int, record: dict):
+        position = len(self._records)
+        self._records.append(record)
+        self._row_numbers.append(row_number)
+        key = self._key_func(record)
+        if key:
+            self._positions.setdefault(key, []).append(position)
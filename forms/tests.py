@@ -0,0 +1,119 @@
+import os
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from capig_form.services import google_sheets_service
+from capig_form.services.fake_sheets import FakeSheetsBackend
+from capig_form.services.snapshot_cache import snapshots
+from forms import outbox
+from forms.models import OutboxEntry
+
+SHEET_ID = "test-sheet"
+SOCIOS = [
+    ["BASE DE DATOS"],
+    ["No", "RUC", "RAZON_SOCIAL", "FECHA_AFILIACION", "CIUDAD"],
+    ["1", "0900000000001", "EMPRESA A", "", "GYE"],
+]
+
+
+# Sin reintentos largos: un error inyectado falla el envio de inmediato.
+@override_settings(SHEETS_MIRROR_READS=False, SHEETS_RETRY_DEADLINES={"batch": 0.3, "interactive": 0.3})
+class OutboxTests(TransactionTestCase):
+    def setUp(self):
+        for patcher in (
+            mock.patch.dict(os.environ, {"SHEET_PATH": SHEET_ID}),
+            # Cada test drena a mano; sin el hilo de fondo.
+            mock.patch("forms.outbox._wake_drainer"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.backend = FakeSheetsBackend()
+        self.backend.create_spreadsheet(SHEET_ID, {
+            "ESTADO_SOCIO": [["RUC", "ESTADO"]],
+            "SOCIOS": [list(row) for row in SOCIOS],
+        })
+        self.addCleanup(google_sheets_service.set_backend, google_sheets_service.set_backend(self.backend))
+        snapshots.invalidate()
+        self.addCleanup(snapshots.invalidate)
+
+    def _make_due(self, entry):
+        OutboxEntry.objects.filter(id=entry.id).update(next_attempt_at=timezone.now())
+
+    def _socios_rucs(self):
+        return [row[1] for row in self.backend.values(SHEET_ID, "SOCIOS")[2:]]
+
+    def test_expired_lease_goes_to_the_next_drainer(self):
+        entry = outbox.enqueue_row("ESTADO_SOCIO", ["0900000000001", "ACTIVO"])
+        first = outbox._claim(10)
+        OutboxEntry.objects.filter(id=entry.id).update(lease_until=timezone.now() - timedelta(seconds=1))
+        second = outbox._claim(10)
+        self.assertNotEqual(first[0].claim, second[0].claim)
+
+        # El primer drenador perdio el lease: no puede pisar al nuevo dueno.
+        outbox._mark_failed(first, RuntimeError("lease vencido"))
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, OutboxEntry.STATUS_PROCESSING)
+        self.assertEqual(entry.claim, second[0].claim)
+        self.assertEqual(entry.attempts, 0)
+
+        outbox._mark_sent(second)
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, OutboxEntry.STATUS_SENT)
+
+    def test_live_lease_is_not_reclaimed(self):
+        outbox.enqueue_row("ESTADO_SOCIO", ["0900000000001", "ACTIVO"])
+        self.assertEqual(len(outbox._claim(10)), 1)
+        self.assertEqual(outbox._claim(10), [])
+
+    def test_rows_of_a_sheet_go_in_one_append(self):
+        outbox.enqueue_row("ESTADO_SOCIO", ["0900000000001", "ACTIVO"])
+        outbox.enqueue_row("ESTADO_SOCIO", ["0900000000002", "INACTIVO"])
+        self.backend.reset_stats()
+        self.assertEqual(outbox.drain(), 2)
+        self.assertEqual(self.backend.stats()["calls"].get("values.append"), 1)
+        self.assertEqual(
+            self.backend.values(SHEET_ID, "ESTADO_SOCIO")[1:],
+            [["0900000000001", "ACTIVO"], ["0900000000002", "INACTIVO"]],
+        )
+
+    def test_afiliado_is_not_appended_again_after_a_later_failure(self):
+        entry = outbox.enqueue_afiliado({"ruc": "0900000000002", "razon_social": "EMPRESA B"})
+        with mock.patch("forms.afiliacion_handler.registrar_fila_en_indice", side_effect=RuntimeError("indice")):
+            self.assertEqual(outbox.drain(), 0)
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, OutboxEntry.STATUS_PENDING)
+        self.assertEqual(entry.appended_row, 4)
+
+        self._make_due(entry)
+        self.assertEqual(outbox.drain(), 1)
+        self.assertEqual(self._socios_rucs(), ["0900000000001", "0900000000002"])
+
+    def test_afiliado_already_in_socios_is_not_appended_on_retry(self):
+        entry = outbox.enqueue_afiliado({"ruc": "0900000000003", "razon_social": "EMPRESA C"})
+        self.backend.fail_next(1, 503, "values.append")
+        self.assertEqual(outbox.drain(), 0)
+        entry.refresh_from_db()
+        self.assertEqual(entry.attempts, 1)
+        self.assertIsNone(entry.appended_row)
+
+        # El append fallo del lado del cliente pero Sheets lo habia aplicado.
+        self.backend._spreadsheets[SHEET_ID]._by_title("SOCIOS")._values.append(
+            ["2", "0900000000003", "EMPRESA C", "", ""])
+        self._make_due(entry)
+        self.assertEqual(outbox.drain(), 1)
+        self.assertEqual(self._socios_rucs(), ["0900000000001", "0900000000003"])
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, OutboxEntry.STATUS_SENT)
+
+    @override_settings(SHEETS_OUTBOX_ENABLED=True)
+    def test_outbox_stays_off_without_its_table(self):
+        with mock.patch.object(outbox, "_table_checked", None), \
+                mock.patch.object(connection.introspection, "table_names", return_value=[]):
+            self.assertFalse(outbox.outbox_enabled())
+            self.assertTrue(outbox.submit_row("ESTADO_SOCIO", ["0900000000001", "ACTIVO"]))
+        self.assertFalse(OutboxEntry.objects.exists())
+        self.assertEqual(self.backend.values(SHEET_ID, "ESTADO_SOCIO")[1:], [["0900000000001", "ACTIVO"]])
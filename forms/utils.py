@@ -1,17 +1,54 @@
 import logging
 import os
 import re
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict
 
 from django.conf import settings
-from gspread.utils import rowcol_to_a1
 
 from capig_form.services.google_sheets_service import (
-    ensure_row_capacity,
-    find_first_empty_row,
+    ProjectedRead,
+    SheetBatch,
+    WholeSheetRead,
+    append_row_to_sheet,
+    _get_client,
+    batch_read,
     get_google_sheet,
+    get_projected_records,
 )
+from capig_form.services import dates, request_cache, sheet_schema, tracing
+from capig_form.services.singleflight import Group
+from capig_form.services.snapshot_cache import snapshots
+from forms.ruc_index import RucIndex
+
+SOCIOS_SNAPSHOT_KEY = "SOCIOS:empresas"
+SECTORES_SNAPSHOT_KEY = "SECTOR:lista"
+RUC_INDEX_SHEETS = {
+    # hoja: (head preferido, required_keys para validar el encabezado)
+    "ESTADO_SOCIO": (1, ("RUC",)),
+    "SOCIOS": (2, ("RUC",)),
+    "VENTAS_SOCIO": (1, ("RUC", "RAZON_SOCIAL", "ANIO", "AÑO", "ANO")),
+}
+
+# Indices que leen solo algunas columnas: hoja -> {proyeccion: (columnas,
+# regex de columnas variables)}. SOCIOS tiene ~45 columnas y las vistas usan
+# cuatro, o el RUC y los años.
+RUC_INDEX_PROJECTIONS = {
+    "SOCIOS": {
+        "datos": (("RUC", "RAZON_SOCIAL", "CIUDAD", "FECHA_AFILIACION"), None),
+        "ventas": (("RUC",), r"\d{4}"),
+    },
+}
+# Indices que usan las vistas (los precarga el warm-up).
+RUC_INDEXES = [
+    ("ESTADO_SOCIO", None),
+    ("SOCIOS", "datos"),
+    ("SOCIOS", "ventas"),
+    ("VENTAS_SOCIO", None),
+]
+# Indices que necesita cada vista; se piden juntos con prefetch_ruc_indexes.
+ESTADO_VIEW_INDEXES = [("ESTADO_SOCIO", None), ("SOCIOS", "datos")]
+VENTAS_VIEW_INDEXES = [("SOCIOS", "datos"), ("SOCIOS", "ventas"), ("VENTAS_SOCIO", None)]
 
 EXPECTED_BASE_HEADERS = [
     "RUC",
@@ -51,7 +88,7 @@ def _normalize_row_keys(row: dict):
 
 def _normalize_header_key(value):
     """Normaliza encabezados para comparaciones."""
-    return str(value or "").replace("\u00a0", " ").strip().upper()
+    return sheet_schema.normalize_header(value)
 
 
 def excel_serial_to_iso(valor):
@@ -59,22 +96,11 @@ def excel_serial_to_iso(valor):
     Convierte serial de Excel (float/int o str numerico) a YYYY-MM-DD.
     Si no aplica, devuelve la cadena limpia.
     """
+    parsed = dates.from_excel_serial(valor)
+    if parsed is not None:
+        return parsed.isoformat()
     if isinstance(valor, str):
-        val_strip = valor.strip()
-        if re.fullmatch(r"-?\d+(\.\d+)?", val_strip):
-            try:
-                valor = float(val_strip)
-            except Exception:
-                return val_strip
-        else:
-            return val_strip
-
-    if isinstance(valor, (int, float)) and valor:
-        try:
-            base = datetime(1899, 12, 30)
-            return (base + timedelta(days=float(valor))).date().isoformat()
-        except Exception:
-            return str(valor)
+        return valor.strip()
     return str(valor).strip() if valor is not None else ""
 
 
@@ -94,55 +120,279 @@ def _get_base_datos_sheet():
     return get_google_sheet(sheet_id, "SOCIOS")
 
 
+def _get_records_and_head(sheet, head=2, required_keys=("RUC",)):
+    """
+    Lee la hoja con una sola llamada y arma los registros desde la fila de
+    encabezado del esquema (head solicitado, 1 o 2; ver sheet_schema).
+    Devuelve (fila de encabezado usada, registros, encabezado); (None, [], [])
+    si el encabezado no sirve.
+    """
+    with tracing.span("get_all_values", category="records", worksheet=getattr(sheet, "title", "")):
+        values = sheet.get_all_values(value_render_option="UNFORMATTED_VALUE")
+    return _records_from_values(sheet, values, head=head, required_keys=required_keys)
+
+
+def _records_from_values(sheet, values, head=2, required_keys=("RUC",)):
+    """Como _get_records_and_head, sobre la hoja ya leida."""
+    from gspread.utils import fill_gaps, to_records
+
+    if not values:
+        return None, [], []
+    values = fill_gaps(values)
+    schema = sheet_schema.observe(sheet, values, preferred=head, required_keys=required_keys)
+    if len(values) < schema.head:
+        return None, [], []
+    header = values[schema.head - 1]
+    duplicates = {key for key in header if header.count(key) > 1}
+    if duplicates:
+        # Como get_all_records: con claves repetidas los registros se pisarian.
+        logging.warning("El encabezado de %s tiene columnas repetidas: %s",
+                        getattr(sheet, "title", ""), sorted(duplicates))
+        return None, [], []
+    return schema.head, to_records(header, values[schema.head:]), header
+
+
 def _get_all_records_flexible(sheet, head=2, required_keys=("RUC",)):
+    """Igual que _get_records_and_head pero solo devuelve los registros."""
+    return _get_records_and_head(sheet, head=head, required_keys=required_keys)[1]
+
+
+# ========================
+# INDICES POR RUC
+# ========================
+def _record_ruc_key(record):
+    return _ruc_compare_key(_normalize_row_keys(record).get("RUC", ""))
+
+
+def _ruc_index_key(worksheet_name, projection=None):
+    if projection:
+        return f"{worksheet_name}:ruc_index:{projection}"
+    return f"{worksheet_name}:ruc_index"
+
+
+def _ruc_index_keys(worksheet_name):
+    """Claves de todos los indices de la hoja (completo y proyecciones)."""
+    return [_ruc_index_key(worksheet_name)] + [
+        _ruc_index_key(worksheet_name, name) for name in RUC_INDEX_PROJECTIONS.get(worksheet_name, {})
+    ]
+
+
+def _load_from_mirror(worksheet_name, max_age=None):
+    """Registros del espejo SQLite, o None si esta desactivado, vacio o viejo."""
+    if not getattr(settings, "SHEETS_MIRROR_READS", False):
+        return None
+    from forms import mirror
+
+    try:
+        return mirror.load_records(worksheet_name, max_age=max_age)
+    except Exception as exc:
+        # Tipicamente faltan las migraciones del espejo; se sigue con la API.
+        logging.warning("No se pudo leer el espejo local de %s: %s", worksheet_name, exc)
+        return None
+
+
+def _project_records(header, records, columns, pattern):
+    """Deja en los registros solo las columnas de la proyeccion."""
+    wanted = {_normalize_header_key(col) for col in columns}
+    regex = re.compile(pattern) if pattern else None
+    keep = [
+        col for col in header
+        if _normalize_header_key(col) in wanted or (regex and regex.fullmatch(_normalize_header_key(col)))
+    ]
+    return keep, [{col: record.get(col, "") for col in keep} for record in records]
+
+
+def _load_index_from_mirror(worksheet_name, projection, max_age=None):
+    cached = _load_from_mirror(worksheet_name, max_age=max_age)
+    if cached is not None and projection:
+        head, header, records, row_numbers = cached
+        header, records = _project_records(header, records, *RUC_INDEX_PROJECTIONS[worksheet_name][projection])
+        cached = head, header, records, row_numbers
+    return cached
+
+
+def _build_ruc_index(worksheet_name, projection=None, use_mirror=True):
+    cached = _load_index_from_mirror(worksheet_name, projection) if use_mirror else None
+    if cached is not None:
+        head, header, records, row_numbers = cached
+        return RucIndex(records, head, _record_ruc_key, header=header, row_numbers=row_numbers, from_mirror=True)
+
+    sheet_id = os.getenv("SHEET_PATH") or getattr(settings, "SHEET_PATH", "")
+    if not sheet_id:
+        raise RuntimeError("SHEET_PATH no esta configurado.")
+    head, required_keys = RUC_INDEX_SHEETS[worksheet_name]
+    try:
+        sheet = get_google_sheet(sheet_id, worksheet_name)
+        if projection:
+            columns, pattern = RUC_INDEX_PROJECTIONS[worksheet_name][projection]
+            used_head, header, records = get_projected_records(
+                sheet, columns, head=head, required_keys=required_keys, pattern=pattern)
+        else:
+            used_head, records, header = _get_records_and_head(sheet, head=head, required_keys=required_keys)
+    except Exception:
+        # Si Sheets no responde, una copia vieja del espejo es mejor que nada.
+        stale = _load_index_from_mirror(worksheet_name, projection, max_age=0) if use_mirror else None
+        if stale is None:
+            raise
+        logging.warning("Sheets no disponible; %s se sirve desde el espejo local.", worksheet_name)
+        head, header, records, row_numbers = stale
+        return RucIndex(records, head, _record_ruc_key, header=header, row_numbers=row_numbers, from_mirror=True)
+    return RucIndex(records, used_head or head, _record_ruc_key, header=header)
+
+
+def get_ruc_index(worksheet_name, projection=None):
     """
-    Lee registros probando encabezados en orden: head solicitado, 1 y 2.
-    Valida que la cabecera se parezca a la esperada.
+    Indice por RUC de ESTADO_SOCIO, SOCIOS o VENTAS_SOCIO (cacheado por
+    snapshot). Con `projection` (ver RUC_INDEX_PROJECTIONS) el indice solo
+    tiene esas columnas. Dentro de un request se usa siempre el mismo indice.
     """
-    required = {_normalize_header_key(k) for k in (required_keys or []) if k}
-
-    candidate_heads = []
-    for value in (head, 1, 2):
-        if value and value not in candidate_heads:
-            candidate_heads.append(value)
-
-    for candidate in candidate_heads:
-        if required:
-            try:
-                header_values = sheet.row_values(candidate)
-            except Exception:
-                continue
-            header_keys = {
-                _normalize_header_key(v) for v in header_values if str(v or "").strip()
-            }
-            if header_keys and not (header_keys & required):
-                continue
+    key = _ruc_index_key(worksheet_name, projection)
+    return request_cache.memoize(key, lambda: snapshots.get(
+        key,
+        lambda: _build_ruc_index(worksheet_name, projection),
+        ttl=getattr(settings, "RUC_INDEX_TTL", None),
+        stale_ttl=getattr(settings, "RUC_INDEX_STALE_TTL", None),
+    ))
 
-        try:
-            return sheet.get_all_records(
-                head=candidate,
-                value_render_option="UNFORMATTED_VALUE",
-                numericise_ignore=["all"],
-            )
-        except Exception:
+
+def _install_ruc_index(key, index):
+    # Tambien en el request: con RUC_INDEX_TTL=0 el snapshot ya estaria vencido.
+    snapshots.set(key, index)
+    request_cache.memoize(key, lambda: index)
+
+
+_prefetch_flights = Group()
+
+
+def prefetch_ruc_indexes(indexes):
+    """
+    Carga juntos los indices [(hoja, proyeccion)] que falten, en un solo
+    values.batchGet, para que una vista que necesita varias hojas espere un
+    solo viaje a la API en vez de uno por hoja. Los que ya estan en cache
+    (frescos o revalidandose), los que otro request ya esta cargando o los
+    que salen del espejo no se leen. Si la lectura falla no pasa nada:
+    get_ruc_index los carga despues uno por uno.
+    """
+    ttl = getattr(settings, "RUC_INDEX_TTL", None)
+    stale_ttl = getattr(settings, "RUC_INDEX_STALE_TTL", None)
+    pending = []
+    for worksheet_name, projection in indexes:
+        key = _ruc_index_key(worksheet_name, projection)
+        if (request_cache.contains(key) or snapshots.has(key, ttl=ttl, stale_ttl=stale_ttl)
+                or snapshots.loading(key)):
+            continue
+        cached = _load_index_from_mirror(worksheet_name, projection)
+        if cached is not None:
+            head, header, records, row_numbers = cached
+            _install_ruc_index(key, RucIndex(
+                records, head, _record_ruc_key, header=header, row_numbers=row_numbers, from_mirror=True))
+            continue
+        pending.append((worksheet_name, projection, key))
+    if not pending:
+        return
+
+    sheet_id = os.getenv("SHEET_PATH") or getattr(settings, "SHEET_PATH", "")
+    if not sheet_id:
+        return
+    keys = tuple(key for _, _, key in pending)
+    try:
+        # Requests simultaneos de la misma vista comparten la misma lectura.
+        loaded = _prefetch_flights.do(
+            (keys, tuple(snapshots.version(key) for key in keys)),
+            lambda: _read_ruc_indexes(sheet_id, pending),
+            timeout=getattr(settings, "SHEETS_FETCH_WAIT_TIMEOUT", None),
+        )
+    except Exception as exc:
+        logging.warning("No se pudieron precargar los indices %s: %s", list(keys), exc)
+        return
+    for key, index in loaded.items():
+        request_cache.memoize(key, lambda index=index: index)
+
+
+def _read_ruc_indexes(sheet_id, pending):
+    sheets = {name: get_google_sheet(sheet_id, name) for name, _, _ in pending}
+    reads = {}
+    for worksheet_name, projection, _ in pending:
+        sheet = sheets[worksheet_name]
+        head, required_keys = RUC_INDEX_SHEETS[worksheet_name]
+        if projection and sheet_schema.cached_schema(sheet, required_keys) is not None:
+            columns, pattern = RUC_INDEX_PROJECTIONS[worksheet_name][projection]
+            reads[(worksheet_name, projection)] = ProjectedRead(
+                sheet, columns, head=head, required_keys=required_keys, pattern=pattern)
+        else:
+            # Sin esquema conocido se lee la hoja entera (una vez) y se
+            # proyecta en memoria: sigue siendo un solo viaje.
+            reads.setdefault((worksheet_name, None), WholeSheetRead(sheet))
+    results = dict(zip(reads, batch_read(sheet_id, list(reads.values()))))
+
+    loaded = {}
+    for worksheet_name, projection, key in pending:
+        if results.get((worksheet_name, projection)) is not None and projection:
+            head, header, records = results[(worksheet_name, projection)]
+        elif (worksheet_name, None) in results:
+            preferred, required_keys = RUC_INDEX_SHEETS[worksheet_name]
+            head, records, header = _records_from_values(
+                sheets[worksheet_name], results[(worksheet_name, None)], head=preferred, required_keys=required_keys)
+            head = head or preferred
+            if projection:
+                header, records = _project_records(
+                    header, records, *RUC_INDEX_PROJECTIONS[worksheet_name][projection])
+        else:
+            # Esquema viejo: ya se invalido y get_ruc_index lo relee.
             continue
-    return []
+        loaded[key] = RucIndex(records, head, _record_ruc_key, header=header)
+        snapshots.set(key, loaded[key])
+    return loaded
+
+
+def _peek_ruc_indexes(worksheet_name):
+    """Indices ya cargados de la hoja, para actualizarlos tras una escritura."""
+    indexes = (snapshots.peek(key) for key in _ruc_index_keys(worksheet_name))
+    return [index for index in indexes if index is not None]
+
+
+def _peek_ruc_index(worksheet_name):
+    """Indice completo ya cargado (o None) para actualizarlo tras una escritura."""
+    return snapshots.peek(_ruc_index_key(worksheet_name))
+
+
+def invalidar_indice_ruc(worksheet_name):
+    for key in _ruc_index_keys(worksheet_name):
+        snapshots.invalidate(key)
+        request_cache.forget(key)
+
+
+def registrar_fila_en_indice(worksheet_name, row_number, record):
+    """
+    Agrega a los indices cargados la fila recien escrita. Si no se conoce la
+    fila destino o el encabezado, se invalidan para que la proxima lectura
+    los rehaga.
+    """
+    for index in _peek_ruc_indexes(worksheet_name):
+        if row_number and index.header:
+            index.add(row_number, {col: record.get(col, "") for col in index.header})
+        else:
+            invalidar_indice_ruc(worksheet_name)
+            break
+    _reflejar_en_espejo(worksheet_name, row_number, record)
+
+
+def _reflejar_en_espejo(worksheet_name, row_number, record):
+    if not getattr(settings, "SHEETS_MIRROR_READS", False):
+        return
+    from forms import mirror
+
+    try:
+        mirror.apply_row(worksheet_name, row_number, record)
+    except Exception:
+        logging.exception("No se pudo reflejar la fila %s de %s en el espejo.", row_number, worksheet_name)
 
 
 def buscar_afiliado_por_ruc(ruc):
     """Busca primero en ESTADO_SOCIO; si falta info, completa desde SOCIOS."""
     ruc_key = _ruc_compare_key(ruc)
 
-    estado_sheet = _get_estado_sheet()
-    estado_rows = _get_all_records_flexible(estado_sheet, head=1)
-    afiliado = next(
-        (
-            row
-            for row in estado_rows
-            if _ruc_compare_key(row.get("RUC", "")) == ruc_key
-        ),
-        None,
-    )
+    afiliado = get_ruc_index("ESTADO_SOCIO").lookup(ruc_key)
 
     if afiliado and all(
         afiliado.get(key) for key in ["RAZON_SOCIAL", "CIUDAD", "FECHA_AFILIACION", "ESTADO"]
@@ -154,17 +404,6 @@ def buscar_afiliado_por_ruc(ruc):
             "estado": afiliado.get("ESTADO", ""),
         }
 
-    base_sheet = _get_base_datos_sheet()
-    base_rows = _get_all_records_flexible(base_sheet, head=2)
-    base_row = next(
-        (
-            row
-            for row in base_rows
-            if _ruc_compare_key(row.get("RUC", "")) == ruc_key
-        ),
-        None,
-    )
-
     if afiliado:
         return {
             "razon_social": afiliado.get("RAZON_SOCIAL", ""),
@@ -173,6 +412,7 @@ def buscar_afiliado_por_ruc(ruc):
             "estado": afiliado.get("ESTADO", ""),
         }
 
+    base_row = get_ruc_index("SOCIOS", "datos").lookup(ruc_key)
     if not base_row:
         return None
 
@@ -184,104 +424,98 @@ def buscar_afiliado_por_ruc(ruc):
     }
 
 
+def _refresh_ruc_index(worksheet_name):
+    """Relee el indice completo de la hoja desde Sheets (sin espejo) y lo instala."""
+    invalidar_indice_ruc(worksheet_name)
+    index = _build_ruc_index(worksheet_name, use_mirror=False)
+    _install_ruc_index(_ruc_index_key(worksheet_name), index)
+    return index
+
+
+def _fila_tiene_ruc(sheet, index, row_number, ruc_key):
+    """True si la fila `row_number` de la hoja sigue teniendo ese RUC (lee una celda)."""
+    from gspread.utils import rowcol_to_a1
+
+    col_ruc = index.column_of("RUC")
+    if not col_ruc:
+        return False
+    values = sheet.get_values(rowcol_to_a1(row_number, col_ruc), value_render_option="UNFORMATTED_VALUE")
+    return bool(values and values[0]) and _ruc_compare_key(values[0][0]) == ruc_key
+
+
 def actualizar_estado_afiliado(ruc, nuevo_estado):
     """Actualiza el estado del afiliado y crea fila si no existe."""
+    ruc_key = _ruc_compare_key(ruc)
     sheet = _get_estado_sheet()
-    data = sheet.get_all_records(
-        value_render_option="UNFORMATTED_VALUE",
-        numericise_ignore=["all"],
-    )
-    header = [col.strip().upper() for col in sheet.row_values(1)]
-
-    def _col_index(nombre):
-        try:
-            return header.index(nombre) + 1
-        except ValueError:
-            return None
-
-    col_estado = _col_index("ESTADO")
-    col_actualizacion = _col_index("ACTUALIZACION_ESTADO")
-    encontrado = False
-
-    for idx, row in enumerate(data, start=2):
-        if _ruc_compare_key(row.get("RUC", "")) == _ruc_compare_key(ruc):
-            encontrado = True
-            if col_estado:
-                sheet.update_cell(idx, col_estado, nuevo_estado)
-            if col_actualizacion:
-                sheet.update_cell(
-                    idx,
-                    col_actualizacion,
-                    datetime.now().strftime("%Y-%m-%d %H:%M"),
-                )
-            break
-
-    if not encontrado:
-        base_sheet = _get_base_datos_sheet()
-        base_rows = _get_all_records_flexible(base_sheet, head=2)
-        base_row = next(
-            (
-                row
-                for row in base_rows
-                if _ruc_compare_key(row.get("RUC", "")) == _ruc_compare_key(ruc)
-            ),
-            {},
+    index = get_ruc_index("ESTADO_SOCIO")
+    target_row = index.row_of(ruc_key)
+    if index.from_mirror or not (target_row and _fila_tiene_ruc(sheet, index, target_row, ruc_key)):
+        # El indice puede tener RUC_INDEX_TTL + STALE segundos (o venir del
+        # espejo): si alguien borro u ordeno filas, o agrego este RUC desde
+        # otro worker, escribir o agregar con el indice pisaria otra empresa
+        # o duplicaria la fila.
+        index = _refresh_ruc_index("ESTADO_SOCIO")
+        target_row = index.row_of(ruc_key)
+
+    col_estado = index.column_of("ESTADO")
+    col_actualizacion = index.column_of("ACTUALIZACION_ESTADO")
+    actualizacion = datetime.now().strftime("%Y-%m-%d %H:%M")
+
+    if target_row:
+        batch = SheetBatch()
+        if col_estado:
+            batch.update_cell(sheet, target_row, col_estado, nuevo_estado)
+        if col_actualizacion:
+            batch.update_cell(sheet, target_row, col_actualizacion, actualizacion)
+        batch.commit()
+        index.update_fields(
+            ruc_key,
+            {
+                index.header[col - 1]: value
+                for col, value in ((col_estado, nuevo_estado), (col_actualizacion, actualizacion))
+                if col
+            },
         )
-        new_row = [
-            limpiar_ruc(ruc),
-            base_row.get("RAZON_SOCIAL", ""),
-            excel_serial_to_iso(base_row.get("FECHA_AFILIACION", "")),
-            nuevo_estado,
-            base_row.get("CIUDAD", ""),
-            datetime.now().strftime("%Y-%m-%d %H:%M"),
-        ]
+        _reflejar_en_espejo("ESTADO_SOCIO", target_row, index.lookup(ruc_key))
+        return
+
+    base_row = get_ruc_index("SOCIOS", "datos").lookup(ruc_key) or {}
+    new_row = [
+        limpiar_ruc(ruc),
+        base_row.get("RAZON_SOCIAL", ""),
+        excel_serial_to_iso(base_row.get("FECHA_AFILIACION", "")),
+        nuevo_estado,
+        base_row.get("CIUDAD", ""),
+        actualizacion,
+    ]
 
-        header_len = max(len(header), len(new_row))
-        target_row = find_first_empty_row(sheet, start_row=2)
-        ensure_row_capacity(sheet, target_row)
+    header = index.header or sheet_schema.get_schema(sheet).header
+    header_len = max(len(header), len(new_row))
 
-        if len(new_row) < header_len:
-            new_row += [""] * (header_len - len(new_row))
-        elif len(new_row) > header_len:
-            new_row = new_row[:header_len]
+    if len(new_row) < header_len:
+        new_row += [""] * (header_len - len(new_row))
+    elif len(new_row) > header_len:
+        new_row = new_row[:header_len]
 
-        start_cell = rowcol_to_a1(target_row, 1)
-        end_cell = rowcol_to_a1(target_row, header_len)
-        sheet.update(f"{start_cell}:{end_cell}", [new_row], value_input_option="USER_ENTERED")
+    row_number = append_row_to_sheet(sheet, new_row, header_row=index.head)
+    registrar_fila_en_indice("ESTADO_SOCIO", row_number, dict(zip(index.header, new_row)))
 
 
 def buscar_afiliado_por_ruc_base_datos(ruc):
     """Busca un afiliado unicamente en la hoja SOCIOS."""
-    ruc_key = _ruc_compare_key(ruc)
-    sheet = _get_base_datos_sheet()
-    rows = _get_all_records_flexible(sheet, head=2)
-    for row in rows:
-        if _ruc_compare_key(row.get("RUC", "")) == ruc_key:
-            return {
-                "razon_social": row.get("RAZON_SOCIAL", ""),
-                "ciudad": row.get("CIUDAD", ""),
-                "fecha_afiliacion": excel_serial_to_iso(row.get("FECHA_AFILIACION", "")),
-            }
-    return None
-
+    row = get_ruc_index("SOCIOS", "datos").lookup(_ruc_compare_key(ruc))
+    if not row:
+        return None
+    return {
+        "razon_social": row.get("RAZON_SOCIAL", ""),
+        "ciudad": row.get("CIUDAD", ""),
+        "fecha_afiliacion": excel_serial_to_iso(row.get("FECHA_AFILIACION", "")),
+    }
 
-def listar_empresas_socias():
-    """
-    Devuelve la lista de empresas registradas en SOCIOS.
 
-    Se usa para poblar selects de formularios operativos sin depender
-    del indice de la hoja ni de columnas fijas.
-    """
-    try:
-        sheet = _get_base_datos_sheet()
-        rows = _get_all_records_flexible(
-            sheet,
-            head=2,
-            required_keys=("RUC", "RAZON_SOCIAL"),
-        )
-    except Exception:
-        logging.exception("No se pudo cargar la lista de empresas desde SOCIOS.")
-        return []
+def _cargar_empresas_socias_desde_sheets():
+    # Reutiliza el snapshot del indice de SOCIOS: una sola lectura para ambos.
+    rows = get_ruc_index("SOCIOS", "datos").records
 
     empresas = {}
     for row in rows:
@@ -310,6 +544,68 @@ def listar_empresas_socias():
     )
 
 
+def listar_empresas_socias():
+    """
+    Devuelve la lista de empresas registradas en SOCIOS.
+
+    Se usa para poblar selects de formularios operativos sin depender
+    del indice de la hoja ni de columnas fijas. La lista sale de un snapshot
+    en memoria (SOCIOS_CACHE_TTL / SOCIOS_CACHE_STALE_TTL); no debe mutarse.
+    """
+    try:
+        return snapshots.get(
+            SOCIOS_SNAPSHOT_KEY,
+            _cargar_empresas_socias_desde_sheets,
+            ttl=getattr(settings, "SOCIOS_CACHE_TTL", None),
+            stale_ttl=getattr(settings, "SOCIOS_CACHE_STALE_TTL", None),
+        )
+    except Exception:
+        logging.exception("No se pudo cargar la lista de empresas desde SOCIOS.")
+        return []
+
+
+def _cargar_sectores_desde_sheets():
+    sheet_id = getattr(settings, "SHEET_PATH", "")
+    try:
+        sheet = get_google_sheet(sheet_id, "SECTOR")
+    except Exception:
+        spreadsheet = _get_client().open_by_key(sheet_id)
+        sheet = next(
+            (ws for ws in spreadsheet.worksheets() if ws.title.strip().lower() == "sector"),
+            None,
+        )
+        if not sheet:
+            # Se lanza para no cachear una lista vacia.
+            raise RuntimeError("No existe la hoja SECTOR.")
+
+    valores = sheet.col_values(1)
+    return [val.strip() for val in valores[1:] if val.strip()]
+
+
+def listar_sectores():
+    """
+    Devuelve la lista de sectores de la hoja SECTOR.
+
+    Cambia muy poco, asi que se guarda como snapshot (SECTOR_CACHE_TTL /
+    SECTOR_CACHE_STALE_TTL). Si no se puede leer devuelve [] sin cachearla.
+    """
+    try:
+        return snapshots.get(
+            SECTORES_SNAPSHOT_KEY,
+            _cargar_sectores_desde_sheets,
+            ttl=getattr(settings, "SECTOR_CACHE_TTL", None),
+            stale_ttl=getattr(settings, "SECTOR_CACHE_STALE_TTL", None),
+        )
+    except Exception:
+        logging.exception("No se pudo cargar la lista de sectores desde SECTOR.")
+        return []
+
+
+def invalidar_snapshot_socios():
+    """Descarta la lista de socios cacheada tras escribir en SOCIOS."""
+    snapshots.invalidate(SOCIOS_SNAPSHOT_KEY)
+
+
 def obtener_ventas_por_ruc(ruc):
     """Obtiene ventas historicas del afiliado desde VENTAS_SOCIO y, si no hay, desde SOCIOS."""
     ruc_key = _ruc_compare_key(ruc)
@@ -321,23 +617,13 @@ def obtener_ventas_por_ruc(ruc):
         return []
 
     try:
-        ventas_sheet = get_google_sheet(sheet_id, "VENTAS_SOCIO")
+        rows = get_ruc_index("VENTAS_SOCIO").lookup_all(ruc_key)
     except Exception:
-        ventas_sheet = None
-
-    rows = []
-    if ventas_sheet is not None:
-        rows = _get_all_records_flexible(
-            ventas_sheet,
-            head=1,
-            required_keys=("RUC", "RAZON_SOCIAL", "ANIO", "AÑO", "ANO"),
-        )
+        rows = []
 
     ventas = []
     for row in rows:
         row_norm = _normalize_row_keys(row)
-        if _ruc_compare_key(row_norm.get("RUC", "")) != ruc_key:
-            continue
 
         anio = str(
             row_norm.get("ANIO") or row_norm.get("AÑO") or row_norm.get("ANO") or ""
@@ -369,65 +655,42 @@ def obtener_ventas_por_ruc(ruc):
         )
 
     try:
-        base_sheet = get_google_sheet(sheet_id, "SOCIOS")
-        base_rows = _get_all_records_flexible(base_sheet, head=2)
+        base_row = get_ruc_index("SOCIOS", "ventas").lookup(ruc_key)
     except Exception:
-        base_rows = []
-
-    if base_rows:
-        try:
-            base_row = next(
-                (
-                    row
-                    for row in base_rows
-                    if _ruc_compare_key(_normalize_row_keys(row).get("RUC", "")) == ruc_key
-                ),
-                None,
+        base_row = None
+
+    if base_row:
+        base_row_norm = _normalize_row_keys(base_row)
+        existing_years = {v.get("anio") for v in ventas if v.get("anio")}
+        for key, value in base_row_norm.items():
+            key_str = (key or "").replace("\u00a0", "").strip()
+            if not key_str or not re.fullmatch(r"\d{4}", key_str):
+                continue
+            if key_str in existing_years:
+                continue
+            if isinstance(value, (int, float)):
+                val_str = str(value)
+            elif isinstance(value, str):
+                val_str = value.strip()
+            else:
+                val_str = ""
+            if val_str in ("", None):
+                continue
+            ventas.append(
+                {
+                    "anio": key_str,
+                    "comparativo": "",
+                    "ventas_estimadas": val_str,
+                    "fecha_registro": "",
+                }
             )
-        except Exception:
-            base_row = None
-
-        if base_row:
-            base_row_norm = _normalize_row_keys(base_row)
-            existing_years = {v.get("anio") for v in ventas if v.get("anio")}
-            for key, value in base_row_norm.items():
-                key_str = (key or "").replace("\u00a0", "").strip()
-                if not key_str or not re.fullmatch(r"\d{4}", key_str):
-                    continue
-                if key_str in existing_years:
-                    continue
-                if isinstance(value, (int, float)):
-                    val_str = str(value)
-                elif isinstance(value, str):
-                    val_str = value.strip()
-                else:
-                    val_str = ""
-                if val_str in ("", None):
-                    continue
-                ventas.append(
-                    {
-                        "anio": key_str,
-                        "comparativo": "",
-                        "ventas_estimadas": val_str,
-                        "fecha_registro": "",
-                    }
-                )
 
     ventas.sort(key=lambda value: value.get("anio") or "", reverse=True)
     return ventas
 
 
-def guardar_ventas_afiliado(data: Dict[str, str]):
-    """
-    Inserta un registro en la hoja VENTAS_SOCIO con el orden esperado.
-    """
-    logging.info("Datos recibidos para guardar ventas: %s", data)
-
-    sheet_id = os.getenv("SHEET_PATH") or getattr(settings, "SHEET_PATH", "")
-    if not sheet_id:
-        raise RuntimeError("SHEET_PATH no esta configurado.")
-
-    sheet = get_google_sheet(sheet_id, "VENTAS_SOCIO")
+def construir_fila_ventas(data: Dict[str, str]):
+    """Arma la fila de VENTAS_SOCIO (10 columnas, A:J) con el orden esperado."""
     ruc_norm = limpiar_ruc(data.get("ruc", ""))
     ruc_text = f"'{ruc_norm}" if re.fullmatch(r"\d+", ruc_norm or "") else ruc_norm
 
@@ -446,16 +709,39 @@ def guardar_ventas_afiliado(data: Dict[str, str]):
 
     if len(fila) != 10:
         raise ValueError(f"Fila con columnas inesperadas: {fila}")
-
-    next_row = find_first_empty_row(sheet, start_row=2)
-    ensure_row_capacity(sheet, next_row)
-    start = f"A{next_row}"
-    end = f"J{next_row}"
-    sheet.update(f"{start}:{end}", [fila], value_input_option="USER_ENTERED")
+    return fila
+
+
+def registrar_ventas_agregadas(sheet, first_row, filas):
+    """Actualiza el indice de VENTAS_SOCIO y el formato de fecha tras agregar filas."""
+    index = _peek_ruc_index("VENTAS_SOCIO")
+    header = index.header if index else []
+    for offset, fila in enumerate(filas):
+        registrar_fila_en_indice(
+            "VENTAS_SOCIO", first_row + offset if first_row else None, dict(zip(header, fila)))
+    if not first_row:
+        return
+    last_row = first_row + len(filas) - 1
     try:
         sheet.format(
-            f"D2:D{next_row}",
+            f"D2:D{last_row}",
             {"numberFormat": {"type": "DATE", "pattern": "dd/MM/yyyy"}},
         )
     except Exception:
         logging.warning("No se pudo aplicar formato de fecha a la columna D en VENTAS_SOCIO.")
+
+
+def guardar_ventas_afiliado(data: Dict[str, str]):
+    """
+    Inserta un registro en la hoja VENTAS_SOCIO con el orden esperado.
+    """
+    logging.info("Datos recibidos para guardar ventas.", extra={"data": data})
+
+    sheet_id = os.getenv("SHEET_PATH") or getattr(settings, "SHEET_PATH", "")
+    if not sheet_id:
+        raise RuntimeError("SHEET_PATH no esta configurado.")
+
+    sheet = get_google_sheet(sheet_id, "VENTAS_SOCIO")
+    fila = construir_fila_ventas(data)
+    next_row = append_row_to_sheet(sheet, fila, header_row=1)
+    registrar_ventas_agregadas(sheet, next_row, [fila])
@@ -1,7 +1,7 @@
 import json
 import logging
 import re
-from datetime import datetime, timedelta
+from datetime import datetime
 
 import pytz
 from django.conf import settings
@@ -10,24 +10,23 @@ from django.shortcuts import redirect, render
 from django.utils.timezone import now
 from django.views.decorators.http import require_GET, require_http_methods
 
-from capig_form.services.google_sheets_service import (
-    _get_client,
-    get_google_sheet,
-    insert_row_to_sheet,
-)
+from capig_form.services import dates
 from forms.afiliacion_handler import (
     EMAIL_COLUMN_SEQUENCE,
     PHONE_COLUMN_SEQUENCE,
-    guardar_nuevo_afiliado_en_google_sheets,
 )
+from forms.outbox import submit_afiliado, submit_row, submit_ventas
 from forms.utils import (
+    ESTADO_VIEW_INDEXES,
+    VENTAS_VIEW_INDEXES,
     actualizar_estado_afiliado,
     buscar_afiliado_por_ruc,
     buscar_afiliado_por_ruc_base_datos,
-    guardar_ventas_afiliado,
     listar_empresas_socias,
+    listar_sectores,
     limpiar_ruc,
     obtener_ventas_por_ruc,
+    prefetch_ruc_indexes,
 )
 
 logger = logging.getLogger(__name__)
@@ -142,27 +141,8 @@ def dashboard_view(request):
 
 
 def _obtener_sectores():
-    """Devuelve la lista de sectores desde la hoja SECTOR."""
-    try:
-        sheet = get_google_sheet(settings.SHEET_PATH, "SECTOR")
-    except Exception:
-        try:
-            client = _get_client()
-            spreadsheet = client.open_by_key(settings.SHEET_PATH)
-            sheet = next(
-                (ws for ws in spreadsheet.worksheets() if ws.title.strip().lower() == "sector"),
-                None,
-            )
-            if not sheet:
-                return []
-        except Exception:
-            return []
-
-    try:
-        valores = sheet.col_values(1)
-        return [val.strip() for val in valores[1:] if val.strip()]
-    except Exception:
-        return []
+    """Devuelve la lista de sectores desde la hoja SECTOR (cacheada)."""
+    return list(listar_sectores())
 
 
 def _codigo_seguridad_valido(request):
@@ -190,20 +170,11 @@ def _to_iso_date(fecha_str: str) -> str:
     if fecha_str is None:
         return fecha_str
     if isinstance(fecha_str, (int, float)):
-        try:
-            base = datetime(1899, 12, 30)
-            return (base + timedelta(days=float(fecha_str))).date().isoformat()
-        except Exception:
-            return fecha_str
-    fecha_str = str(fecha_str).strip()
-    if not fecha_str:
-        return fecha_str
-    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
-        try:
-            return datetime.strptime(fecha_str, fmt).date().isoformat()
-        except ValueError:
-            continue
-    return fecha_str
+        parsed = dates.from_excel_serial(fecha_str)
+    else:
+        fecha_str = str(fecha_str).strip()
+        parsed = dates.parse_date(fecha_str)
+    return parsed.isoformat() if parsed is not None else fecha_str
 
 
 @require_http_methods(["GET", "POST"])
@@ -237,8 +208,7 @@ def diag_form_view(request):
             fecha_str = now_ecuador.strftime("%Y-%m-%d")
             hora_str = now_ecuador.strftime("%H:%M:%S")
 
-            success = insert_row_to_sheet(
-                settings.SHEET_PATH,
+            success = submit_row(
                 sheet_name,
                 [
                     razon_social,
@@ -301,8 +271,7 @@ def cap_form_view(request):
                 fecha_str = now_ecuador.strftime("%Y-%m-%d")
                 hora_str = now_ecuador.strftime("%H:%M:%S")
 
-                success = insert_row_to_sheet(
-                    settings.SHEET_PATH,
+                success = submit_row(
                     sheet_name,
                     [
                         razon_social,
@@ -323,8 +292,7 @@ def cap_form_view(request):
             fecha_str = now_ecuador.strftime("%Y-%m-%d")
             hora_str = now_ecuador.strftime("%H:%M:%S")
 
-            success = insert_row_to_sheet(
-                settings.SHEET_PATH,
+            success = submit_row(
                 sheet_name,
                 [
                     razon_social,
@@ -380,6 +348,7 @@ def estado_afiliado_view(request):
         ruc_norm = limpiar_ruc(ruc)
         nuevo_estado = request.POST.get("estado")
 
+        prefetch_ruc_indexes(ESTADO_VIEW_INDEXES)
         afiliado = buscar_afiliado_por_ruc(ruc_norm)
 
         if afiliado:
@@ -426,7 +395,7 @@ def nuevo_afiliado_view(request):
             context["ruc_error"] = "RUC invalido. Debe tener 13 digitos."
         else:
             try:
-                guardar_nuevo_afiliado_en_google_sheets(
+                submit_afiliado(
                     {
                         **form_data,
                         "ruc": ruc_norm,
@@ -462,6 +431,7 @@ def ventas_afiliado_view(request):
         observaciones = request.POST.get("observaciones", "").strip()
         ventas_bloques = _parsear_bloques_ventas(request.POST)
 
+        prefetch_ruc_indexes(VENTAS_VIEW_INDEXES)
         afiliado = buscar_afiliado_por_ruc_base_datos(ruc_norm)
 
         if afiliado:
@@ -509,7 +479,7 @@ def ventas_afiliado_view(request):
                         "ventas_estimadas": bloque.get("ventas_estimadas", ""),
                         "anio": anio,
                     }
-                    guardar_ventas_afiliado(data)
+                    submit_ventas(data)
             else:
                 data = {
                     **base_data,
@@ -517,7 +487,7 @@ def ventas_afiliado_view(request):
                     "ventas_estimadas": "",
                     "anio": str(datetime.now().year),
                 }
-                guardar_ventas_afiliado(data)
+                submit_ventas(data)
             return redirect("forms:success_ventas_afiliado")
         else:
             context["no_encontrado"] = True
@@ -0,0 +1,54 @@
+"""
+Configuracion de gunicorn (se carga sola desde el directorio del proyecto).
+
+Con GUNICORN_PRELOAD (por defecto activo) la app se importa una vez en el
+maestro y las caches de Sheets se precargan ahi mismo, con un limite de
+SHEETS_WARMUP_TIMEOUT: los workers heredan ambas cosas por fork. Sin preload
+cada worker precarga sus caches en un hilo despues del fork. Ver
+capig_form/warmup.py.
+"""
+import os
+
+# Los hooks del maestro (metricas) leen settings aunque no haya preload.
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "capig_form.settings")
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1").lower() not in ("0", "false", "no")
+
+if preload_app:
+    os.environ["CAPIG_GUNICORN_PRELOAD"] = "1"
+
+
+def on_starting(server):
+    from capig_form.services.metrics import reset_process_files
+
+    reset_process_files()
+
+
+def when_ready(server):
+    if preload_app:
+        from capig_form.services.metrics import flush
+        from capig_form.warmup import preload, warm_caches
+
+        preload()
+        warm_caches()
+        flush(force=True)
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from capig_form.warmup import worker_started
+
+        worker_started()
+
+
+def post_worker_init(worker):
+    if not preload_app:
+        from capig_form.warmup import warm_caches_in_background
+
+        warm_caches_in_background()
+
+
+def child_exit(server, worker):
+    from capig_form.services.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
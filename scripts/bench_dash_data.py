@@ -0,0 +1,212 @@
+"""
+Benchmark de la construccion de DASH_DATA: recorrido fila a fila (version
+anterior, copiada aca como referencia) contra el pipeline columnar de
+dash_data_job.build_dash_rows, sobre hojas sinteticas. Antes de medir verifica
+que ambas versiones produzcan exactamente las mismas filas.
+
+No llama a Google Sheets.
+
+Uso:
+  python scripts/bench_dash_data.py                 # 10k y 100k socios
+  python scripts/bench_dash_data.py --socios 50000 --runs 5
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import statistics
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from capig_form.services.dash_data_job import (  # noqa: E402
+    _clean_ruc,
+    _find_col,
+    _normalize,
+    _to_float,
+    build_dash_rows,
+)
+
+YEARS = ["2019", "2020", "2021", "2022", "2023", "2024"]
+HEADER = ["N", "RUC", "RAZON SOCIAL", "TAMAÑO", "ESTADO", "SECTOR", "No. COLABORADORES",
+          "SEMAFORO", *YEARS, "T2023", "OBSERVACIONES"]
+
+
+# ========================
+# REFERENCIA (fila a fila)
+# ========================
+def _legacy_sum_year_columns(headers, row):
+    total = 0.0
+    for idx, h in enumerate(headers):
+        norm = _normalize(h)
+        if re.fullmatch(r"\d{4}", norm):
+            if idx < len(row):
+                total += _to_float(row[idx])
+    return total
+
+
+def _legacy_collect_base_data(data_bd, sector_map):
+    result = {}
+
+    def process_block(header_row, rows):
+        col_ruc = _find_col(header_row, "RUC")
+        col_emp = _find_col(header_row, "RAZON_SOCIAL") if _find_col(header_row, "RAZON_SOCIAL") >= 0 else _find_col(header_row, "RAZON SOCIAL")
+        col_tam = _find_col(header_row, "TAMANO")
+        col_estado = _find_col(header_row, "ESTADO")
+        col_colab = _find_col(header_row, "COLABORADORES") if _find_col(header_row, "COLABORADORES") >= 0 else _find_col(header_row, "NO_COLABORADORES")
+        col_semaforo = _find_col(header_row, "SEMAFORO")
+        col_sector = _find_col(header_row, "SECTOR")
+
+        for row in rows:
+            if not row or all(not c for c in row):
+                continue
+            ruc = _clean_ruc(row[col_ruc] if col_ruc >= 0 and col_ruc < len(row) else "")
+            if not ruc:
+                continue
+            empresa = str(row[col_emp]) if col_emp >= 0 and col_emp < len(row) else ""
+            tamano = str(row[col_tam]) if col_tam >= 0 and col_tam < len(row) else ""
+            estado = str(row[col_estado]) if col_estado >= 0 and col_estado < len(row) else ""
+            colab = row[col_colab] if col_colab >= 0 and col_colab < len(row) else ""
+            semaforo = str(row[col_semaforo]) if col_semaforo >= 0 and col_semaforo < len(row) else ""
+            sector_cell = str(row[col_sector]) if col_sector >= 0 and col_sector < len(row) else ""
+            ventas_hist = _legacy_sum_year_columns(header_row, row)
+            sec = sector_map.get(ruc, sector_cell)
+            current = result.get(ruc, {})
+
+            def pick(new, old):
+                return new if str(new).strip() else old
+
+            result[ruc] = {
+                "empresa": pick(empresa, current.get("empresa", "")),
+                "tamano": pick(tamano, current.get("tamano", "")),
+                "estado": pick(estado, current.get("estado", "")),
+                "colab": pick(colab, current.get("colab", "")),
+                "semaforo": pick(semaforo, current.get("semaforo", "")),
+                "sector": pick(sec, current.get("sector", "")),
+                "ventas_hist": current.get("ventas_hist", 0.0) + ventas_hist,
+            }
+
+    header_idxs = []
+    for i, row in enumerate(data_bd):
+        if not row:
+            continue
+        if _find_col(row, "RUC") >= 0 and _find_col(row, "TAMANO") >= 0:
+            header_idxs.append(i)
+    h1 = 1 if 1 in header_idxs else (header_idxs[0] if header_idxs else 1)
+    h2 = 313 if 313 in header_idxs else (header_idxs[1] if len(header_idxs) > 1 else None)
+    if h1 is not None and h1 < len(data_bd):
+        process_block(data_bd[h1], data_bd[h1 + 1 : 312])
+    if h2 is not None and h2 < len(data_bd):
+        process_block(data_bd[h2], data_bd[h2 + 1 :])
+    return result
+
+
+def _legacy_collect_ventas_nuevas(data_ventas):
+    if not data_ventas:
+        return {}
+    headers = data_ventas[0]
+    col_ruc = _find_col(headers, "RUC")
+    col_monto = _find_col(headers, "MONTO_ESTIMADO")
+    if col_monto < 0:
+        col_monto = _find_col(headers, "MONTO")
+    if min(col_ruc, col_monto) < 0:
+        return {}
+    agg = defaultdict(float)
+    for row in data_ventas[1:]:
+        if col_ruc >= len(row) or col_monto >= len(row):
+            continue
+        ruc = _clean_ruc(row[col_ruc])
+        if not ruc:
+            continue
+        agg[ruc] += _to_float(row[col_monto])
+    return agg
+
+
+def legacy_build_dash_rows(data_bd, data_ventas, sector_map):
+    base_data = _legacy_collect_base_data(data_bd, sector_map)
+    ventas_nuevas = _legacy_collect_ventas_nuevas(data_ventas)
+    rows = [["RUC", "Empresa", "Tamano", "Estado", "Sector", "Colaboradores", "Semaforo", "Ventas Totales"]]
+    for ruc, info in base_data.items():
+        ventas_total = info.get("ventas_hist", 0.0) + ventas_nuevas.get(ruc, 0.0)
+        rows.append([ruc, info.get("empresa", ""), info.get("tamano", ""), info.get("estado", ""),
+                     info.get("sector", ""), info.get("colab", ""), info.get("semaforo", ""), ventas_total])
+    return rows
+
+
+# ========================
+# DATOS SINTETICOS
+# ========================
+def _money(rng):
+    choice = rng.random()
+    if choice < 0.15:
+        return ""
+    if choice < 0.25:
+        return f"$ {rng.randint(1000, 9_999_999):,}.{rng.randint(0, 99):02d}"
+    if choice < 0.28:
+        return "N/D"
+    return f"{rng.uniform(0, 5_000_000):.2f}"
+
+
+def make_dataset(socios: int, seed: int = 7):
+    rng = random.Random(seed)
+    # ~5% de RUC repetidos para ejercitar la agregacion.
+    rucs = [f"09{rng.randint(10**10, 10**11 - 1)}" for _ in range(socios)]
+    rucs += rng.sample(rucs, max(1, socios // 20))
+
+    def socio_row(i, ruc):
+        row = [str(i), ruc if rng.random() > 0.02 else f"'{ruc[:5]}-{ruc[5:]}",
+               f"EMPRESA {i}" if rng.random() > 0.05 else "",
+               rng.choice(["MICRO", "PEQUEÑA", "MEDIANA", "GRANDE", ""]),
+               rng.choice(["ACTIVO", "INACTIVO", " "]),
+               rng.choice(["ALIMENTOS", "METALMECANICA", "QUIMICO", ""]),
+               str(rng.randint(1, 500)), rng.choice(["VERDE", "AMARILLO", "ROJO"]),
+               *[_money(rng) for _ in YEARS], _money(rng), "obs"]
+        # Algunas filas cortas, como devuelve Sheets sin relleno.
+        return row[: rng.randint(3, len(row))] if rng.random() < 0.03 else row
+
+    data_bd = [["BASE DE DATOS SOCIOS"], list(HEADER)]
+    data_bd += [socio_row(i, ruc) for i, ruc in enumerate(rucs[:310])]
+    data_bd += [[], list(HEADER)]
+    data_bd += [socio_row(i, ruc) for i, ruc in enumerate(rucs[310:], start=310)]
+
+    data_ventas = [["RUC", "RAZON_SOCIAL", "ANIO", "MONTO_ESTIMADO"]]
+    for _ in range(socios // 2):
+        data_ventas.append([rng.choice(rucs), "X", "2024", _money(rng)])
+    sector_map = {ruc: rng.choice(["ALIMENTOS", "TEXTIL", ""]) for ruc in rng.sample(rucs, socios // 3)}
+    return data_bd, data_ventas, sector_map
+
+
+def _time(func, args, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socios", type=int, action="append")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'socios':>8}{'fila a fila ms':>16}{'columnar ms':>14}{'speedup':>10}")
+    for socios in args.socios or [10_000, 100_000]:
+        dataset = make_dataset(socios)
+        legacy = legacy_build_dash_rows(*dataset)
+        columnar = build_dash_rows(*dataset)
+        if legacy != columnar:
+            raise SystemExit(f"Las salidas difieren con {socios} socios.")
+        legacy_ms = _time(legacy_build_dash_rows, dataset, args.runs)
+        columnar_ms = _time(build_dash_rows, dataset, args.runs)
+        print(f"{socios:>8}{legacy_ms:>16.1f}{columnar_ms:>14.1f}{legacy_ms / columnar_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
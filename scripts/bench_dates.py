@@ -0,0 +1,113 @@
+"""
+Micro-benchmark del parseo de FECHA_AFILIACION: pd.to_datetime celda por
+celda (como hacia tamano_empresas_job._parse_year) contra
+capig_form.services.dates.parse_years sobre la columna entera, con la cache
+vacia (primera corrida del job) y llena (corridas siguientes en el mismo
+proceso).
+
+La columna sintetica imita la hoja: mayoria "dd/mm/yyyy" con fechas que se
+repiten, algo de ISO (escrito por los formularios), seriales de Excel,
+vacios, texto suelto, años sueltos y fechas con el mes primero.
+
+Antes de medir se comprueba que los años coincidan con pd.to_datetime en
+todas las celdas; la unica diferencia admitida son los seriales de Excel,
+que pd.to_datetime no entiende (NaT) y el kernel si.
+
+Uso:
+  python scripts/bench_dates.py
+  python scripts/bench_dates.py --rows 20000 --runs 5
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from capig_form.services import dates  # noqa: E402
+
+
+def make_column(rows: int, seed: int = 11):
+    rng = random.Random(seed)
+    start = date(1990, 1, 1)
+    span = (date(2025, 12, 31) - start).days
+    # Las afiliaciones se concentran en pocos dias por mes (asambleas, ferias).
+    pool = [start + timedelta(days=rng.randrange(span)) for _ in range(max(50, rows // 8))]
+    column = []
+    for _ in range(rows):
+        choice = rng.random()
+        day = rng.choice(pool)
+        if choice < 0.78:
+            column.append(day.strftime("%d/%m/%Y"))
+        elif choice < 0.88:
+            column.append(day.isoformat())
+        elif choice < 0.93:
+            column.append(str((day - date(1899, 12, 30)).days))
+        elif choice < 0.98:
+            column.append("")
+        elif choice < 0.99:
+            column.append(rng.choice(["S/N", "pendiente", "2019/05/04", "20190504", "31/02/2020"]))
+        else:
+            column.append(rng.choice([str(day.year), day.strftime("%m/%d/%Y"), "3/15/2019", "12/31/2020"]))
+    return column
+
+
+def legacy_years(column):
+    import warnings
+
+    import pandas as pd
+
+    warnings.simplefilter("ignore", UserWarning)
+    years = []
+    for value in column:
+        ts = pd.to_datetime(value, errors="coerce", dayfirst=True)
+        years.append(None if pd.isna(ts) else int(ts.year))
+    return years
+
+
+def _median_ms(func, runs, before=None):
+    samples = []
+    for _ in range(runs):
+        if before:
+            before()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, action="append")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'filas':>8}{'distintas':>11}{'pandas/celda ms':>17}{'columna fria ms':>17}{'columna caliente ms':>21}")
+    for rows in args.rows or [5_000, 50_000]:
+        column = make_column(rows)
+        # Los seriales no son fechas para pd.to_datetime (NaT); todo lo demas,
+        # incluidos otros valores solo de digitos, debe coincidir.
+        old = legacy_years(column)
+        new = dates.parse_years(column)
+        mismatches = [
+            value for value, a, b in zip(column, old, new)
+            if a != b and not (a is None and value.isdigit() and dates._plausible_serial(value))
+        ]
+        if mismatches:
+            raise SystemExit(
+                f"{len(mismatches)} años difieren de pd.to_datetime con {rows} filas: {sorted(set(mismatches))[:10]}")
+
+        legacy_ms = _median_ms(lambda: legacy_years(column), max(1, args.runs // 2))
+        cold_ms = _median_ms(lambda: dates.parse_years(column), args.runs, dates._parse_cached.cache_clear)
+        warm_ms = _median_ms(lambda: dates.parse_years(column), args.runs)
+        print(f"{rows:>8}{len(set(column)):>11}{legacy_ms:>17.1f}{cold_ms:>17.1f}{warm_ms:>21.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark de arranque de un worker: tiempo hasta responder el primer
+/health/ y memoria residente, en procesos nuevos.
+
+Modos:
+  cold     proceso nuevo: importa la app y atiende /health/ (gunicorn sin --preload).
+  eager    igual que cold pero importando antes gspread, google-auth y pandas,
+           como hacia el codigo antes de la inicializacion perezosa.
+  preload  el "maestro" carga la app y corre warmup.preload(); se mide el hijo
+           tras el fork (gunicorn con --preload). Solo en sistemas con fork.
+
+Uso (con el mismo .env que la app):
+  python scripts/bench_startup.py --runs 5
+  python scripts/bench_startup.py --mode cold --mode preload
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+MODES = ("cold", "eager", "preload")
+
+CHILD_CODE = r"""
+import json, os, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "capig_form.settings")
+mode = {mode!r}
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def private_kb():
+    try:
+        with open("/proc/self/smaps_rollup") as fh:
+            return sum(int(line.split()[1]) for line in fh if line.startswith("Private_"))
+    except OSError:
+        return None
+
+
+def first_health(application):
+    from wsgiref.util import setup_testing_defaults
+    environ = {{"PATH_INFO": "/health/", "REQUEST_METHOD": "GET", "HTTP_HOST": "localhost"}}
+    setup_testing_defaults(environ)
+    status = []
+    body = b"".join(application(environ, lambda s, h, exc=None: status.append(s)))
+    return status[0] if status else "?"
+
+
+if mode == "eager":
+    import gspread, google.auth.transport.requests, google.oauth2.service_account, pandas  # noqa
+
+if mode == "preload":
+    os.environ["CAPIG_GUNICORN_PRELOAD"] = "1"
+    from capig_form.wsgi import application
+    from capig_form.warmup import preload, worker_started
+    preload()
+    master_ms = (time.perf_counter() - t0) * 1000
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        t1 = time.perf_counter()
+        worker_started()
+        status = first_health(application)
+        result = {{
+            "boot_ms": (time.perf_counter() - t1) * 1000,
+            "master_ms": master_ms,
+            "rss_kb": rss_kb(),
+            "private_kb": private_kb(),
+            "status": status,
+        }}
+        os.write(write_fd, json.dumps(result).encode())
+        os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    data = b""
+    while True:
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        data += chunk
+    print(data.decode())
+else:
+    from capig_form.wsgi import application
+    status = first_health(application)
+    print(json.dumps({{
+        "boot_ms": (time.perf_counter() - t0) * 1000,
+        "rss_kb": rss_kb(),
+        "private_kb": private_kb(),
+        "status": status,
+    }}))
+"""
+
+
+def run_once(mode: str) -> dict:
+    code = CHILD_CODE.format(root=str(PROJECT_ROOT), mode=mode)
+    env = dict(os.environ, SHEETS_OUTBOX_ENABLED=os.environ.get("SHEETS_OUTBOX_ENABLED", "False"))
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT_ROOT, env=env,
+        capture_output=True, text=True, check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"El modo {mode} fallo:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--mode", action="append", choices=MODES)
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados en JSON.")
+    args = parser.parse_args()
+
+    modes = args.mode or [m for m in MODES if m != "preload" or hasattr(os, "fork")]
+    summary = {}
+    for mode in modes:
+        runs = [run_once(mode) for _ in range(args.runs)]
+        summary[mode] = {
+            "boot_ms": round(statistics.median(r["boot_ms"] for r in runs), 1),
+            "rss_mb": round(statistics.median(r["rss_kb"] for r in runs) / 1024, 1),
+            "private_mb": (
+                round(statistics.median(r["private_kb"] for r in runs) / 1024, 1)
+                if all(r.get("private_kb") for r in runs) else None
+            ),
+            "status": runs[-1]["status"],
+        }
+        if mode == "preload":
+            summary[mode]["master_ms"] = round(statistics.median(r["master_ms"] for r in runs), 1)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{'modo':<10}{'arranque ms':>14}{'RSS MB':>10}{'privada MB':>12}  estado")
+    for mode, row in summary.items():
+        private = "-" if row["private_mb"] is None else f"{row['private_mb']:.1f}"
+        print(f"{mode:<10}{row['boot_ms']:>14.1f}{row['rss_mb']:>10.1f}{private:>12}  {row['status']}")
+    if "preload" in summary:
+        print(f"(preload: el maestro tardo {summary['preload']['master_ms']:.1f} ms una sola vez)")
+
+
+if __name__ == "__main__":
+    main()